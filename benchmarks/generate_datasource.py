@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import random
+import argparse
+from rich import print
+
+# rough encoded size of one observation, used to size documents
+OBSERVATION_BYTES = 190
+FORMS = (("10-Q", "Q1"), ("10-Q", "Q2"), ("10-Q", "Q3"), ("10-K", "FY"))
+CONCEPT_WORDS = (
+    "Assets", "Liabilities", "Revenues", "Cost", "Income", "Expense", "Tax", "Cash", "Equity", "Debt",
+    "Operating", "Net", "Current", "Noncurrent", "Deferred", "Accrued", "Interest", "Depreciation",
+)
+
+def document_size(rng: random.Random, median_bytes: int, sigma: float, max_bytes: int) -> int:
+    """ Draws a document size from a log-normal distribution, like the heavy tail of SEC filers. """
+
+    return min(int(rng.lognormvariate(0, sigma) * median_bytes), max_bytes)
+
+def concept_name(rng: random.Random) -> str:
+    return "".join(rng.sample(CONCEPT_WORDS, rng.randint(2, 4)))
+
+def generate_document(cik: int, target_bytes: int, rng: random.Random) -> dict:
+    """ Returns a companyfacts document of roughly target_bytes with dei and us-gaap concepts. """
+
+    observations = max(target_bytes // OBSERVATION_BYTES, 4)
+    per_concept = rng.randint(8, 40)
+    concepts = max(observations // per_concept, 1)
+    first_year = rng.randint(2008, 2016)
+
+    def series(unit_scale):
+        values = []
+        for i in range(per_concept):
+            fy = first_year + i // 4
+            form, fp = FORMS[i % 4]
+            month = 3 * (i % 4) + 3
+            values.append({
+                "start": f"{fy}-01-01" if fp == "FY" else f"{fy}-{month - 2:02d}-01",
+                "end": f"{fy}-{month:02d}-28",
+                "val": rng.randint(1, 10 ** 9) * unit_scale,
+                "accn": f"{cik:010d}-{fy % 100:02d}-{rng.randint(0, 999999):06d}",
+                "fy": fy,
+                "fp": fp,
+                "form": form,
+                "filed": f"{fy}-{min(month + 1, 12):02d}-15",
+                "frame": f"CY{fy}Q{i % 4 + 1}",
+            })
+        return values
+
+    us_gaap = {}
+    while len(us_gaap) < concepts:
+        name = concept_name(rng)
+        us_gaap[name] = {
+            "label": name,
+            "description": f"Synthetic {name} concept.",
+            "units": {"USD": series(1)},
+        }
+
+    return {
+        "cik": cik,
+        "entityName": f"SYNTHETIC COMPANY {cik} CORP",
+        "facts": {
+            "dei": {
+                "EntityCommonStockSharesOutstanding": {
+                    "label": "Entity Common Stock, Shares Outstanding",
+                    "description": "Synthetic shares outstanding.",
+                    "units": {"shares": series(1)},
+                }
+            },
+            "us-gaap": us_gaap,
+        },
+    }
+
+def generate(output_dir: str, files: int, median_kb: int = 256, sigma: float = 1.0,
+             max_mb: int = 64, seed: int = 0) -> dict:
+    """
+    Writes a synthetic datasource of CIK*.json files.
+
+    Returns:
+        dict: Number of files and their total size in bytes.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    total = 0
+    for i in range(files):
+        cik = 1000000 + i
+        size = document_size(rng, median_kb * 1024, sigma, max_mb * 1024 * 1024)
+        path = os.path.join(output_dir, f"CIK{cik:010d}.json")
+        with open(path, 'w') as outfile:
+            json.dump(generate_document(cik, size, rng), outfile, separators=(",", ":"))
+        total += os.path.getsize(path)
+    return {"files": files, "bytes": total}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic companyfacts datasource.")
+    parser.add_argument("output", help="directory to write CIK*.json files to")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--median-kb", type=int, default=256, help="median document size")
+    parser.add_argument("--sigma", type=float, default=1.0, help="log-normal spread of document sizes")
+    parser.add_argument("--max-mb", type=int, default=64, help="largest document size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    summary = generate(args.output, args.files, args.median_kb, args.sigma, args.max_mb, args.seed)
+    print(f"[bold green]Wrote {summary['files']} file(s), {summary['bytes'] / 1024 / 1024:.1f} MB to {args.output}[/]")
+
+if __name__ == "__main__":
+    sys.exit(main())
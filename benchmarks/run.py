@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from rich import print
+from rich.table import Table
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.generate_datasource import generate
+from client.solvers import PythonSolver, benchmark as benchmark_solvers
+from res.json_tools import measure_flatten
+
+results_dir = os.path.join(os.path.dirname(__file__), "results")
+serve_script = os.path.join(os.path.dirname(__file__), "serve.py")
+
+def percentile(values: list, fraction: float) -> float:
+    """ Returns the nearest-rank percentile of a list of values. """
+
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+def start_server(datasource_dir: str, port: int, difficulty: int) -> subprocess.Popen:
+    """ Starts benchmarks/serve.py and waits until it accepts requests. """
+
+    process = subprocess.Popen(
+        [sys.executable, serve_script, "--datasource", datasource_dir, "--port", str(port), "--difficulty", str(difficulty)],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    for line in process.stdout:
+        if line.strip() == "ready":
+            # keep draining the server's output so it never blocks on a full pipe
+            threading.Thread(target=process.stdout.read, daemon=True).start()
+            return process
+    process.wait()
+    raise RuntimeError(f"Benchmark server exited with code {process.returncode}")
+
+def run_load(api_url: str, entities: list, total: int, concurrency: int) -> dict:
+    """ Fetches total random entities through the full challenge, solve and /data cycle.
+
+    Latency is measured on the /data request alone; throughput counts completed /data requests
+    over the wall time of the whole run.
+    """
+    solver = PythonSolver()
+    local = threading.local()
+    latencies = []
+    sizes = []
+    errors = 0
+    lock = threading.Lock()
+
+    def fetch(i):
+        nonlocal errors
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        cik = entities[(i * 7919) % len(entities)]
+        challenge = local.session.get(f"{api_url}/challenge", params={"cik": cik}).json()
+        nonce = solver.solve(challenge["challenge"], challenge["difficulty"])
+        payload = {
+            "challenge_id": challenge["challenge_id"],
+            "challenge": challenge["challenge"],
+            "nonce": nonce,
+            "difficulty": challenge["difficulty"],
+            "cik": cik,
+        }
+        started = time.perf_counter()
+        response = local.session.post(f"{api_url}/data", json=payload)
+        body = response.content
+        elapsed = time.perf_counter() - started
+        with lock:
+            if response.status_code == 200:
+                latencies.append(elapsed)
+                sizes.append(len(body))
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fetch, range(total)))
+    wall = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else None,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "mean_bytes": statistics.mean(sizes) if sizes else 0,
+    }
+
+def server_scenarios(corpus_sizes, concurrency_levels, requests_per_run: int, median_kb: int,
+                     port: int, difficulty: int, data_dir: str) -> list:
+    results = []
+    for files in corpus_sizes:
+        corpus_dir = os.path.join(data_dir, f"corpus-{files}-{median_kb}kb")
+        if not os.path.isdir(corpus_dir):
+            print(f"[bold magenta]Generating {files} synthetic file(s) in {corpus_dir}[/]")
+            generate(corpus_dir, files, median_kb=median_kb)
+        entities = sorted(int(name[3:13]) for name in os.listdir(corpus_dir) if name.startswith("CIK"))
+
+        process = start_server(corpus_dir, port, difficulty)
+        try:
+            api_url = f"http://127.0.0.1:{port}"
+            run_load(api_url, entities, min(requests_per_run, 20), 1)  # warm up the index and caches
+            for concurrency in concurrency_levels:
+                result = run_load(api_url, entities, requests_per_run, concurrency)
+                result.update({"files": files, "concurrency": concurrency})
+                results.append(result)
+                print(f"server files={files} concurrency={concurrency}: p50 {result['p50_ms'] or 0:.1f} ms, "
+                      f"p99 {result['p99_ms'] or 0:.1f} ms, {result['rps']:.1f} req/s, {result['errors']} error(s)")
+        finally:
+            process.terminate()
+            process.wait()
+    return results
+
+def flatten_scenarios(data_dir: str, median_kb: int, samples: int = 5) -> list:
+    corpus_dir = os.path.join(data_dir, f"flatten-{median_kb}kb")
+    if not os.path.isdir(corpus_dir):
+        generate(corpus_dir, samples, median_kb=median_kb, seed=1)
+    results = []
+    for name in sorted(os.listdir(corpus_dir)):
+        path = os.path.join(corpus_dir, name)
+        result = measure_flatten(path)
+        result.update({"file": name, "bytes": os.path.getsize(path)})
+        results.append(result)
+        print(f"flatten {name} ({result['bytes'] / 1024:.0f} KB): {result['observations_per_second']:,.0f} observations/s")
+    return results
+
+def environment() -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def flatten_metrics(results: dict) -> dict:
+    """ Returns comparable metrics of a results document as a flat name -> value mapping. """
+
+    metrics = {}
+    for result in results.get("server", []):
+        prefix = f"server[files={result['files']},concurrency={result['concurrency']}]"
+        for key in ("p50_ms", "p99_ms", "rps"):
+            metrics[f"{prefix}.{key}"] = result[key]
+    for result in results.get("solver", []):
+        metrics[f"solver[{result['backend']},difficulty={result['difficulty']}].hashes_per_second"] = result["hashes_per_second"]
+    for result in results.get("flatten", []):
+        metrics[f"flatten[{result['file']}].observations_per_second"] = result["observations_per_second"]
+    return metrics
+
+def compare(baseline: dict, current: dict) -> Table:
+    """ Tabulates the change of every metric present in both result documents. """
+
+    table = Table(title="Benchmark comparison")
+    for column in ("metric", "baseline", "current", "change"):
+        table.add_column(column)
+
+    before, after = flatten_metrics(baseline), flatten_metrics(current)
+    for name in sorted(set(before) & set(after)):
+        if before[name] is None or after[name] is None:
+            continue
+        change = (after[name] - before[name]) / before[name] * 100 if before[name] else 0.0
+        table.add_row(name, f"{before[name]:,.2f}", f"{after[name]:,.2f}", f"{change:+.1f}%")
+    return table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the server, PoW solvers and facts flattening.")
+    parser.add_argument("--scenarios", nargs="+", default=["server", "solver", "flatten"],
+                        choices=["server", "solver", "flatten"])
+    parser.add_argument("--corpus-sizes", nargs="+", type=int, default=[100, 1000], help="datasource files per run")
+    parser.add_argument("--median-kb", type=int, default=128, help="median synthetic document size")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="/data requests per concurrency level")
+    parser.add_argument("--difficulty", type=int, default=1, help="PoW difficulty for the server scenarios")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--data-dir", default=None, help="keep generated corpora here between runs")
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="results file to compare against")
+    args = parser.parse_args(argv)
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="companyfacts-bench-")
+    results = {"environment": environment(), "parameters": vars(args)}
+    try:
+        if "server" in args.scenarios:
+            results["server"] = server_scenarios(
+                args.corpus_sizes, args.concurrency, args.requests, args.median_kb, args.port, args.difficulty, data_dir
+            )
+        if "solver" in args.scenarios:
+            results["solver"] = benchmark_solvers(["python", "process"], range(3, 7))
+            for result in results["solver"]:
+                print(f"solver {result['backend']} difficulty={result['difficulty']}: "
+                      f"{result['hashes_per_second']:,.0f} hashes/s")
+        if "flatten" in args.scenarios:
+            results["flatten"] = flatten_scenarios(data_dir, args.median_kb)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(results_dir, datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+    print(f"[bold green]Results written to {output}[/]")
+
+    if args.compare:
+        with open(args.compare, 'r') as infile:
+            print(compare(json.load(infile), results))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import os
+import sys
+import argparse
+import logging
+
+server_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server"))
+
+def main(argv=None):
+    """ Runs the API server against a datasource with an in-process Redis stand-in. """
+
+    parser = argparse.ArgumentParser(description="Serve the API for benchmarks, backed by fakeredis.")
+    parser.add_argument("--datasource", required=True, help="datasource directory")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--difficulty", type=int, default=1, help="base PoW difficulty")
+    args = parser.parse_args(argv)
+
+    # configuration is read when the app module is imported
+    os.environ["DATASOURCE_DIR"] = os.path.abspath(args.datasource)
+    os.environ["BASE_DIFFICULTY"] = str(args.difficulty)
+    os.environ.setdefault("CATALOG_PATH", os.path.join(os.path.abspath(args.datasource), ".catalog.db"))
+    os.environ.setdefault("DIFFICULTY_TARGET_RATE", "1e9")
+    os.environ.setdefault("DIFFICULTY_TARGET_IN_FLIGHT", "1000000")
+
+    import fakeredis
+    import redis
+    redis.Redis = fakeredis.FakeRedis
+
+    os.chdir(server_dir)
+    sys.path.insert(0, server_dir)
+    import app as server
+
+    # the benchmark client is a single address issuing far more than 10 challenges a minute
+    server.limiter.enabled = False
+    # per-request log lines would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    from werkzeug.serving import make_server
+    http_server = make_server("127.0.0.1", args.port, server.app, threaded=True)
+    print("ready", flush=True)
+    http_server.serve_forever()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,25 @@
 import requests
-import hashlib
+import os
 import sys
 import json
 import signal
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
+from requests.packages.urllib3.util import make_headers
 from rich import print
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from client.solvers import get_solver
+from client.cache import ResponseCache
+
+# solver used for PoW, "python" (single core) or "process" (all cores); by default
+# the process pool is only used once the difficulty makes its startup cost worthwhile
+POW_BACKEND = os.environ.get("POW_BACKEND")
+PROCESS_POOL_MIN_DIFFICULTY = 5
+
+# advertise every content coding urllib3 decodes transparently, gzip plus zstd when its decoder is installed
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
 # configure retry logic for resilient HTTP requests
 def get_session():
     session = requests.Session()
@@ -18,6 +31,7 @@ def get_session():
     adapter = HTTPAdapter(max_retries=retries)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
     return session
 
 session = get_session()
@@ -30,10 +44,18 @@ def handle_signal(signum, frame):
 signal.signal(signal.SIGINT, handle_signal)
 signal.signal(signal.SIGTERM, handle_signal)
 
-# fetch PoW challenge from the server
-def get_challenge(api_url):
+# fetch PoW challenge from the server, batch challenges are harder to solve;
+# passing the entity (name or CIK) prices the challenge for the size of its facts,
+# passing a batch's entities prices it for their combined size
+def get_challenge(api_url, batch_size=None, entity=None, entities=None):
     try:
-        response = session.get(f"{api_url}/challenge")
+        if entities is not None:
+            response = session.post(f"{api_url}/challenge", json={"entities": list(entities)})
+        else:
+            params = {"batch_size": batch_size} if batch_size else {}
+            if entity is not None:
+                params["cik" if isinstance(entity, int) else "entity_name"] = entity
+            response = session.get(f"{api_url}/challenge", params=params)
         response.raise_for_status()
         challenge_data = response.json()
 
@@ -45,54 +67,128 @@ def get_challenge(api_url):
     except requests.RequestException as e:
         raise RuntimeError(f"Failed to fetch challenge from {api_url}: {e}")
 
+# resolve a partial name, ticker or CIK to entity names, no PoW required
+def search(api_url, query, limit=10):
+    try:
+        response = session.get(f"{api_url}/search", params={"q": query, "limit": limit})
+        response.raise_for_status()
+        return response.json()["data"]["results"]
+    except requests.RequestException as e:
+        raise RuntimeError(f"Failed to search entities on {api_url}: {e}")
+
+# datasource changes after a sequence number, pass the returned "next" to poll for newer ones
+def changes(api_url, since=0, limit=1000):
+    try:
+        response = session.get(f"{api_url}/changes", params={"since": since, "limit": limit})
+        response.raise_for_status()
+        return response.json()["data"]
+    except requests.RequestException as e:
+        raise RuntimeError(f"Failed to fetch changes from {api_url}: {e}")
+
 # solve Proof-of-Work challenge
-def solve_pow(challenge, difficulty):
-    nonce = 0
-    prefix = "0" * difficulty
-    while True:
-        input_str = f"{challenge}{nonce}"
-        hash_value = hashlib.sha256(input_str.encode()).hexdigest()
-        if hash_value.startswith(prefix):
-            return nonce
-        nonce += 1
+def solve_pow(challenge, difficulty, backend=None):
+    backend = backend or POW_BACKEND or ("process" if difficulty >= PROCESS_POOL_MIN_DIFFICULTY else "python")
+    return get_solver(backend).solve(challenge, difficulty)
 
 # submit PoW solution and fetch data from the server
-def fetch_data(api_url, challenge_id, challenge, nonce, difficulty, entity_name):
+# filters are optional server-side projections: concepts ("dei" or "dei.EntityCommonStockSharesOutstanding"),
+# units, start/end dates (YYYY-MM-DD) and fy/fp, e.g. {"concepts": ["us-gaap.Revenues"], "fy": [2023]},
+# or {"format": "raw"} for the unmodified SEC document instead of the response envelope
+# with a ResponseCache the request is conditional and unchanged data is served from the cache
+# entity_name may also be an integer CIK
+def fetch_data(api_url, challenge_id, challenge, nonce, difficulty, entity_name, filters=None, cache=None):
     payload = {
         "challenge_id": challenge_id,
         "challenge": challenge,
         "nonce": nonce,
         "difficulty": difficulty,
-        "entity_name": entity_name
     }
+    payload["cik" if isinstance(entity_name, int) else "entity_name"] = entity_name
+    payload.update(filters or {})
+
+    key = cache.key(entity_name, filters) if cache else None
+    cached = cache.get(key) if cache else None
+    headers = {"If-None-Match": cached["etag"]} if cached else None
     try:
-        response = session.post(f"{api_url}/data", json=payload)
+        response = session.post(f"{api_url}/data", json=payload, headers=headers)
+        if cached and response.status_code == 304:
+            return cached["data"]
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        if cache and response.headers.get("ETag"):
+            cache.put(key, response.headers["ETag"], response.headers.get("Last-Modified"), data)
+        return data
     except requests.RequestException as e:
         raise RuntimeError(f"Failed to fetch data from {api_url}: {e}")
 
-def main(api_url):
+# check cached data with the server without solving a PoW, returns None if it must be re-fetched
+def revalidate(api_url, entity_name, cache, filters=None):
+    key = cache.key(entity_name, filters)
+    cached = cache.get(key)
+    if not cached:
+        return None
+
+    payload = {"cik" if isinstance(entity_name, int) else "entity_name": entity_name}
+    payload.update(filters or {})
     try:
-        # get pow challenge
-        print("[italic white]Requesting challenge...[/]")
-        challenge_data = get_challenge(api_url)
-        challenge_id = challenge_data["challenge_id"]
-        challenge = challenge_data["challenge"]
-        difficulty = challenge_data["difficulty"]
+        response = session.post(f"{api_url}/data/revalidate", json=payload, headers={"If-None-Match": cached["etag"]})
+    except requests.RequestException as e:
+        raise RuntimeError(f"Failed to revalidate data from {api_url}: {e}")
+
+    if response.status_code == 304:
+        return cached["data"]
+    if response.status_code == 404:
+        cache.delete(key)
+    return None
 
+# submit PoW solution for a batch of entity names or CIKs, yields one result per entity as they stream in
+def fetch_batch(api_url, challenge_id, challenge, nonce, difficulty, entities, filters=None):
+    payload = {
+        "challenge_id": challenge_id,
+        "challenge": challenge,
+        "nonce": nonce,
+        "difficulty": difficulty,
+        "entities": list(entities)
+    }
+    payload.update(filters or {})
+    try:
+        with session.post(f"{api_url}/data/batch", json=payload, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+    except requests.RequestException as e:
+        raise RuntimeError(f"Failed to fetch batch from {api_url}: {e}")
+
+def main(api_url):
+    try:
         entity_name = "AAR CORP"
-        
-        print(f"[bold green]Received challenge[/]: [bold white]{challenge_id}, difficulty: {difficulty}[/]")
+        cache = ResponseCache()
 
-        # solve pow
-        print("[italic white]Solving proof of work...[/]")
-        nonce = solve_pow(challenge, difficulty)
-        print(f"[bold green]Proof of work solved! Nonce[/]: [bold white]{nonce}[/]")
+        # cached data that the server confirms is unchanged needs no challenge at all
+        print("[italic white]Checking local cache...[/]")
+        data = revalidate(api_url, entity_name, cache)
 
-        # fetch data
-        print("[italic white]Fetching data...[/]")
-        data = fetch_data(api_url, challenge_id, challenge, nonce, difficulty, entity_name)
+        if data is not None:
+            print("[bold green]Cached data is up to date.[/]")
+        else:
+            # get pow challenge
+            print("[italic white]Requesting challenge...[/]")
+            challenge_data = get_challenge(api_url, entity=entity_name)
+            challenge_id = challenge_data["challenge_id"]
+            challenge = challenge_data["challenge"]
+            difficulty = challenge_data["difficulty"]
+
+            print(f"[bold green]Received challenge[/]: [bold white]{challenge_id}, difficulty: {difficulty}[/]")
+
+            # solve pow
+            print("[italic white]Solving proof of work...[/]")
+            nonce = solve_pow(challenge, difficulty)
+            print(f"[bold green]Proof of work solved! Nonce[/]: [bold white]{nonce}[/]")
+
+            # fetch data
+            print("[italic white]Fetching data...[/]")
+            data = fetch_data(api_url, challenge_id, challenge, nonce, difficulty, entity_name, cache=cache)
 
         # check if the data contains the facts key inside the nested dict
         # since the dict is nested, loop through each category (like dei) and subcategory (like EntityCommonStockSharesOutstanding) to check for the units key and count the units
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import httpx
+from rich import print
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from client.api_client import solve_pow
+
+# the server allows 10 challenges per minute per client
+CHALLENGES_PER_MINUTE = 10
+
+class AsyncApiClient:
+    """ Asyncio client that pipelines challenge fetching, solving and data fetching.
+
+    Challenges are pre-fetched into a small queue at the server's rate limit while earlier
+    ones are solved off the event loop, and all requests share one bounded keep-alive pool.
+    """
+
+    def __init__(self, api_url: str, max_connections: int = 8, concurrency: int = 4,
+                 challenges_per_minute: int = CHALLENGES_PER_MINUTE, backend: str = None, timeout: float = 60.0,
+                 transport=None):
+        self.api_url = api_url
+        self.concurrency = concurrency
+        self.challenge_interval = 60.0 / challenges_per_minute
+        self.backend = backend
+        self._client = httpx.AsyncClient(
+            base_url=api_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+        self._last_challenge = 0.0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def get_challenge(self, batch_size: int = None, entity=None, entities: list = None) -> dict:
+        """ Fetches a challenge, spacing requests to stay within the server's rate limit.
+
+        Passing the entity name or CIK prices the challenge for the size of its facts, passing a
+        batch's entities prices it for their combined size.
+        """
+
+        while True:
+            wait = self._last_challenge + self.challenge_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_challenge = time.monotonic()
+
+            params = {"batch_size": batch_size} if batch_size else {}
+            if entity is not None:
+                params["cik" if isinstance(entity, int) else "entity_name"] = entity
+            try:
+                if entities is not None:
+                    response = await self._client.post("/challenge", json={"entities": list(entities)})
+                else:
+                    response = await self._client.get("/challenge", params=params)
+                if response.status_code == 429:
+                    await asyncio.sleep(float(response.headers.get("Retry-After", self.challenge_interval)))
+                    continue
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                raise RuntimeError(f"Failed to fetch challenge from {self.api_url}: {e}")
+
+            challenge_data = response.json()
+            if not all(k in challenge_data for k in ("challenge_id", "challenge", "difficulty")):
+                raise ValueError("Malformed response: missing keys")
+            return challenge_data
+
+    async def solve(self, challenge_data: dict) -> int:
+        """ Solves a challenge in an executor so the event loop keeps serving other requests. """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, solve_pow, challenge_data["challenge"], challenge_data["difficulty"], self.backend
+        )
+
+    async def fetch_entity(self, entity_name: str, challenge_data: dict = None, filters: dict = None) -> dict:
+        """ Solves a challenge and fetches the facts of a single entity. """
+
+        challenge_data = challenge_data or await self.get_challenge(entity=entity_name)
+        nonce = await self.solve(challenge_data)
+        payload = self._payload(challenge_data, nonce, filters)
+        payload["cik" if isinstance(entity_name, int) else "entity_name"] = entity_name
+        try:
+            response = await self._client.post("/data", json=payload)
+            # an unknown entity is a result, not a failure
+            if response.status_code == 404:
+                return response.json()
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Failed to fetch data from {self.api_url}: {e}")
+
+    async def fetch_batch(self, entities: list, challenge_data: dict = None, filters: dict = None) -> list:
+        """ Solves a batch challenge and fetches one result per entity name or CIK. """
+
+        challenge_data = challenge_data or await self.get_challenge(entities=entities)
+        nonce = await self.solve(challenge_data)
+        payload = self._payload(challenge_data, nonce, filters)
+        payload["entities"] = list(entities)
+        results = []
+        try:
+            async with self._client.stream("POST", "/data/batch", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        results.append(json.loads(line))
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Failed to fetch batch from {self.api_url}: {e}")
+        return results
+
+    async def fetch_many(self, entities: list, batch_size: int = 16, filters: dict = None) -> dict:
+        """ Fetches many entities concurrently, returning a mapping of entity to result.
+
+        A producer keeps up to `concurrency` challenges queued so the next one is already
+        available when a worker finishes solving the previous one. Each challenge is queued with
+        the group it was priced for, since groups of larger facts get harder challenges.
+        """
+        groups = [entities[i:i + batch_size] for i in range(0, len(entities), batch_size)]
+        workers = min(self.concurrency, len(groups))
+        challenges = asyncio.Queue(maxsize=self.concurrency)
+        results = {}
+
+        async def produce():
+            for group in groups:
+                try:
+                    if len(group) > 1:
+                        challenge_data = await self.get_challenge(entities=group)
+                    else:
+                        challenge_data = await self.get_challenge(entity=group[0])
+                except (RuntimeError, ValueError) as e:
+                    # hand the failure to the consumer of this group
+                    challenge_data = RuntimeError(str(e))
+                await challenges.put((group, challenge_data))
+            for _ in range(workers):
+                await challenges.put(None)
+
+        async def consume():
+            while True:
+                item = await challenges.get()
+                if item is None:
+                    return
+                group, challenge_data = item
+                try:
+                    if isinstance(challenge_data, Exception):
+                        raise challenge_data
+                    if len(group) == 1:
+                        results[group[0]] = await self.fetch_entity(group[0], challenge_data, filters)
+                    else:
+                        for result in await self.fetch_batch(group, challenge_data, filters):
+                            results[result["data"]["entity"]] = result
+                except RuntimeError as e:
+                    print(f"[bold red]Error: {e}[/]")
+                    for entity in group:
+                        results.setdefault(entity, None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            await asyncio.gather(*(consume() for _ in range(workers)))
+        finally:
+            producer.cancel()
+        return results
+
+    @staticmethod
+    def _payload(challenge_data: dict, nonce: int, filters: dict = None) -> dict:
+        payload = {
+            "challenge_id": challenge_data["challenge_id"],
+            "challenge": challenge_data["challenge"],
+            "nonce": nonce,
+            "difficulty": challenge_data["difficulty"],
+        }
+        payload.update(filters or {})
+        return payload
+
+async def main(api_url, entities):
+    async with AsyncApiClient(api_url) as client:
+        started = time.perf_counter()
+        results = await client.fetch_many(entities)
+        found = sum(1 for result in results.values() if result and result.get("status") == "success")
+        print(f"[bold green]Fetched {found}/{len(entities)} entities in {time.perf_counter() - started:.2f}s[/]")
+
+if __name__ == "__main__":
+    # usage: async_client.py [api_url] [entity ...]
+    api_url = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:5000"
+    entities = sys.argv[2:] or ["AAR CORP"]
+    asyncio.run(main(api_url, entities))
@@ -0,0 +1,51 @@
+import os
+import json
+import hashlib
+import tempfile
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "company-facts")
+
+class ResponseCache:
+    """ On-disk cache of fetched company facts with the validators the server sent for them. """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(entity, filters: dict = None) -> str:
+        """ Returns the cache key of an entity name or CIK and its request filters. """
+
+        raw = json.dumps({"entity": entity, "filters": filters or {}}, sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        """ Returns the cached {"etag", "last_modified", "data"} record, or None. """
+
+        try:
+            with open(self.path(key), 'r') as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, etag: str, last_modified: str, data: dict):
+        """ Stores a response atomically so concurrent readers never see a partial file. """
+
+        record = {"etag": etag, "last_modified": last_modified, "data": data}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as outfile:
+                json.dump(record, outfile)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,136 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rich import print
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from res.json_tools import flatten_file
+
+datasource_dir = os.path.join(os.path.dirname(__file__), '../datasource')
+output_dir = os.path.join(os.path.dirname(__file__), '../export')
+
+# per-file export log, lets an interrupted export resume where it stopped
+MANIFEST_NAME = "_manifest.jsonl"
+PARTITION_COLUMNS = ("taxonomy", "fy")
+
+def export_file(file_path: str, output_dir: str, partition: str) -> dict:
+    """ Flattens one companyfacts file and writes it as partitioned, dictionary encoded Parquet. """
+
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+
+    # drop parts from a previous export of this file, its partitions may have changed
+    for old_part in glob.glob(os.path.join(output_dir, "*", f"{stem}-*.parquet")):
+        os.remove(old_part)
+
+    df = flatten_file(file_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=output_dir,
+        partition_cols=[partition],
+        basename_template=f"{stem}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        use_dictionary=True,
+        compression="zstd",
+    )
+    return {"rows": table.num_rows}
+
+def load_manifest(output_dir: str) -> dict:
+    """ Returns the exported files as a name -> record mapping, later lines winning. """
+
+    manifest = {}
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, 'r') as infile:
+            for line in infile:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # a torn last line from an interrupted run
+                    continue
+                manifest[record["name"]] = record
+    return manifest
+
+def export_datasource(datasource_dir: str, output_dir: str, partition: str = "taxonomy",
+                      workers: int = None, force: bool = False) -> dict:
+    """
+    Exports every CIK*.json in the datasource to Parquet across a process pool.
+
+    Files whose size and mtime match the manifest are skipped unless force is set.
+
+    Returns:
+        dict: Counts of exported, skipped and failed files and exported rows.
+    """
+    if partition not in PARTITION_COLUMNS:
+        raise ValueError(f"partition must be one of {', '.join(PARTITION_COLUMNS)}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {} if force else load_manifest(output_dir)
+
+    # the partition layout is part of the export, switching it requires a fresh export
+    if any(record.get("partition") != partition for record in manifest.values()):
+        raise ValueError(f"{output_dir} was exported with a different partition, use a new directory or --force")
+
+    pending = []
+    skipped = 0
+    for name in sorted(os.listdir(datasource_dir)):
+        if not (name.startswith("CIK") and name.endswith(".json")):
+            continue
+        stat = os.stat(os.path.join(datasource_dir, name))
+        record = manifest.get(name)
+        if record and record["size"] == stat.st_size and record["mtime"] == stat.st_mtime:
+            skipped += 1
+            continue
+        pending.append((name, stat))
+
+    summary = {"exported": 0, "skipped": skipped, "failed": 0, "rows": 0}
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w' if force else 'a') as manifest_file, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(export_file, os.path.join(datasource_dir, name), output_dir, partition): (name, stat)
+            for name, stat in pending
+        }
+        for future in as_completed(futures):
+            name, stat = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[bold red]Failed to export {name}: {e}[/]")
+                summary["failed"] += 1
+                continue
+
+            summary["exported"] += 1
+            summary["rows"] += result["rows"]
+            record = {"name": name, "size": stat.st_size, "mtime": stat.st_mtime, "partition": partition, "rows": result["rows"]}
+            manifest_file.write(json.dumps(record) + "\n")
+            manifest_file.flush()
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the datasource to partitioned Parquet.")
+    parser.add_argument("--datasource", default=datasource_dir, help="directory with CIK*.json files")
+    parser.add_argument("--output", default=output_dir, help="Parquet dataset directory")
+    parser.add_argument("--partition", default="taxonomy", choices=PARTITION_COLUMNS)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="re-export files already in the manifest")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        summary = export_datasource(args.datasource, args.output, args.partition, args.workers, args.force)
+    except ValueError as e:
+        print(f"[bold red]Error: {e}[/]")
+        return 1
+    elapsed = time.perf_counter() - started
+    print(f"[bold green]Exported {summary['exported']} file(s), {summary['rows']:,} rows "
+          f"({summary['skipped']} unchanged, {summary['failed']} failed) in {elapsed:.2f}s[/]")
+    print(f"[bold magenta]Dataset written to {args.output}[/]")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import hashlib
+import argparse
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from rich import print
+from rich.table import Table
+
+# nonces checked per task handed to a pool worker
+CHUNK_SIZE = 1 << 16
+
+def search_range(challenge: str, difficulty: int, start: int, stop: int):
+    """ Returns the first nonce in [start, stop) solving the challenge, or None. """
+
+    # the challenge prefix is hashed once and its state copied for every nonce
+    prefix = hashlib.sha256(challenge.encode())
+    full_bytes, half_byte = divmod(difficulty, 2)
+    zeros = bytes(full_bytes)
+    for nonce in range(start, stop):
+        hasher = prefix.copy()
+        hasher.update(str(nonce).encode())
+        digest = hasher.digest()
+        if digest[:full_bytes] == zeros and (not half_byte or digest[full_bytes] < 0x10):
+            return nonce
+    return None
+
+class SolverBackend(ABC):
+    """ Interface for proof-of-work solvers, finding a nonce such that
+    sha256(f"{challenge}{nonce}") starts with `difficulty` hex zeros. """
+
+    name = None
+
+    @abstractmethod
+    def solve(self, challenge: str, difficulty: int) -> int:
+        pass
+
+    def close(self):
+        pass
+
+class PythonSolver(SolverBackend):
+    """ Single-threaded solver using a pre-hashed prefix and raw digest comparison. """
+
+    name = "python"
+
+    def solve(self, challenge: str, difficulty: int) -> int:
+        for start in itertools.count(0, CHUNK_SIZE):
+            nonce = search_range(challenge, difficulty, start, start + CHUNK_SIZE)
+            if nonce is not None:
+                return nonce
+
+class ProcessPoolSolver(SolverBackend):
+    """ Solver partitioning the nonce space into chunks searched across a process pool.
+
+    Instances are shared through get_solver, so concurrent solves share the pool but each
+    waits on and cancels only its own chunks.
+    """
+
+    name = "process"
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+        self._solves = []  # the pending chunks of every solve in progress
+
+    def solve(self, challenge: str, difficulty: int) -> int:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            executor = self._executor
+            # keep every worker busy with one queued chunk behind the running one
+            chunks = itertools.count(0, CHUNK_SIZE)
+            pending = {
+                executor.submit(search_range, challenge, difficulty, start, start + CHUNK_SIZE)
+                for start in itertools.islice(chunks, self.workers * 2)
+            }
+            self._solves.append(pending)
+        try:
+            while True:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                found = [future.result() for future in done if future.result() is not None]
+                if found:
+                    return min(found)
+                with self._lock:
+                    pending -= done
+                    for _ in done:
+                        start = next(chunks)
+                        pending.add(executor.submit(search_range, challenge, difficulty, start, start + CHUNK_SIZE))
+        finally:
+            with self._lock:
+                self._solves.remove(pending)
+                cancel(pending)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            for pending in self._solves:
+                cancel(pending)
+        if executor is not None:
+            # shutdown(cancel_futures=True) needs Python 3.9, the image runs 3.8
+            executor.shutdown(wait=False)
+
+def cancel(futures):
+    for future in futures:
+        future.cancel()
+
+BACKENDS = {
+    PythonSolver.name: PythonSolver,
+    ProcessPoolSolver.name: ProcessPoolSolver,
+}
+
+_solvers = {}
+
+def register_backend(backend_class):
+    """ Registers a SolverBackend subclass under its name. """
+
+    BACKENDS[backend_class.name] = backend_class
+    return backend_class
+
+def get_solver(name: str) -> SolverBackend:
+    """ Returns a shared solver instance for a backend name, reusing its pool between solves. """
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown solver backend: {name}. Available: {', '.join(BACKENDS)}")
+    if name not in _solvers:
+        _solvers[name] = BACKENDS[name]()
+    return _solvers[name]
+
+def benchmark(backends, difficulties=range(3, 7), trials: int = 3) -> list:
+    """ Times each backend across difficulties, returning one result dict per combination. """
+
+    results = []
+    for difficulty in difficulties:
+        for name in backends:
+            solver = get_solver(name)
+            timings = []
+            nonces = 0
+            for trial in range(trials):
+                challenge = f"benchmark{difficulty}-{trial}"
+                started = time.perf_counter()
+                nonces += solver.solve(challenge, difficulty) + 1
+                timings.append(time.perf_counter() - started)
+            elapsed = sum(timings)
+            # parallel backends test more nonces than the one returned, so this is the effective rate
+            results.append({
+                "backend": name,
+                "difficulty": difficulty,
+                "mean_seconds": elapsed / trials,
+                "hashes_per_second": nonces / elapsed if elapsed else 0.0,
+            })
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark proof-of-work solver backends.")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), help="backends to compare")
+    parser.add_argument("--min-difficulty", type=int, default=3)
+    parser.add_argument("--max-difficulty", type=int, default=6)
+    parser.add_argument("--trials", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    table = Table(title="Proof-of-work solver benchmark")
+    for column in ("backend", "difficulty", "mean seconds", "hashes/s"):
+        table.add_column(column)
+
+    try:
+        for result in benchmark(args.backends, range(args.min_difficulty, args.max_difficulty + 1), args.trials):
+            table.add_row(
+                result["backend"],
+                str(result["difficulty"]),
+                f"{result['mean_seconds']:.3f}",
+                f"{result['hashes_per_second']:,.0f}"
+            )
+    finally:
+        for solver in _solvers.values():
+            solver.close()
+    print(table)
+
+if __name__ == "__main__":
+    sys.exit(main())
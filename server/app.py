@@ -1,11 +1,21 @@
-from flask import Flask, request, jsonify
-import hashlib
+from flask import Flask, Response, request, jsonify, g
 import time
 import logging
 import os
-import json
-import csv
+import secrets
 from entities import EntityFactory
+from datasource import Datasource, pack_compact_matches, unpack_compact_matches
+from catalog import Catalog
+from cache import FactsCache
+from projection import Projection
+from search import NameIndex, load_tickers
+from difficulty import DifficultyController
+from metrics import Registry, SIZE_BUCKETS
+from challenges import RedisChallenges, StatelessChallenges, RedisReplayGuard, MemoryReplayGuard, CLOCK_SKEW
+from observations import ObservationStore, MAX_PAGE_SIZE
+from service import FactsService, Document, RequestError, entity_lookup, is_int, set_validators, not_modified
+from encoding import RawStream, dumps, encode, iter_encode, pack_matches, unpack_matches
+from encoding import negotiate_encoding, compress, iter_compress
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from redis import Redis
@@ -31,12 +41,193 @@ try:
 except Exception as e:
     print(f"[bold red]Failed to connect to redis: {e}[/]")
 
-# flask-limiter for rate limiting
-limiter = Limiter(get_remote_address, app=app, default_limits=["100 per minute"])
+# gunicorn.conf.py sets the number of worker processes sharing the load of this server
+WORKER_PROCESSES = int(os.environ.get("WEB_CONCURRENCY", 1))
+
+# flask-limiter for rate limiting, counted in redis so the limits hold across worker processes
+RATE_LIMIT_STORAGE_URI = os.environ.get("RATE_LIMIT_STORAGE_URI", "redis://localhost:6379")
+limiter = Limiter(
+    get_remote_address,
+    app=app,
+    default_limits=["100 per minute"],
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    in_memory_fallback_enabled=True
+)
 
 # constants
 CHALLENGE_EXPIRATION = 60; # in seconds
-DATASOURCE_DIR = "../datasource"
+BASE_DIFFICULTY = int(os.environ.get("BASE_DIFFICULTY", 4))
+MAX_BATCH_SIZE = 1000
+MAX_DIFFICULTY = int(os.environ.get("MAX_DIFFICULTY", 7))
+DIFFICULTY_TARGET_RATE = float(os.environ.get("DIFFICULTY_TARGET_RATE", 50)) # requests per second
+DIFFICULTY_TARGET_IN_FLIGHT = int(os.environ.get("DIFFICULTY_TARGET_IN_FLIGHT", 16))
+DIFFICULTY_COST_BYTES = int(os.environ.get("DIFFICULTY_COST_BYTES", 16 * 1024 * 1024))
+CHALLENGE_MODE = os.environ.get("CHALLENGE_MODE", "redis") # "redis" or "hmac"
+CHALLENGE_SECRET = os.environ.get("CHALLENGE_SECRET")
+CHALLENGE_REPLAY_GUARD = os.environ.get("CHALLENGE_REPLAY_GUARD", "redis") # "redis" or "memory"
+DATASOURCE_DIR = os.environ.get("DATASOURCE_DIR", "../datasource")
+CATALOG_PATH = os.environ.get("CATALOG_PATH", "../catalog.db")
+CONCEPT_INDEX_MIN_BYTES = int(os.environ.get("CONCEPT_INDEX_MIN_BYTES", 8 * 1024 * 1024)) # in bytes
+OBSERVATIONS_PATH = os.environ.get("OBSERVATIONS_PATH", "../observations.db")
+TICKERS_PATH = os.environ.get("TICKERS_PATH", "../company_tickers.json")
+SEARCH_MAX_RESULTS = 50
+SEARCH_CACHE_SECONDS = 300
+CHANGES_MAX_RESULTS = 1000
+INDEX_REFRESH_INTERVAL = 5 # in seconds
+FACTS_CACHE_BYTES = int(os.environ.get("FACTS_CACHE_BYTES", 256 * 1024 * 1024))
+FACTS_CACHE_REDIS = os.environ.get("FACTS_CACHE_REDIS", "0") == "1"
+FACTS_CACHE_COMPACT = os.environ.get("FACTS_CACHE_COMPACT", "0") == "1" # columnar facts, sized by memory
+STREAM_THRESHOLD = int(os.environ.get("STREAM_THRESHOLD", 32 * 1024 * 1024)) # in bytes
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_MIMETYPES = {"application/json", "application/x-ndjson"}
+
+# hot path instrumentation, exposed in the Prometheus text format on /metrics; every worker
+# process counts its own requests, so their series are told apart by a worker label
+metrics = Registry(labels={"worker": os.getpid} if WORKER_PROCESSES > 1 else None)
+stage_seconds = metrics.histogram(
+    "companyfacts_stage_seconds", "Time spent in each stage of serving a request.", ("stage",)
+)
+request_seconds = metrics.histogram(
+    "companyfacts_request_seconds", "Time until the response starts, by endpoint and status.", ("endpoint", "status")
+)
+response_bytes = metrics.histogram(
+    "companyfacts_response_bytes", "Size of response bodies with a known length, as sent.", ("endpoint",), SIZE_BUCKETS
+)
+pow_solutions = metrics.counter(
+    "companyfacts_pow_solutions_total", "Submitted proof of work solutions by result.", ("result",)
+)
+
+def stage_timer(stage: str):
+    return stage_seconds.time(stage=stage)
+
+# challenges are stored in redis, or signed so any worker verifies them without a redis round trip
+if CHALLENGE_MODE == "hmac":
+    if CHALLENGE_REPLAY_GUARD == "memory" and WORKER_PROCESSES > 1:
+        raise RuntimeError("CHALLENGE_REPLAY_GUARD=memory lets every worker process accept a solve once, use redis")
+    if not CHALLENGE_SECRET:
+        logger.warning("CHALLENGE_SECRET is not set, challenges are only valid on this worker.")
+    replay_ttl = CHALLENGE_EXPIRATION + CLOCK_SKEW
+    challenges = StatelessChallenges(
+        CHALLENGE_SECRET.encode() if CHALLENGE_SECRET else secrets.token_bytes(32),
+        expiration=CHALLENGE_EXPIRATION,
+        replay_guard=RedisReplayGuard(redis_client, replay_ttl) if CHALLENGE_REPLAY_GUARD == "redis" else MemoryReplayGuard(replay_ttl)
+    )
+else:
+    challenges = RedisChallenges(redis_client, expiration=CHALLENGE_EXPIRATION)
+
+# difficulty rises with the request rate, requests in flight and the size of the requested facts;
+# the targets are for the whole server and each worker process sees its share of the load
+difficulty_controller = DifficultyController(
+    base=BASE_DIFFICULTY,
+    max_difficulty=MAX_DIFFICULTY,
+    target_rate=DIFFICULTY_TARGET_RATE / WORKER_PROCESSES,
+    target_in_flight=max(1, DIFFICULTY_TARGET_IN_FLIGHT // WORKER_PROCESSES),
+    cost_bytes=DIFFICULTY_COST_BYTES
+)
+metrics.gauge("companyfacts_difficulty", "Difficulty issued to unpriced single-entity challenges now.",
+              function=lambda: difficulty_controller.difficulty())
+metrics.gauge("companyfacts_requests_in_flight", "Requests in flight on the PoW endpoints.",
+              function=lambda: difficulty_controller.in_flight)
+metrics.gauge("companyfacts_request_rate", "Average PoW endpoint requests per second.",
+              function=difficulty_controller.rate)
+LOAD_ENDPOINTS = {"get_challenge", "verify_pow", "verify_pow_batch", "query_observations"}
+
+# bounded cache of loaded facts, optionally shared across workers through redis
+facts_cache = FactsCache(
+    FACTS_CACHE_BYTES,
+    redis_client=redis_client if FACTS_CACHE_REDIS else None,
+    dumps=pack_compact_matches if FACTS_CACHE_COMPACT else pack_matches,
+    loads=unpack_compact_matches if FACTS_CACHE_COMPACT else unpack_matches
+)
+
+# entity index over the datasource, warm started from the persistent catalog and refreshed incrementally
+datasource = Datasource(
+    DATASOURCE_DIR,
+    refresh_interval=INDEX_REFRESH_INTERVAL,
+    catalog=Catalog(CATALOG_PATH, concept_min_bytes=CONCEPT_INDEX_MIN_BYTES),
+    cache=facts_cache,
+    timer=stage_timer,
+    compact=FACTS_CACHE_COMPACT
+)
+datasource.index.refresh()
+
+for counter in ("hits", "misses", "evictions", "redis_hits"):
+    metrics.counter(f"companyfacts_facts_cache_{counter}_total", f"Facts cache {counter.replace('_', ' ')}.",
+                    function=lambda counter=counter: getattr(facts_cache, counter))
+metrics.gauge("companyfacts_facts_cache_bytes", "Bytes held by the facts cache.",
+              function=lambda: facts_cache.current_bytes)
+metrics.gauge("companyfacts_indexed_files", "Datasource files in the entity index.",
+              function=lambda: len(datasource.index))
+
+# /challenge and /data handling shared with the async handlers of asgi.py
+service = FactsService(
+    datasource,
+    difficulty_controller,
+    max_batch_size=MAX_BATCH_SIZE,
+    stream_threshold=STREAM_THRESHOLD,
+    timer=stage_timer,
+    pow_solutions=pow_solutions
+)
+
+# precomputed observations for cross-company queries, built with observations.py
+observation_store = ObservationStore(OBSERVATIONS_PATH)
+
+# entity name search, rebuilt whenever the entity index changes
+name_index = NameIndex()
+tickers = load_tickers(TICKERS_PATH)
+name_index.maybe_rebuild(datasource.index, tickers)
+
+# measure the load the difficulty controller reacts to
+@app.before_request
+def track_request_start():
+    g.request_started = time.perf_counter()
+    if request.endpoint in LOAD_ENDPOINTS:
+        difficulty_controller.started()
+
+@app.teardown_request
+def track_request_end(exc):
+    if request.endpoint in LOAD_ENDPOINTS:
+        difficulty_controller.finished()
+
+# registered before compress_response so it runs after it and sees the bytes sent
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or "unknown"
+    if "request_started" in g:
+        request_seconds.observe(time.perf_counter() - g.request_started, endpoint=endpoint, status=response.status_code)
+    if response.content_length is not None:
+        response_bytes.observe(response.content_length, endpoint=endpoint)
+    return response
+
+# compress json responses for clients that accept it
+@app.after_request
+def compress_response(response):
+    """ Content-Encodes JSON responses with the best coding the client accepts. """
+
+    if response.status_code != 200 or response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+
+    # pre-compressed source documents already carry their coding
+    if "Content-Encoding" not in response.headers:
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = iter_compress(response.iter_encoded(), encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < COMPRESS_MIN_BYTES:
+                return response
+            response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+
+    # the ETag identifies the uncoded representation, coded ones only match weakly
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
 
 # sanity check
 @app.route('/sanity', methods=['GET'])
@@ -44,99 +235,301 @@ def sanity_check():
     return jsonify({"status": "healthy"}), 200
 
 # generate challenge
-@app.route('/challenge', methods=['GET'])
+@app.route('/challenge', methods=['GET', 'POST'])
 @limiter.limit("10 per minute")
 def get_challenge():
-    """ Generates a unique challenge with an expiration time. """
+    """ Generates a unique challenge with an expiration time.
 
-    challenge = "datafeed" + str(int(time.time()))
-    challenge_id = hashlib.sha256(challenge.encode()).hexdigest()
-    difficulty = 4
+    A POST with {"entities": [...]} prices a batch challenge for the combined size of their facts.
+    """
+    try:
+        difficulty = service.challenge_difficulty(request.method, request.args, request.get_json(silent=True))
+    except RequestError as e:
+        return jsonify(e.body), e.status
 
-    # store challenge in redis with an expiration
-    redis_client.setex(challenge_id, CHALLENGE_EXPIRATION, challenge)
+    # the difficulty is bound to the challenge, a solution at a lower one is refused
+    with stage_timer("challenge_issue"):
+        challenge_id, challenge = challenges.issue(difficulty)
     logger.info(f"Generated challenge: {challenge_id}, difficulty: {difficulty}")
     return jsonify({"challenge_id": challenge_id, "challenge": challenge, "difficulty": difficulty})
 
+# resolve entity names before spending work on a challenge
+@app.route('/search', methods=['GET'])
+def search_entities():
+    """ Searches entity names, tickers and CIKs with exact, prefix and fuzzy matching. """
+
+    query = request.args.get("q", "").strip()
+    try:
+        limit = min(int(request.args.get("limit", 10)), SEARCH_MAX_RESULTS)
+    except ValueError:
+        return jsonify({"error": "Invalid request format."}), 400
+    if not query or limit < 1:
+        return jsonify({"error": "Invalid request format."}), 400
+
+    name_index.maybe_rebuild(datasource.index, tickers)
+    results = name_index.search(query, limit=limit)
+    response = jsonify(EntityFactory.create_response(
+        "success" if results else "not_found",
+        "Entities found" if results else "No matching entities found.",
+        data={"results": results}
+    ))
+    response.cache_control.public = True
+    response.cache_control.max_age = SEARCH_CACHE_SECONDS
+    return response
+
+# change feed written by ingest.py, clients poll it with the last sequence number they saw
+@app.route('/changes', methods=['GET'])
+def datasource_changes():
+    """ Returns the datasource changes recorded after the sequence number since, oldest first. """
+
+    try:
+        since = int(request.args.get("since", 0))
+        limit = min(int(request.args.get("limit", CHANGES_MAX_RESULTS)), CHANGES_MAX_RESULTS)
+    except ValueError:
+        return jsonify({"error": "Invalid request format."}), 400
+    if since < 0 or limit < 1:
+        return jsonify({"error": "Invalid request format."}), 400
+
+    changes = datasource.index.catalog.changes_since(since, limit)
+    response = jsonify(EntityFactory.create_response(
+        "success",
+        f"{len(changes)} change(s) since {since}",
+        data={"changes": changes, "next": changes[-1]["seq"] if changes else since}
+    ))
+    response.cache_control.no_cache = True
+    return response
+
+# prometheus scrape target
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+def prometheus_metrics():
+    """ Returns every metric in the Prometheus text exposition format. """
+
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# current difficulty and the load behind it
+@app.route('/difficulty', methods=['GET'])
+def difficulty_state():
+    """ Returns the state of the difficulty controller. """
+
+    response = jsonify(difficulty_controller.state())
+    response.cache_control.no_store = True
+    return response
+
+def verify_challenge(challenge_id, challenge):
+    """ Returns the difficulty the challenge was issued with, or None if it is unknown or expired. """
+
+    with stage_timer("challenge_verify"):
+        return challenges.verify(challenge_id, challenge)
+
+def document_response(document: Document) -> Response:
+    return Response(document.body, status=document.status, headers=document.headers, mimetype=document.mimetype)
+
 # verify pow and provide data
 @app.route('/data', methods=['POST'])
 def verify_pow():
     """ Validates the proof of work solution and returns data. """
 
-    data = request.json
+    try:
+        data_request = service.parse_data_request(request.get_json(silent=True))
+        issued_difficulty = verify_challenge(data_request.challenge_id, data_request.challenge)
+        payload_size = service.check_data_solution(data_request, issued_difficulty)
+    except RequestError as e:
+        return jsonify(e.body), e.status
+
+    logger.info(f"Valid PoW solution received for challenge: {data_request.challenge_id}")
+    if not challenges.consume(data_request.challenge_id):
+        logger.warning("Challenge already used.")
+        return jsonify({"error": "Challenge already used"}), 400
+
+    return document_response(service.data_document(
+        data_request, payload_size, request.if_none_match, request.accept_encodings
+    ))
+
+# check cached data without a proof of work
+@app.route('/data/revalidate', methods=['POST'])
+def revalidate():
+    """ Answers 304 if the client's ETag for an entity is still current, so unchanged data needs no new PoW. """
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid request format."}), 400
+    entity_name = data.get("entity_name")
+    cik = data.get("cik")
+
+    # a CIK must be an int, as for /data
+    if cik is not None and not is_int(cik):
+        return jsonify({"error": "Invalid request format."}), 400
+    if not entity_name and cik is None:
+        return jsonify({"error": "Invalid request format."}), 400
+
+    try:
+        Projection.from_request(data)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid request format: {e}"}), 400
+
+    validators = service.entity_validators(data, entity_name=entity_name, cik=cik)
+    if validators is None:
+        return jsonify(EntityFactory.create_response("not_found", "No matching entities found.")), 404
+    if request.if_none_match.contains_weak(validators[0]):
+        return document_response(not_modified(validators))
+
+    return document_response(set_validators(Document.json(EntityFactory.create_response(
+        "modified",
+        "Entity data has changed.",
+        data={"etag": validators[0]}
+    )), validators))
+
+# verify pow and provide data for many entities
+@app.route('/data/batch', methods=['POST'])
+def verify_pow_batch():
+    """ Validates the proof of work solution and streams data for a list of entities as NDJSON. """
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        logger.warning("Invalid request format.")
+        return jsonify({"error": "Invalid request format."}), 400
     challenge_id = data.get("challenge_id")
     challenge = data.get("challenge")
     nonce = data.get("nonce")
     difficulty = data.get("difficulty")
-    entity_name = data.get("entity_name")
+    entities = data.get("entities")
+
+    # validate inputs, entities are entity names or CIKs
+    if not all([challenge_id, challenge, is_int(nonce), is_int(difficulty)]):
+        logger.warning("Invalid request format.")
+        return jsonify({"error": "Invalid request format."}), 400
+
+    try:
+        projection = Projection.from_request(data)
+    except ValueError as e:
+        logger.warning(f"Invalid projection: {e}")
+        return jsonify({"error": f"Invalid request format: {e}"}), 400
+
+    try:
+        service.check_batch(entities)
+        # the work must scale with the batch size and the combined size of its facts
+        service.check_difficulty(
+            difficulty,
+            service.batch_required(entities),
+            "Difficulty too low for batch, request a challenge for these entities."
+        )
+        service.check_challenge(difficulty, verify_challenge(challenge_id, challenge))
+        service.check_pow(challenge, nonce, difficulty)
+    except RequestError as e:
+        return jsonify(e.body), e.status
+
+    if not challenges.consume(challenge_id):
+        logger.warning("Challenge already used.")
+        return jsonify({"error": "Challenge already used"}), 400
+
+    logger.info(f"Valid PoW solution received for batch of {len(entities)}, challenge: {challenge_id}")
+
+    def generate():
+        for entity in entities:
+            lookup = entity_lookup(entity)
+            try:
+                if projection is not None:
+                    found = datasource.find_projected(projection, **lookup)
+                else:
+                    found = datasource.find_stream(**lookup)
+
+                matches = [
+                    EntityFactory.create_company_facts(company_name=company_name, facts=facts)
+                    for company_name, facts in found
+                ]
+                if matches:
+                    line = EntityFactory.create_response(
+                        "success",
+                        "Entity matches retrieved",
+                        data={"entity": entity, "matches": matches}
+                    )
+                else:
+                    line = EntityFactory.create_response(
+                        "not_found",
+                        "No matching entities found.",
+                        data={"entity": entity}
+                    )
+                yield from iter_encode(line)
+            except Exception as e:
+                logger.error(f"Failed to read datasource for {entity}: {e}")
+                yield encode(EntityFactory.create_response("error", "Failed to fetch data.", data={"entity": entity}))
+            yield b"\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+# verify pow and query observations across companies
+@app.route('/observations', methods=['POST'])
+def query_observations():
+    """ Validates the proof of work solution and streams one page of observations of a concept across companies. """
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        logger.warning("Invalid request format.")
+        return jsonify({"error": "Invalid request format."}), 400
+    challenge_id = data.get("challenge_id")
+    challenge = data.get("challenge")
+    nonce = data.get("nonce")
+    difficulty = data.get("difficulty")
+    concept = data.get("concept")
 
     # validate inputs
-    if not all([challenge_id, challenge, isinstance(nonce, int), isinstance(difficulty, int)]):
+    if not all([challenge_id, challenge, is_int(nonce), is_int(difficulty)]) \
+            or not isinstance(concept, str) or "." not in concept:
+        logger.warning("Invalid request format.")
+        return jsonify({"error": "Invalid request format."}), 400
+
+    filters = {key: data.get(key) for key in ("fy", "cik", "fp", "unit", "form", "start", "end")}
+    limit = data.get("limit", 1000)
+    cursor = data.get("cursor", 0)
+    if not all(is_int(filters[key]) for key in ("fy", "cik") if filters[key] is not None) \
+            or not all(isinstance(filters[key], str) for key in ("fp", "unit", "form", "start", "end") if filters[key] is not None) \
+            or not is_int(limit) or not is_int(cursor) or limit < 1:
         logger.warning("Invalid request format.")
         return jsonify({"error": "Invalid request format."}), 400
-    
-    # check if the challenge is valid AND not expired
-    stored_challenge = redis_client.get(challenge_id)
-    if not stored_challenge or stored_challenge.decode() != challenge:
-        logger.warning("Challenge expired or invalid.")
-        return jsonify({"error": "Challenge expired or invalid"}), 400
-    
-    # verify proof of work
-    hash_value = hashlib.sha256(f"{challenge}{nonce}".encode()).hexdigest()
-    if hash_value.startswith("0" * difficulty):
-        logger.info(f"Valid PoW solution received for challenge: {challenge_id}")
 
+    # the challenge is kept for a retry once the store is built
+    if not observation_store.exists():
+        return jsonify(EntityFactory.create_response("error", "Observation store is not built.")), 503
+
+    try:
+        service.check_challenge(difficulty, verify_challenge(challenge_id, challenge))
+        service.check_pow(challenge, nonce, difficulty)
+    except RequestError as e:
+        return jsonify(e.body), e.status
+
+    if not challenges.consume(challenge_id):
+        logger.warning("Challenge already used.")
+        return jsonify({"error": "Challenge already used"}), 400
+
+    limit = min(limit, MAX_PAGE_SIZE)
+    page = {"last": None, "count": 0}
+
+    def rows():
+        # rows are encoded as they come off the sqlite cursor
+        separator = b"["
+        for row in observation_store.query(concept, limit=limit, cursor=cursor, **filters):
+            page["last"] = row["cursor"]
+            page["count"] += 1
+            yield separator + dumps(row)
+            separator = b","
+        yield b"]" if separator == b"," else b"[]"
+
+    def next_cursor():
+        # a short page is the last one
+        yield dumps(page["last"] if page["count"] == limit else None)
+
+    def generate():
         try:
-            files = os.listdir(DATASOURCE_DIR)
-            if not files:
-                return jsonify(EntityFactory.create_response("Error", "Invalid request format.")), 400
-            
-            # list of entityName file matches
-            matches = []
-
-            for file_name in files:
-                file_path = os.path.join(DATASOURCE_DIR, file_name)
-                try:
-                    with open(file_path, 'r') as infile:
-                        if file_path.endswith('.json'):
-                            file_data = json.load(infile)
-                            if file_data.get("entityName") == entity_name:
-                                matches.append(EntityFactory.create_company_facts(
-                                    company_name=file_data.get("entityName"),
-                                    facts=file_data.get("facts", {})
-                                ))
-                        elif file_path.endswith('.csv'):
-                            reader = csv.DictReader(infile)
-                            for row in reader:
-                                if row.get("entityName") == entity_name:
-                                    matches.append(EntityFactory.create_company_facts(
-                                        company_name=row.get("entityName"),
-                                        facts=row
-                                    ))
-                        else:
-                            logger.warning(f"Unsupported file format: {file_name}")
-                except Exception as e:
-                    logger.error(f"Error reading file {file_name}: {e}")
-
-            if matches:
-                return jsonify(EntityFactory.create_response(
-                    "success",
-                    "Entity matches retrieved",
-                    data={"matches": matches}
-                ))
-            else:
-                return jsonify(EntityFactory.create_response(
-                    "not_found",
-                    "No matching entities found."
-                )), 404
-            
+            yield from iter_encode(EntityFactory.create_response(
+                "success",
+                "Observations retrieved",
+                data={"concept": concept, "observations": RawStream(rows()), "next_cursor": RawStream(next_cursor())}
+            ))
         except Exception as e:
-            logger.error(f"Failed to read datasource: {e}")
-            return jsonify(EntityFactory.create_response("error", "Failed to fetch data.")), 500
-    
-    else:
-        logger.warning("Invalid PoW solution.")
-        return jsonify(EntityFactory.create_response("error", "Invalid PoW solution.")), 400
-    
+            logger.error(f"Failed to query observations for {concept}: {e}")
+
+    return Response(generate(), mimetype="application/json")
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
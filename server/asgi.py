@@ -0,0 +1,317 @@
+# ASGI serving mode: /challenge and /data are served by async handlers: Redis is reached through the asyncio client
+# and index lookups, file reads, parsing, serialization and compression run on bounded thread
+# pools, so a process holds many waiting PoW clients while a large read only occupies a pool
+# worker. The handlers call the same FactsService as the Flask routes of app.py, only the
+# challenge store differs; every other route is forwarded to the Flask app, whose datasource,
+# caches, difficulty controller and metrics are shared with the async handlers.
+#
+# run from the server directory with an ASGI server, e.g. uvicorn asgi:app --host 0.0.0.0 --port 5000
+import io
+import os
+import sys
+import time
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+from limits import parse as parse_limit
+from limits.aio.storage import MemoryStorage
+from limits.aio.strategies import FixedWindowRateLimiter
+from redis.asyncio import Redis as AsyncRedis
+from werkzeug.http import parse_accept_header, parse_etags
+import app as wsgi
+from service import Document, RequestError
+from challenges import AsyncRedisChallenges, AsyncRedisReplayGuard, StatelessChallenges
+from encoding import encode, loads, negotiate_encoding, compress, iter_compress
+
+logger = logging.getLogger()
+
+# index lookups are quick but may refresh the index, they get their own pool so they never
+# queue behind reads; forwarded flask requests run on a pool like the threaded flask server
+ASGI_READ_WORKERS = int(os.environ.get("ASGI_READ_WORKERS", 4))
+ASGI_LOOKUP_WORKERS = int(os.environ.get("ASGI_LOOKUP_WORKERS", 2))
+ASGI_WSGI_WORKERS = int(os.environ.get("ASGI_WSGI_WORKERS", 8))
+
+read_pool = ThreadPoolExecutor(max_workers=ASGI_READ_WORKERS, thread_name_prefix="read")
+lookup_pool = ThreadPoolExecutor(max_workers=ASGI_LOOKUP_WORKERS, thread_name_prefix="lookup")
+wsgi_pool = ThreadPoolExecutor(max_workers=ASGI_WSGI_WORKERS, thread_name_prefix="wsgi")
+
+# async redis for challenges, keyed like the sync client of the flask routes
+redis_client = AsyncRedis(host="localhost", port=6379, db=0)
+
+# hmac challenges keep the flask app's secret and, for the memory guard, its replay guard
+if isinstance(wsgi.challenges, StatelessChallenges):
+    replay_guard = wsgi.challenges.replay_guard
+    if wsgi.CHALLENGE_REPLAY_GUARD == "redis":
+        replay_guard = AsyncRedisReplayGuard(redis_client, replay_guard.ttl, replay_guard.key_prefix)
+    challenges = StatelessChallenges(wsgi.challenges.secret, wsgi.challenges.expiration, replay_guard)
+else:
+    challenges = AsyncRedisChallenges(redis_client, expiration=wsgi.CHALLENGE_EXPIRATION)
+
+# the same limits flask-limiter applies to these routes
+rate_limiter = FixedWindowRateLimiter(MemoryStorage())
+RATE_LIMITS = {
+    "get_challenge": parse_limit("10 per minute"),
+    "verify_pow": parse_limit("100 per minute"),
+}
+
+class Request:
+    """ The parts of an ASGI http request the handlers need. """
+
+    def __init__(self, scope, body: bytes):
+        self.scope = scope
+        self.body = body
+        self.args = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+        self.headers = {}
+        for name, value in scope["headers"]:
+            name = name.decode("latin-1").lower()
+            value = value.decode("latin-1")
+            self.headers[name] = f"{self.headers[name]}, {value}" if name in self.headers else value
+        self.method = scope["method"]
+        self.remote_addr = (scope.get("client") or ("127.0.0.1", 0))[0]
+        self.accept_encodings = parse_accept_header(self.headers.get("accept-encoding"))
+        self.if_none_match = parse_etags(self.headers.get("if-none-match"))
+
+    def json(self):
+        """ Returns the decoded JSON body, or None if it is missing or invalid. """
+
+        try:
+            return loads(self.body)
+        except ValueError:
+            return None
+
+class Response:
+    """ Status, headers and a body of bytes or an iterator of byte chunks. """
+
+    def __init__(self, body=b"", status: int = 200, mimetype: str = "application/json", headers=None):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = dict(headers or {})
+        if mimetype is not None:
+            self.headers.setdefault("Content-Type", mimetype)
+
+def json_response(obj, status: int = 200) -> Response:
+    return Response(encode(obj), status)
+
+def error(message: str, status: int = 400) -> Response:
+    return json_response({"error": message}, status)
+
+async def resolve(value):
+    """ Awaits the results of challenge stores and replay guards that are async. """
+
+    return await value if inspect.isawaitable(value) else value
+
+async def run(pool, function, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(pool, lambda: function(*args, **kwargs))
+
+async def iterate(chunks, pool):
+    """ Yields the chunks of a sync iterator, each one produced on the pool. """
+
+    done = object()
+    chunks = iter(chunks)
+    try:
+        while True:
+            chunk = await run(pool, next, chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            await run(pool, close)
+
+def document_response(document: Document) -> Response:
+    return Response(document.body, document.status, document.mimetype, document.headers)
+
+# generate challenge
+async def get_challenge(request: Request) -> Response:
+    """ Generates a unique challenge with an expiration time. """
+
+    try:
+        difficulty = await run(lookup_pool, wsgi.service.challenge_difficulty, request.method, request.args, request.json())
+    except RequestError as e:
+        return json_response(e.body, e.status)
+
+    with wsgi.stage_timer("challenge_issue"):
+        challenge_id, challenge = await resolve(challenges.issue(difficulty))
+    logger.info(f"Generated challenge: {challenge_id}, difficulty: {difficulty}")
+    return json_response({"challenge_id": challenge_id, "challenge": challenge, "difficulty": difficulty})
+
+# verify pow and provide data
+async def verify_pow(request: Request) -> Response:
+    """ Validates the proof of work solution and returns data. """
+
+    service = wsgi.service
+    try:
+        data_request = service.parse_data_request(request.json())
+        with wsgi.stage_timer("challenge_verify"):
+            issued_difficulty = await resolve(challenges.verify(data_request.challenge_id, data_request.challenge))
+        payload_size = await run(lookup_pool, service.check_data_solution, data_request, issued_difficulty)
+    except RequestError as e:
+        return json_response(e.body, e.status)
+
+    logger.info(f"Valid PoW solution received for challenge: {data_request.challenge_id}")
+    if not await resolve(challenges.consume(data_request.challenge_id)):
+        logger.warning("Challenge already used.")
+        return error("Challenge already used")
+
+    return document_response(await run(
+        read_pool, service.data_document, data_request, payload_size, request.if_none_match, request.accept_encodings
+    ))
+
+async def compress_response(request: Request, response: Response):
+    """ Content-Encodes JSON responses like app.compress_response, compressing on the read pool. """
+
+    if response.status != 200 or response.mimetype not in wsgi.COMPRESS_MIMETYPES:
+        return
+    response.headers["Vary"] = "Accept-Encoding"
+
+    if "Content-Encoding" not in response.headers:
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding is None:
+            return
+        if isinstance(response.body, bytes):
+            if len(response.body) < wsgi.COMPRESS_MIN_BYTES:
+                return
+            response.body = await run(read_pool, compress, response.body, encoding)
+        else:
+            response.body = iter_compress(response.body, encoding)
+        response.headers["Content-Encoding"] = encoding
+
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response.headers["ETag"] = "W/" + etag
+
+async def send_response(send, response: Response, endpoint: str, started: float):
+    body = response.body
+    if isinstance(body, bytes):
+        response.headers["Content-Length"] = str(len(body))
+    headers = [(name.lower().encode("latin-1"), str(value).encode("latin-1")) for name, value in response.headers.items()]
+
+    await send({"type": "http.response.start", "status": response.status, "headers": headers})
+    wsgi.request_seconds.observe(time.perf_counter() - started, endpoint=endpoint, status=response.status)
+
+    if isinstance(body, bytes):
+        wsgi.response_bytes.observe(len(body), endpoint=endpoint)
+        await send({"type": "http.response.body", "body": body})
+        return
+    try:
+        async for chunk in iterate(body, read_pool):
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    except Exception as e:
+        # headers are already sent, the truncated body signals the failure to the client
+        logger.error(f"Failed to stream response: {e}")
+    await send({"type": "http.response.body", "body": b""})
+
+ROUTES = {
+    ("GET", "/challenge"): ("get_challenge", get_challenge),
+    ("POST", "/challenge"): ("get_challenge", get_challenge),
+    ("POST", "/data"): ("verify_pow", verify_pow),
+}
+
+async def app(scope, receive, send):
+    """ The ASGI application. """
+
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    route = ROUTES.get((scope["method"], scope["path"]))
+    if route is None:
+        return await forward(scope, receive, send)
+
+    endpoint, handler = route
+    started = time.perf_counter()
+    request = Request(scope, await read_body(receive))
+    if wsgi.limiter.enabled and not await rate_limiter.hit(RATE_LIMITS[endpoint], request.remote_addr, endpoint):
+        return await send_response(send, error("Too many requests.", 429), endpoint, started)
+
+    wsgi.difficulty_controller.started()
+    try:
+        response = await handler(request)
+        await compress_response(request, response)
+        await send_response(send, response, endpoint, started)
+    finally:
+        wsgi.difficulty_controller.finished()
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+async def forward(scope, receive, send):
+    """ Serves a request with the flask app on the wsgi pool. """
+
+    environ = wsgi_environ(scope, await read_body(receive))
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+        return lambda data: None
+
+    chunks = await run(wsgi_pool, wsgi.app, environ, start_response)
+    await send({"type": "http.response.start", "status": started["status"], "headers": started["headers"]})
+    async for chunk in iterate(chunks, wsgi_pool):
+        if chunk:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+def wsgi_environ(scope, body: bytes) -> dict:
+    """ Returns the WSGI environ for an ASGI http scope and its body. """
+
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("127.0.0.1", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            continue
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await redis_client.ping()
+                logger.info("Async redis connection successful.")
+            except Exception as e:
+                logger.error(f"Failed to connect to redis: {e}")
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await redis_client.aclose()
+            for pool in (read_pool, lookup_pool, wsgi_pool):
+                pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import weakref
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger()
+
+# entries are only updated in short sections under the lock, a worker is forked outside of them
+# so it never inherits a half-updated LRU order
+_caches = weakref.WeakSet()
+_forking = []
+
+def _before_fork():
+    _forking[:] = list(_caches)
+    for cache in _forking:
+        cache._lock.acquire()
+
+def _after_fork():
+    for cache in _forking:
+        cache._lock.release()
+    _forking.clear()
+
+os.register_at_fork(before=_before_fork, after_in_parent=_after_fork, after_in_child=_after_fork)
+
+class FactsCache:
+    """ LRU cache of loaded company facts bounded by total payload bytes.
+
+    Entries are keyed by (path, mtime, entity_name) so a modified source file is never served
+    stale. The size of an entry is the byte size of its source payload unless the loader sizes it.
+    An optional Redis tier shares loaded payloads across worker processes.
+    """
+
+    def __init__(self, max_bytes: int, redis_client=None, redis_ttl: int = 3600, key_prefix: str = "facts:",
+                 dumps=json.dumps, loads=json.loads):
+        self.max_bytes = max_bytes
+        self.redis_client = redis_client
+        self.dumps = dumps
+        self.loads = loads
+        self.redis_ttl = redis_ttl
+        self.key_prefix = key_prefix
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.redis_hits = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """ Returns the cached value for key, or None. """
+
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, size: int):
+        """ Stores a value, evicting least recently used entries to stay within max_bytes. """
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, size):
+        """ Returns the cached value for key, loading it through the Redis tier or loader on a miss.
+
+        size is the entry's size, or a function returning the size of the loaded value.
+        """
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = self._redis_get(key)
+        if value is None:
+            value = loader()
+            self._redis_put(key, value)
+        else:
+            self.redis_hits += 1
+
+        self.put(key, value, size(value) if callable(size) else size)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """ Returns the cache counters. """
+
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "redis_hits": self.redis_hits,
+        }
+
+    def _redis_key(self, key) -> str:
+        return self.key_prefix + ":".join(str(part) for part in key)
+
+    def _redis_get(self, key):
+        if self.redis_client is None:
+            return None
+        try:
+            raw = self.redis_client.get(self._redis_key(key))
+            return self.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning(f"Redis cache read failed: {e}")
+            return None
+
+    def _redis_put(self, key, value):
+        if self.redis_client is None:
+            return
+        try:
+            self.redis_client.setex(self._redis_key(key), self.redis_ttl, self.dumps(value))
+        except Exception as e:
+            logger.warning(f"Redis cache write failed: {e}")
@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import mmap
+import time
+import sqlite3
+import hashlib
+import argparse
+import logging
+from array import array
+from index import EntityIndex, IndexEntry, FileRecord, source_encoding
+from projection import concept_offsets
+
+logger = logging.getLogger()
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# json facts at least this large get a concept offset index for projected reads
+CONCEPT_INDEX_MIN_BYTES = 8 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT,
+    concepts INTEGER
+);
+CREATE TABLE IF NOT EXISTS entities (
+    name TEXT NOT NULL REFERENCES files(name) ON DELETE CASCADE,
+    entity_name TEXT,
+    cik INTEGER,
+    kind TEXT NOT NULL,
+    offset INTEGER,
+    length INTEGER,
+    rows BLOB
+);
+CREATE INDEX IF NOT EXISTS entities_by_file ON entities(name);
+CREATE TABLE IF NOT EXISTS concepts (
+    name TEXT NOT NULL REFERENCES files(name) ON DELETE CASCADE,
+    taxonomy TEXT NOT NULL,
+    concept TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS concepts_by_file ON concepts(name, taxonomy, concept);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ingested REAL NOT NULL,
+    name TEXT NOT NULL,
+    cik INTEGER,
+    entity_name TEXT,
+    change TEXT NOT NULL,
+    sha256 TEXT,
+    concepts TEXT,
+    accessions TEXT
+);
+CREATE TABLE IF NOT EXISTS staged_changes (
+    name TEXT PRIMARY KEY,
+    change TEXT NOT NULL
+);
+"""
+
+CHANGE_FIELDS = ("seq", "ingested", "name", "cik", "entity_name", "change", "sha256", "concepts", "accessions")
+
+def file_hash(path: str) -> str:
+    """ Returns the sha256 hex digest of a file's contents. """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def scan_concepts(path: str, offset: int, length: int) -> list:
+    """ Returns the byte ranges of the concepts of a json file's facts value, see concept_offsets. """
+
+    with open(path, 'rb') as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return concept_offsets(mapped[offset:offset + length], offset)
+
+class Catalog:
+    """ Persistent SQLite catalog of the datasource, used to warm start an EntityIndex.
+
+    Plain json files whose facts are at least concept_min_bytes also get the byte range of every
+    concept catalogued, so a projection reads only the concepts it selects.
+    """
+
+    def __init__(self, path: str, concept_min_bytes: int = CONCEPT_INDEX_MIN_BYTES):
+        self.path = path
+        self.concept_min_bytes = concept_min_bytes
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SCHEMA)
+        # catalogs written before CSV rows were indexed
+        if "rows" not in {column[1] for column in conn.execute("PRAGMA table_info(entities)")}:
+            conn.execute("ALTER TABLE entities ADD COLUMN rows BLOB")
+        # and before concepts were
+        if "concepts" not in {column[1] for column in conn.execute("PRAGMA table_info(files)")}:
+            conn.execute("ALTER TABLE files ADD COLUMN concepts INTEGER")
+        return conn
+
+    def load(self, datasource_dir: str) -> dict:
+        """ Loads every catalogued file as a path -> FileRecord mapping. """
+
+        if not os.path.exists(self.path):
+            return {}
+
+        files = {}
+        conn = self.connect()
+        try:
+            for name, size, mtime, sha256 in conn.execute("SELECT name, size, mtime, sha256 FROM files"):
+                files[os.path.join(datasource_dir, name)] = FileRecord(mtime, size, [], sha256)
+            for name, entity_name, cik, kind, offset, length, rows in conn.execute(
+                "SELECT name, entity_name, cik, kind, offset, length, rows FROM entities"
+            ):
+                path = os.path.join(datasource_dir, name)
+                record = files.get(path)
+                if record is not None:
+                    rows = array('q', rows) if rows is not None else None
+                    record.entries.append(
+                        IndexEntry(entity_name, cik, path, kind, offset, length, record.size, record.mtime, rows)
+                    )
+        finally:
+            conn.close()
+
+        logger.info(f"Loaded catalog with {len(files)} file(s) from {self.path}")
+        return files
+
+    def save(self, datasource_dir: str, updated: dict, removed=()):
+        """ Persists (re)indexed files, hashing their contents, and drops removed ones. """
+
+        conn = self.connect()
+        try:
+            with conn:
+                for path in removed:
+                    conn.execute("DELETE FROM files WHERE name = ?", (os.path.relpath(path, datasource_dir),))
+
+                for path, record in updated.items():
+                    name = os.path.relpath(path, datasource_dir)
+                    if record.sha256 is None:
+                        record.sha256 = file_hash(path)
+                    conn.execute("DELETE FROM files WHERE name = ?", (name,))
+                    concepts = self.scan_concepts(path, record)
+                    conn.execute(
+                        "INSERT INTO files (name, size, mtime, sha256, concepts) VALUES (?, ?, ?, ?, ?)",
+                        (name, record.size, record.mtime, record.sha256, len(concepts) if concepts is not None else None)
+                    )
+                    conn.executemany(
+                        "INSERT INTO concepts (name, taxonomy, concept, offset, length) VALUES (?, ?, ?, ?, ?)",
+                        [(name,) + concept for concept in concepts or ()]
+                    )
+                    conn.executemany(
+                        "INSERT INTO entities (name, entity_name, cik, kind, offset, length, rows) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (name, e.entity_name, e.cik, e.kind, e.offset, e.length,
+                             e.rows.tobytes() if e.rows is not None else None)
+                            for e in record.entries
+                        ]
+                    )
+        finally:
+            conn.close()
+
+    def scan_concepts(self, path: str, record):
+        """ Returns the concept byte ranges of a large plain json file, or None if it gets no concept index. """
+
+        # compressed sources cannot be read at an offset
+        if len(record.entries) != 1 or source_encoding(path) is not None:
+            return None
+        entry = record.entries[0]
+        if entry.kind != "json" or entry.offset is None or entry.length < self.concept_min_bytes:
+            return None
+        try:
+            return scan_concepts(path, entry.offset, entry.length)
+        except Exception as e:
+            logger.error(f"Error indexing concepts of {os.path.basename(path)}: {e}")
+            return None
+
+    def concept_ranges(self, datasource_dir: str, path: str, mtime: float, taxonomies=(), concepts=()):
+        """ Returns the catalogued (taxonomy, concept, offset, length) ranges of the selected concepts,
+        ordered by offset, or None if the file has no concept index for this mtime.
+
+        Args:
+            taxonomies: Taxonomies selected as a whole.
+            concepts: (taxonomy, concept) pairs selected individually.
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        name = os.path.relpath(path, datasource_dir)
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT concepts FROM files WHERE name = ? AND mtime = ?", (name, mtime)).fetchone()
+            if row is None or row[0] is None:
+                return None
+
+            ranges = set()
+            for taxonomy in taxonomies:
+                ranges.update(conn.execute(
+                    "SELECT taxonomy, concept, offset, length FROM concepts WHERE name = ? AND taxonomy = ?",
+                    (name, taxonomy)
+                ))
+            for taxonomy, concept in concepts:
+                ranges.update(conn.execute(
+                    "SELECT taxonomy, concept, offset, length FROM concepts WHERE name = ? AND taxonomy = ? AND concept = ?",
+                    (name, taxonomy, concept)
+                ))
+        finally:
+            conn.close()
+        return sorted(ranges, key=lambda concept: concept[2])
+
+    def hashes(self) -> dict:
+        """ Returns the content hash of every catalogued file as a name -> sha256 mapping. """
+
+        if not os.path.exists(self.path):
+            return {}
+        conn = self.connect()
+        try:
+            return dict(conn.execute("SELECT name, sha256 FROM files"))
+        finally:
+            conn.close()
+
+    def stage_change(self, change: dict):
+        """ Keeps a change about to be applied, so a run interrupted before recording it can tell
+        from the file on disk whether it was applied. """
+
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO staged_changes (name, change) VALUES (?, ?)",
+                             (change["name"], json.dumps(change)))
+        finally:
+            conn.close()
+
+    def staged_changes(self) -> list:
+        """ Returns the staged changes that were neither recorded nor discarded. """
+
+        if not os.path.exists(self.path):
+            return []
+        conn = self.connect()
+        try:
+            return [json.loads(change) for change, in conn.execute("SELECT change FROM staged_changes ORDER BY rowid")]
+        finally:
+            conn.close()
+
+    def discard_change(self, name: str):
+        """ Drops the staged change of a file that was not applied. """
+
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM staged_changes WHERE name = ?", (name,))
+        finally:
+            conn.close()
+
+    def record_changes(self, changes: list, ingested: float = None):
+        """ Appends applied changes to the change feed, dropping their staged copies.
+
+        Each change is a dict with name, cik, entity_name, change ("added", "modified" or "removed"),
+        sha256 and the lists of changed concepts and added accession numbers.
+        """
+        ingested = time.time() if ingested is None else ingested
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany("DELETE FROM staged_changes WHERE name = ?", [(change["name"],) for change in changes])
+                conn.executemany(
+                    "INSERT INTO changes (ingested, name, cik, entity_name, change, sha256, concepts, accessions) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (ingested, change["name"], change.get("cik"), change.get("entity_name"), change["change"],
+                         change.get("sha256"), json.dumps(change.get("concepts", [])), json.dumps(change.get("accessions", [])))
+                        for change in changes
+                    ]
+                )
+        finally:
+            conn.close()
+
+    def changes_since(self, since: int = 0, limit: int = 1000) -> list:
+        """ Returns up to limit changes recorded after the sequence number since, oldest first. """
+
+        if not os.path.exists(self.path):
+            return []
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(CHANGE_FIELDS)} FROM changes WHERE seq > ? ORDER BY seq LIMIT ?", (since, limit)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # catalogs written before changes were recorded
+            return []
+        finally:
+            conn.close()
+
+        changes = []
+        for row in rows:
+            change = dict(zip(CHANGE_FIELDS, row))
+            change["concepts"] = json.loads(change["concepts"] or "[]")
+            change["accessions"] = json.loads(change["accessions"] or "[]")
+            changes.append(change)
+        return changes
+
+def build(datasource_dir: str, catalog_path: str, rebuild: bool = False,
+          concept_min_bytes: int = CONCEPT_INDEX_MIN_BYTES) -> int:
+    """ Builds or incrementally updates the catalog for a datasource directory. """
+
+    if rebuild and os.path.exists(catalog_path):
+        os.remove(catalog_path)
+
+    index = EntityIndex(datasource_dir, catalog=Catalog(catalog_path, concept_min_bytes))
+    return index.refresh()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the persistent datasource catalog.")
+    parser.add_argument("--datasource", default="../datasource", help="datasource directory")
+    parser.add_argument("--catalog", default="../catalog.db", help="catalog file to write")
+    parser.add_argument("--rebuild", action="store_true", help="discard the existing catalog first")
+    parser.add_argument("--concept-min-bytes", type=int, default=CONCEPT_INDEX_MIN_BYTES,
+                        help="index the concepts of json facts at least this large")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    started = time.perf_counter()
+    changed = build(args.datasource, args.catalog, rebuild=args.rebuild, concept_min_bytes=args.concept_min_bytes)
+    logger.info(f"Catalogued {changed} changed file(s) in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
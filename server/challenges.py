@@ -0,0 +1,157 @@
+import hmac
+import time
+import hashlib
+import secrets
+import threading
+
+# tolerated clock difference between the worker issuing a challenge and the one verifying it
+CLOCK_SKEW = 5 # in seconds
+
+class RedisChallenges:
+    """ Challenges stored in Redis until they expire, every verification is a Redis round trip. """
+
+    def __init__(self, redis_client, expiration: int = 60):
+        self.redis_client = redis_client
+        self.expiration = expiration
+
+    def issue(self, difficulty: int):
+        """ Returns a new (challenge_id, challenge) pair valid for the expiration time. """
+
+        # the random part keeps challenges issued within the same second apart
+        challenge = "datafeed" + str(int(time.time())) + secrets.token_hex(8)
+        challenge_id = hashlib.sha256(challenge.encode()).hexdigest()
+        pipeline = self.redis_client.pipeline()
+        pipeline.setex(challenge_id, self.expiration, challenge)
+        pipeline.setex(f"{challenge_id}:difficulty", self.expiration, difficulty)
+        pipeline.execute()
+        return challenge_id, challenge
+
+    def verify(self, challenge_id, challenge):
+        """ Returns the difficulty the challenge was issued with, or None if it is unknown or expired. """
+
+        stored_challenge, difficulty = self.redis_client.mget(challenge_id, f"{challenge_id}:difficulty")
+        if not stored_challenge or not hmac.compare_digest(stored_challenge.decode(), str(challenge)):
+            return None
+        return int(difficulty) if difficulty else 0
+
+    def consume(self, challenge_id) -> bool:
+        """ Deletes a solved challenge, returning False if it was already spent.
+
+        DEL is atomic, so of concurrent requests with the same solution only one deletes the keys.
+        """
+        return bool(self.redis_client.delete(challenge_id, f"{challenge_id}:difficulty"))
+
+class AsyncRedisChallenges(RedisChallenges):
+    """ RedisChallenges on an asyncio Redis client.
+
+    The key layout is shared with RedisChallenges, so challenges issued by the async server are
+    verified by the sync one and the other way around.
+    """
+
+    async def issue(self, difficulty: int):
+        challenge = "datafeed" + str(int(time.time())) + secrets.token_hex(8)
+        challenge_id = hashlib.sha256(challenge.encode()).hexdigest()
+        async with self.redis_client.pipeline() as pipeline:
+            pipeline.setex(challenge_id, self.expiration, challenge)
+            pipeline.setex(f"{challenge_id}:difficulty", self.expiration, difficulty)
+            await pipeline.execute()
+        return challenge_id, challenge
+
+    async def verify(self, challenge_id, challenge):
+        stored_challenge, difficulty = await self.redis_client.mget(challenge_id, f"{challenge_id}:difficulty")
+        if not stored_challenge or not hmac.compare_digest(stored_challenge.decode(), str(challenge)):
+            return None
+        return int(difficulty) if difficulty else 0
+
+    async def consume(self, challenge_id) -> bool:
+        return bool(await self.redis_client.delete(challenge_id, f"{challenge_id}:difficulty"))
+
+class StatelessChallenges:
+    """ HMAC signed challenges verified without any shared state.
+
+    A challenge is "<nonce>.<issued>.<difficulty>.<signature>" and its id is the signature, so
+    any worker holding the secret can check it. Only successful solves are recorded, in a replay
+    guard, so a solved challenge cannot be spent twice.
+    """
+
+    def __init__(self, secret: bytes, expiration: int = 60, replay_guard=None):
+        self.secret = secret
+        self.expiration = expiration
+        self.replay_guard = replay_guard if replay_guard is not None else MemoryReplayGuard(expiration + CLOCK_SKEW)
+
+    def sign(self, payload: str) -> str:
+        return hmac.new(self.secret, payload.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def issue(self, difficulty: int):
+        """ Returns a new (challenge_id, challenge) pair valid for the expiration time. """
+
+        payload = f"{secrets.token_hex(8)}.{int(time.time())}.{difficulty}"
+        signature = self.sign(payload)
+        return signature, f"{payload}.{signature}"
+
+    def verify(self, challenge_id, challenge):
+        """ Returns the difficulty signed into the challenge, or None if it is forged or expired. """
+
+        if not isinstance(challenge, str) or not isinstance(challenge_id, str):
+            return None
+        payload, _, signature = challenge.rpartition(".")
+        if not hmac.compare_digest(signature, challenge_id) or not hmac.compare_digest(signature, self.sign(payload)):
+            return None
+
+        try:
+            _, issued, difficulty = payload.split(".")
+            issued, difficulty = int(issued), int(difficulty)
+        except ValueError:
+            return None
+        if not -CLOCK_SKEW <= time.time() - issued <= self.expiration:
+            return None
+        return difficulty
+
+    def consume(self, challenge_id) -> bool:
+        """ Records a solved challenge, returning False if it was already spent. """
+
+        return self.replay_guard.add(challenge_id)
+
+class RedisReplayGuard:
+    """ Solved challenge ids shared by every worker through Redis SET NX. """
+
+    def __init__(self, redis_client, ttl: int, key_prefix: str = "solved:"):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    def add(self, challenge_id: str) -> bool:
+        return bool(self.redis_client.set(self.key_prefix + challenge_id, 1, nx=True, ex=self.ttl))
+
+class AsyncRedisReplayGuard(RedisReplayGuard):
+    """ RedisReplayGuard on an asyncio Redis client, StatelessChallenges.consume then returns an awaitable. """
+
+    async def add(self, challenge_id: str) -> bool:
+        return bool(await self.redis_client.set(self.key_prefix + challenge_id, 1, nx=True, ex=self.ttl))
+
+class MemoryReplayGuard:
+    """ Solved challenge ids of this process, kept in two generations rotated every ttl seconds.
+
+    An id is remembered for at least ttl seconds, longer than its challenge stays valid, while
+    memory stays bounded by the solves of the last two periods.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._current = set()
+        self._previous = set()
+        self._rotated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, challenge_id: str) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._rotated >= self.ttl:
+                # after two periods without a rotation both generations are stale
+                self._previous = self._current if now - self._rotated < 2 * self.ttl else set()
+                self._current = set()
+                self._rotated = now
+            if challenge_id in self._current or challenge_id in self._previous:
+                return False
+            self._current.add(challenge_id)
+            return True
@@ -0,0 +1,186 @@
+import sys
+from array import array
+
+# observation fields in the order companyfacts documents list them, unknown ones follow
+FIELDS = ("start", "end", "val", "accn", "fy", "fp", "form", "filed", "frame")
+# fields drawn from small, bounded vocabularies (dates, periods, forms) are interned process wide;
+# other strings, such as accession numbers, are only deduplicated within one document
+SHARED_FIELDS = {"start", "end", "fp", "form", "filed", "frame"}
+
+class ObservationColumns:
+    """ The observations of one concept and unit, stored column by column.
+
+    Integer and float columns without gaps are arrays; other columns are lists whose strings are
+    interned or deduplicated, and whose None entries mark observations without the field.
+    """
+
+    __slots__ = ("fields", "columns", "count")
+
+    def __init__(self, fields: tuple, columns: tuple, count: int):
+        self.fields = fields
+        self.columns = columns
+        self.count = count
+
+    @staticmethod
+    def from_observations(observations: list, strings: dict):
+        """ Builds the columns of a list of observation dicts, deduplicating strings through strings. """
+
+        seen = {}
+        for observation in observations:
+            for field in observation:
+                seen.setdefault(field, None)
+        fields = tuple(field for field in FIELDS if field in seen) + tuple(field for field in seen if field not in FIELDS)
+
+        columns = []
+        for field in fields:
+            values = [observation.get(field) for observation in observations]
+            columns.append(pack_column(values, field in SHARED_FIELDS, strings))
+        return ObservationColumns(fields, tuple(columns), len(observations))
+
+    def column(self, field: str):
+        """ Returns the column of a field, or None if no observation has it. """
+
+        try:
+            return self.columns[self.fields.index(field)]
+        except ValueError:
+            return None
+
+    def rows(self, indices=None) -> list:
+        """ Materializes observation dicts, all of them or those at the given indices. """
+
+        indices = range(self.count) if indices is None else indices
+        rows = []
+        for i in indices:
+            row = {}
+            for field, column in zip(self.fields, self.columns):
+                value = column[i]
+                if value is not None:
+                    row[field] = value
+            rows.append(row)
+        return rows
+
+    def select(self, projection) -> list:
+        """ Returns the indices of the observations kept by a projection's period filters. """
+
+        filtered = {field: self.column(field) for field in ("end", "fy", "fp")}
+        kept = []
+        for i in range(self.count):
+            observation = {field: column[i] for field, column in filtered.items() if column is not None and column[i] is not None}
+            if projection.keep(observation):
+                kept.append(i)
+        return kept
+
+    def nbytes(self) -> int:
+        """ Returns the approximate memory held by the columns, excluding shared strings. """
+
+        total = sys.getsizeof(self) + sys.getsizeof(self.columns)
+        for column in self.columns:
+            total += sys.getsizeof(column)
+            if isinstance(column, list):
+                total += sum(sys.getsizeof(value) for value in column if type(value) in (int, float))
+        return total
+
+class CompactFacts:
+    """ A facts object held as columnar observations; dicts are only built when it is serialized.
+
+    concepts maps (taxonomy, concept) to (metadata, units), where metadata holds the concept's
+    members other than "units" (label, description) and units maps each unit to its
+    ObservationColumns.
+    """
+
+    __slots__ = ("concepts", "strings_bytes", "_nbytes")
+
+    def __init__(self, concepts: dict, strings_bytes: int = 0):
+        self.concepts = concepts
+        self.strings_bytes = strings_bytes  # deduplicated strings owned by this document
+        self._nbytes = None
+
+    @staticmethod
+    def from_facts(facts: dict):
+        """ Builds compact facts from a decoded facts object. """
+
+        strings = {}
+        concepts = {}
+        for taxonomy, taxonomy_concepts in facts.items():
+            for concept, value in taxonomy_concepts.items():
+                metadata = {key: item for key, item in value.items() if key != "units"}
+                units = {
+                    sys.intern(unit): ObservationColumns.from_observations(observations, strings)
+                    for unit, observations in value.get("units", {}).items()
+                }
+                concepts[(sys.intern(taxonomy), sys.intern(concept))] = (metadata, units)
+        return CompactFacts(concepts, sum(sys.getsizeof(string) for string in strings))
+
+    def __len__(self):
+        return sum(columns.count for _, units in self.concepts.values() for columns in units.values())
+
+    def to_dict(self) -> dict:
+        """ Materializes the facts object. """
+
+        facts = {}
+        for (taxonomy, concept), (metadata, units) in self.concepts.items():
+            facts.setdefault(taxonomy, {})[concept] = dict(
+                metadata, units={unit: columns.rows() for unit, columns in units.items()}
+            )
+        return facts
+
+    def project(self, projection) -> dict:
+        """ Materializes only the concepts, units and observations a Projection keeps. """
+
+        facts = {}
+        for (taxonomy, concept), (metadata, units) in self.concepts.items():
+            if not projection.wants(taxonomy, concept):
+                continue
+
+            selected = {}
+            for unit, columns in units.items():
+                if projection.units is not None and unit not in projection.units:
+                    continue
+                if not projection.filters_observations:
+                    selected[unit] = columns.rows()
+                    continue
+                kept = columns.select(projection)
+                if kept:
+                    selected[unit] = columns.rows(kept)
+
+            if selected or not projection.filters_observations:
+                facts.setdefault(taxonomy, {})[concept] = dict(metadata, units=selected)
+        return facts
+
+    def nbytes(self) -> int:
+        """ Returns the approximate memory held by the facts; interned strings are shared with every
+        other document and not charged to any of them. """
+
+        if self._nbytes is None:
+            total = sys.getsizeof(self) + sys.getsizeof(self.concepts) + self.strings_bytes
+            for metadata, units in self.concepts.values():
+                total += sys.getsizeof(metadata) + sys.getsizeof(units)
+                total += sum(sys.getsizeof(item) for item in metadata.values())
+                total += sum(columns.nbytes() for columns in units.values())
+            self._nbytes = total
+        return self._nbytes
+
+def pack_column(values: list, shared: bool, strings: dict):
+    """ Returns values as a typed array when they are all ints or all floats, else as a list of
+    interned or deduplicated strings and other values. """
+
+    if values and all(type(value) is int for value in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            pass
+    elif values and all(type(value) is float for value in values):
+        return array('d', values)
+
+    packed = []
+    for value in values:
+        if type(value) is str:
+            value = sys.intern(value) if shared else strings.setdefault(value, value)
+        packed.append(value)
+    return packed
+
+def matches_size(matches: list) -> int:
+    """ Returns the cache size of a list of (company_name, facts) pairs, counting compact facts by
+    their memory and encoded facts by their length. """
+
+    return sum(facts.nbytes() if isinstance(facts, CompactFacts) else len(facts) for _, facts in matches)
@@ -0,0 +1,312 @@
+import io
+import os
+import csv
+import json
+import mmap
+import hashlib
+import logging
+from contextlib import nullcontext
+from index import EntityIndex, open_source
+from encoding import RawStream, dumps, loads
+from compact import CompactFacts, matches_size
+
+logger = logging.getLogger()
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+class Datasource:
+    """ Read path for company facts, backed by an EntityIndex.
+
+    timer is an optional timer(stage) context manager factory, called around the "lookup", "read"
+    and "parse" stages of every read. With compact set, cached json facts are held as
+    CompactFacts and charged to the cache by their memory, which fits several times more
+    entities than decoded dicts; they are encoded again whenever they are served.
+    """
+
+    def __init__(self, datasource_dir: str, refresh_interval: float = 5.0, catalog=None, cache=None, timer=None,
+                 compact: bool = False):
+        self.datasource_dir = datasource_dir
+        self.index = EntityIndex(datasource_dir, refresh_interval=refresh_interval, catalog=catalog)
+        self.cache = cache
+        self.timer = timer or (lambda stage: nullcontext())
+        self.compact = compact
+
+    def lookup(self, entity_name: str = None, cik: int = None) -> list:
+        with self.timer("lookup"):
+            return self.index.lookup(entity_name=entity_name, cik=cik)
+
+    def is_empty(self) -> bool:
+        self.index.maybe_refresh()
+        return len(self.index) == 0
+
+    def find(self, entity_name: str = None, cik: int = None) -> list:
+        """ Returns a list of (company_name, facts) tuples for the entity. """
+
+        matches = self.load_matches(entity_name, cik)
+        with self.timer("parse"):
+            return [
+                (company_name, facts.to_dict() if isinstance(facts, CompactFacts) else loads(facts))
+                for company_name, facts in matches
+            ]
+
+    def find_raw(self, entity_name: str = None, cik: int = None) -> list:
+        """ Returns a list of (company_name, facts JSON bytes) tuples for the entity. """
+
+        return [(company_name, encode_facts(facts)) for company_name, facts in self.load_matches(entity_name, cik)]
+
+    def load_matches(self, entity_name: str = None, cik: int = None) -> list:
+        """ Returns a list of (company_name, facts) tuples as loaded, encoded bytes or CompactFacts. """
+
+        matches = []
+        for entry in self.lookup(entity_name=entity_name, cik=cik):
+            try:
+                matches.extend(self.load_raw(entry))
+            except Exception as e:
+                logger.error(f"Error reading file {os.path.basename(entry.path)}: {e}")
+        return matches
+
+    def find_projected(self, projection, entity_name: str = None, cik: int = None) -> list:
+        """ Returns a list of (company_name, facts) tuples with the projection applied.
+
+        Files with a concept index only read and decode the selected concepts. Other facts are
+        decoded one concept at a time, which bounds memory but not parsing time. CSV rows have
+        no concept structure and are returned unchanged.
+        """
+        matches = []
+        for entry in self.lookup(entity_name=entity_name, cik=cik):
+            try:
+                ranges = self.concept_ranges(entry, projection)
+                if ranges is not None:
+                    with self.timer("read"):
+                        concepts = read_concepts(entry.path, ranges)
+                    with self.timer("parse"):
+                        matches.append((entry.entity_name, project_concepts(projection, concepts)))
+                    continue
+
+                for company_name, facts in self.load_raw(entry):
+                    with self.timer("parse"):
+                        if isinstance(facts, CompactFacts):
+                            matches.append((company_name, facts.project(projection)))
+                        elif entry.kind == "json":
+                            matches.append((company_name, projection.apply(facts.decode())))
+                        else:
+                            matches.append((company_name, loads(facts)))
+            except Exception as e:
+                logger.error(f"Error reading file {os.path.basename(entry.path)}: {e}")
+        return matches
+
+    def concept_ranges(self, entry, projection):
+        """ Returns the catalogued byte ranges of the concepts a projection selects from an entry,
+        or None if the entry has no concept index or the projection selects every concept. """
+
+        catalog = self.index.catalog
+        if catalog is None or entry.kind != "json" or not projection.selects_concepts:
+            return None
+        return catalog.concept_ranges(
+            self.datasource_dir, entry.path, entry.mtime, projection.taxonomies, projection.concepts
+        )
+
+    def find_documents(self, entity_name: str = None, cik: int = None) -> list:
+        """ Returns the index entries of the entity's json source documents, ordered by path. """
+
+        entries = self.lookup(entity_name=entity_name, cik=cik)
+        return sorted((entry for entry in entries if entry.kind == "json"), key=lambda entry: entry.path)
+
+    def load_raw(self, entry) -> list:
+        """ Reads the facts for an index entry through the cache, as CompactFacts when compact is set. """
+
+        with self.timer("read"):
+            if self.cache is None:
+                return self.read_raw(entry)
+
+            key = (entry.path, entry.mtime, entry.entity_name)
+            if self.compact and entry.kind == "json":
+                return self.cache.get_or_load(key, lambda: compact_matches(self.read_raw(entry)), matches_size)
+            return self.cache.get_or_load(key, lambda: self.read_raw(entry), entry.payload_size)
+
+    def warm(self, ciks) -> int:
+        """ Loads the facts of the given CIKs into the cache, e.g. before worker processes are forked.
+
+        Returns:
+            int: Source payload bytes loaded.
+        """
+        if self.cache is None:
+            return 0
+
+        loaded = 0
+        for cik in ciks:
+            for entry in self.lookup(cik=cik):
+                try:
+                    self.load_raw(entry)
+                    loaded += entry.payload_size
+                except Exception as e:
+                    logger.error(f"Error reading file {os.path.basename(entry.path)}: {e}")
+        return loaded
+
+    def validators(self, entity_name: str = None, cik: int = None):
+        """ Returns (etag, last_modified) for the entity's source files, or None if it is unknown.
+
+        The ETag is derived from the size and mtime of the files, which every index knows as soon
+        as it sees a file; a content hash is only catalogued later and would change the ETag of
+        an unchanged file.
+        """
+        entries = self.lookup(entity_name=entity_name, cik=cik)
+        if not entries:
+            return None
+
+        digest = hashlib.sha256()
+        for entry in sorted(entries, key=lambda entry: entry.path):
+            digest.update(f"{os.path.basename(entry.path)}:{entry.size}-{entry.mtime};".encode())
+        return digest.hexdigest()[:32], max(entry.mtime for entry in entries)
+
+    def payload_size(self, entity_name: str = None, cik: int = None) -> int:
+        """ Returns the total source payload bytes for the entity without reading any files. """
+
+        return sum(entry.payload_size for entry in self.lookup(entity_name=entity_name, cik=cik))
+
+    def find_stream(self, entity_name: str = None, cik: int = None) -> list:
+        """ Returns a list of (company_name, RawStream) tuples whose facts are read chunk by chunk.
+
+        Cached payloads are streamed from memory; indexed json facts are copied from the file in
+        STREAM_CHUNK_SIZE chunks, so memory stays constant regardless of file size.
+        """
+        matches = []
+        for entry in self.lookup(entity_name=entity_name, cik=cik):
+            try:
+                cached = None
+                if self.cache is not None:
+                    cached = self.cache.get((entry.path, entry.mtime, entry.entity_name))
+
+                if cached is not None:
+                    matches.extend((company_name, RawStream((encode_facts(facts),))) for company_name, facts in cached)
+                elif entry.kind == "json" and entry.offset is not None:
+                    chunks = iter_file_range(entry.path, entry.offset, entry.length)
+                    matches.append((entry.entity_name, RawStream(chunks)))
+                else:
+                    matches.extend((company_name, RawStream((facts,))) for company_name, facts in self.read_raw(entry))
+            except Exception as e:
+                logger.error(f"Error reading file {os.path.basename(entry.path)}: {e}")
+        return matches
+
+    def read_raw(self, entry) -> list:
+        """ Reads the encoded facts for a single index entry. """
+
+        if entry.kind == "json":
+            return [(entry.entity_name, read_json_facts(entry))]
+        elif entry.kind == "csv":
+            if entry.rows is not None:
+                return [(row.get("entityName"), dumps(row)) for row in read_csv_rows(entry)]
+
+            # not indexed by row, scan the whole file
+            with open(entry.path, 'r', newline='') as infile:
+                return [
+                    (row.get("entityName"), dumps(row))
+                    for row in csv.DictReader(infile)
+                    if row.get("entityName") == entry.entity_name
+                ]
+        return []
+
+def encode_facts(facts) -> bytes:
+    """ Returns encoded facts, materializing CompactFacts. """
+
+    return dumps(facts.to_dict()) if isinstance(facts, CompactFacts) else facts
+
+def compact_matches(matches: list) -> list:
+    """ Converts (company_name, facts bytes) pairs to (company_name, CompactFacts) pairs. """
+
+    return [(company_name, CompactFacts.from_facts(loads(facts))) for company_name, facts in matches]
+
+def pack_compact_matches(matches: list) -> bytes:
+    """ pack_matches for the cache of a compact Datasource, CompactFacts are sent encoded. """
+
+    packed = [(company_name, encode_facts(facts), isinstance(facts, CompactFacts)) for company_name, facts in matches]
+    header = dumps([[company_name, len(facts), compact] for company_name, facts, compact in packed])
+    return header + b"\n" + b"".join(facts for _, facts, _ in packed)
+
+def unpack_compact_matches(blob: bytes) -> list:
+    """ Reverses pack_compact_matches. """
+
+    header, _, body = blob.partition(b"\n")
+    matches = []
+    position = 0
+    for company_name, length, compact in loads(header):
+        facts = body[position:position + length]
+        matches.append((company_name, CompactFacts.from_facts(loads(facts)) if compact else facts))
+        position += length
+    return matches
+
+def read_concepts(path: str, ranges: list) -> list:
+    """ Decodes the (taxonomy, concept, offset, length) ranges of a file through a memory map,
+    returning (taxonomy, concept, value) tuples; only the pages of those ranges are read. """
+
+    with open(path, 'rb') as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return [(taxonomy, concept, loads(mapped[offset:offset + length])) for taxonomy, concept, offset, length in ranges]
+
+def project_concepts(projection, concepts: list) -> dict:
+    """ Applies a projection's unit and period filters to decoded concepts, building a facts object. """
+
+    facts = {}
+    for taxonomy, concept, value in concepts:
+        value = projection.filter_concept(value)
+        if value is not None:
+            facts.setdefault(taxonomy, {})[concept] = value
+    return facts
+
+def iter_file_range(path: str, offset: int, length: int, chunk_size: int = STREAM_CHUNK_SIZE, decompress: bool = True):
+    """ Yields a byte range of a file in chunks, opening the file only once iteration starts.
+
+    The range is into the decompressed document of compressed sources unless decompress is False.
+    """
+    with (open_source(path) if decompress else open(path, 'rb')) as infile:
+        infile.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = infile.read(min(chunk_size, remaining))
+            if not chunk:
+                raise IOError(f"Unexpected end of file in {os.path.basename(path)}")
+            remaining -= len(chunk)
+            yield chunk
+
+def iter_source(path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """ Yields the decompressed contents of a datasource file in chunks. """
+
+    with open_source(path) as infile:
+        yield from iter(lambda: infile.read(chunk_size), b"")
+
+def read_csv_rows(entry) -> list:
+    """ Returns the entity's CSV records as dicts, reading only its indexed rows.
+
+    Adjacent rows are coalesced so an entity stored contiguously is read with a single seek.
+    """
+    with open(entry.path, 'rb') as infile:
+        infile.seek(entry.offset)
+        header = next(csv.reader(io.StringIO(infile.read(entry.length).decode(), newline='')), [])
+
+        spans = []
+        for offset, length in zip(entry.rows[::2], entry.rows[1::2]):
+            if spans and spans[-1][0] + spans[-1][1] == offset:
+                spans[-1][1] += length
+            else:
+                spans.append([offset, length])
+
+        text = []
+        for offset, length in spans:
+            infile.seek(offset)
+            data = infile.read(length)
+            # the last record of a file may lack a line terminator
+            text.append(data.decode() if data.endswith(b"\n") else data.decode() + "\n")
+    return list(csv.DictReader(io.StringIO("".join(text), newline=''), fieldnames=header))
+
+def read_json_facts(entry) -> bytes:
+    """ Returns the facts object of a json entry as JSON bytes.
+
+    When the byte range of the facts value is indexed it is copied straight from the file,
+    otherwise the document is parsed once and the facts are re-encoded.
+    """
+    if entry.offset is not None:
+        with open_source(entry.path) as infile:
+            infile.seek(entry.offset)
+            return infile.read(entry.length)
+
+    with open_source(entry.path) as infile:
+        return dumps(json.load(infile).get("facts", {}))
@@ -0,0 +1,102 @@
+import math
+import time
+import threading
+
+class DifficultyController:
+    """ Raises the PoW difficulty with the load on the server and the cost of a request.
+
+    Load is the larger of the request rate over target_rate and the requests in flight over
+    target_in_flight. Every extra hex zero makes a solve 16 times more expensive, so the load
+    level is the number of such factors the load exceeds its targets by; the cost level does
+    the same for payloads above cost_bytes.
+    """
+
+    def __init__(self, base: int = 4, max_difficulty: int = 7, target_rate: float = 50.0,
+                 target_in_flight: int = 16, cost_bytes: int = 16 * 1024 * 1024, window: float = 10.0):
+        self.base = base
+        self.max_difficulty = max_difficulty
+        self.target_rate = target_rate
+        self.target_in_flight = target_in_flight
+        self.cost_bytes = cost_bytes
+        self.window = window  # time constant of the request rate average, in seconds
+        self.in_flight = 0
+        self._events = 0.0  # exponentially decayed request count
+        self._last_event = time.monotonic()
+        self._lock = threading.Lock()
+
+    def started(self):
+        """ Records the start of a request. """
+
+        with self._lock:
+            now = time.monotonic()
+            self._events = self._events * math.exp((self._last_event - now) / self.window) + 1
+            self._last_event = now
+            self.in_flight += 1
+
+    def finished(self):
+        """ Records the end of a request started with started(). """
+
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+
+    def rate(self) -> float:
+        """ Returns the average request rate per second over the last window. """
+
+        with self._lock:
+            return self._events * math.exp((self._last_event - time.monotonic()) / self.window) / self.window
+
+    def pressure(self) -> float:
+        return max(self.rate() / self.target_rate, self.in_flight / self.target_in_flight)
+
+    def load_level(self) -> int:
+        return levels(self.pressure())
+
+    def cost_level(self, payload_size: int) -> int:
+        return levels(payload_size / self.cost_bytes)
+
+    def difficulty(self, minimum: int = None, payload_size: int = 0) -> int:
+        """ Returns the difficulty to issue, raised from minimum by the load and cost levels.
+
+        Args:
+            minimum: Difficulty without any load, e.g. one scaled with a batch size; defaults to base.
+            payload_size: Source bytes the request will read, 0 when unknown.
+
+        Returns:
+            int: The difficulty, never above max_difficulty unless minimum already is.
+        """
+        return self.raise_by(minimum, self.load_level() + self.cost_level(payload_size))
+
+    def required(self, minimum: int = None, payload_size: int = 0) -> int:
+        """ Returns the lowest difficulty a solution for payload_size bytes is accepted at: minimum
+        raised by the cost level alone, since the load may have dropped since the challenge was
+        issued, and capped like difficulty(). """
+
+        return self.raise_by(minimum, self.cost_level(payload_size))
+
+    def raise_by(self, minimum: int, levels: int) -> int:
+        minimum = self.base if minimum is None else minimum
+        return min(minimum + levels, max(self.max_difficulty, minimum))
+
+    def state(self) -> dict:
+        """ Returns the controller's current inputs and the difficulty it issues now. """
+
+        return {
+            "difficulty": self.difficulty(),
+            "base": self.base,
+            "max_difficulty": self.max_difficulty,
+            "rate": round(self.rate(), 3),
+            "target_rate": self.target_rate,
+            "in_flight": self.in_flight,
+            "target_in_flight": self.target_in_flight,
+            "pressure": round(self.pressure(), 3),
+            "cost_bytes": self.cost_bytes,
+        }
+
+def levels(ratio: float) -> int:
+    """ Returns how many factors of 16 a ratio exceeds 1 by, rounded up. """
+
+    level = 0
+    while ratio > 1:
+        ratio /= 16
+        level += 1
+    return level
@@ -0,0 +1,147 @@
+import json
+import zlib
+
+# orjson is optional, it encodes several times faster than the stdlib when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# zstandard is optional, without it responses are only offered gzip coded
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# response content codings in order of preference
+CONTENT_ENCODINGS = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+class RawJSON:
+    """ Pre-encoded JSON bytes that are spliced into a response verbatim. """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+class RawStream:
+    """ Pre-encoded JSON produced lazily as an iterable of byte chunks. """
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+def dumps(obj) -> bytes:
+    """ Encodes an object to compact JSON bytes. """
+
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+def loads(data):
+    """ Decodes JSON bytes or text. """
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def encode(obj) -> bytes:
+    """ Encodes a response envelope, splicing RawJSON values in without re-encoding them. """
+
+    if isinstance(obj, RawJSON):
+        return obj.data
+    if isinstance(obj, dict):
+        return b"{" + b",".join(dumps(str(key)) + b":" + encode(value) for key, value in obj.items()) + b"}"
+    if isinstance(obj, (list, tuple)):
+        return b"[" + b",".join(encode(value) for value in obj) + b"]"
+    if isinstance(obj, RawStream):
+        return b"".join(obj.chunks)
+    return dumps(obj)
+
+def iter_encode(obj):
+    """ Encodes a response envelope as a stream of byte chunks, copying RawStream values through. """
+
+    if isinstance(obj, RawStream):
+        yield from obj.chunks
+    elif isinstance(obj, RawJSON):
+        yield obj.data
+    elif isinstance(obj, dict):
+        separator = b"{"
+        for key, value in obj.items():
+            yield separator + dumps(str(key)) + b":"
+            yield from iter_encode(value)
+            separator = b","
+        yield b"}" if obj else b"{}"
+    elif isinstance(obj, (list, tuple)):
+        separator = b"["
+        for value in obj:
+            yield separator
+            yield from iter_encode(value)
+            separator = b","
+        yield b"]" if obj else b"[]"
+    else:
+        yield dumps(obj)
+
+def pack_matches(matches: list) -> bytes:
+    """ Packs a list of (company_name, facts bytes) pairs into a single blob for the shared cache. """
+
+    header = dumps([[company_name, len(facts)] for company_name, facts in matches])
+    return header + b"\n" + b"".join(facts for _, facts in matches)
+
+def unpack_matches(blob: bytes) -> list:
+    """ Reverses pack_matches. """
+
+    header, _, body = blob.partition(b"\n")
+    matches = []
+    position = 0
+    for company_name, length in loads(header):
+        matches.append((company_name, body[position:position + length]))
+        position += length
+    return matches
+
+def negotiate_encoding(accept_encodings, offered=CONTENT_ENCODINGS):
+    """ Returns the offered content coding the client accepts with the highest quality, or None.
+
+    Args:
+        accept_encodings: The parsed Accept-Encoding header, e.g. flask's request.accept_encodings.
+        offered: Codings available for the response, earlier ones win ties.
+    """
+    best, best_quality = None, 0
+    for encoding in offered:
+        if encoding == "zstd" and zstandard is None:
+            continue
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compressor(encoding: str):
+    """ Returns a compressobj-like object for a content coding. """
+
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """ Compresses a whole response body. """
+
+    coder = compressor(encoding)
+    return coder.compress(data) + coder.flush()
+
+def iter_compress(chunks, encoding: str):
+    """ Compresses a stream of byte chunks as it is produced. """
+
+    coder = compressor(encoding)
+    for chunk in chunks:
+        data = coder.compress(chunk)
+        if data:
+            yield data
+    yield coder.flush()
@@ -0,0 +1,50 @@
+import os
+import sys
+import multiprocessing
+
+# production launcher for app.py: gunicorn -c server/gunicorn.conf.py
+#
+# the app is imported once in the master (preload_app), which indexes the datasource and warms
+# the facts cache before forking, so workers start warm and share those pages copy-on-write.
+# while running, the master watches the datasource, saves the catalog and rolls the workers over
+# when it changes.
+#
+# state shared by the workers lives in redis: rate limits (RATE_LIMIT_STORAGE_URI), challenges
+# and, with CHALLENGE_MODE=hmac, solved challenges (CHALLENGE_REPLAY_GUARD=redis, app.py refuses
+# the memory guard with several workers). The difficulty controller of each worker targets its
+# share of the load, and /metrics samples carry a worker label since a scrape reaches one worker.
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, chdir)
+
+wsgi_app = "app:app"
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+os.environ["WEB_CONCURRENCY"] = str(workers)  # read by app.py
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+preload_app = True
+timeout = 120
+graceful_timeout = 30
+
+DATASOURCE_WATCH_INTERVAL = float(os.environ.get("DATASOURCE_WATCH_INTERVAL", 30)) # in seconds, 0 disables
+WARM_CIKS = [int(cik) for cik in os.environ.get("WARM_CIKS", "").split(",") if cik.strip()]
+
+def when_ready(server):
+    import app
+    import prefork
+
+    prefork.warm(app, WARM_CIKS)
+    prefork.freeze()
+    prefork.start_watcher(app, DATASOURCE_WATCH_INTERVAL, WARM_CIKS)
+
+def pre_fork(server, worker):
+    import prefork
+
+    prefork.freeze()
+
+def post_fork(server, worker):
+    import app
+    import prefork
+
+    prefork.adopt(app)
@@ -0,0 +1,352 @@
+import os
+import re
+import csv
+import gzip
+import json
+import time
+import logging
+import weakref
+import threading
+from array import array
+
+# zstandard is optional, without it .zst sources are skipped
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger()
+
+# SEC companyfacts documents start with cik, entityName and then the (large) facts object,
+# so the header can be matched from the first few KB without parsing the whole file
+HEADER_PATTERN = re.compile(
+    rb'^\s*\{\s*"cik"\s*:\s*(\d+)\s*,\s*"entityName"\s*:\s*("(?:[^"\\]|\\.)*")\s*,\s*"facts"\s*:\s*'
+)
+HEADER_BYTES = 64 * 1024
+TAIL_BYTES = 64
+READ_CHUNK_SIZE = 1024 * 1024
+
+# pre-compressed json sources, offsets of their entries are into the decompressed document
+SOURCE_ENCODINGS = {".gz": "gzip", ".zst": "zstd"}
+
+def source_encoding(path: str):
+    """ Returns the content coding of a compressed source file ("gzip" or "zstd"), or None. """
+
+    return SOURCE_ENCODINGS.get(os.path.splitext(path)[1])
+
+def open_source(path: str):
+    """ Opens a datasource file for reading its decompressed bytes. """
+
+    encoding = source_encoding(path)
+    if encoding == "gzip":
+        return gzip.open(path, 'rb')
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+    return open(path, 'rb')
+
+class IndexEntry:
+    """ Location of a single entity inside a datasource file. """
+
+    __slots__ = ("entity_name", "cik", "path", "kind", "offset", "length", "size", "mtime", "rows")
+
+    def __init__(self, entity_name, cik, path, kind, offset=None, length=None, size=0, mtime=0.0, rows=None):
+        self.entity_name = entity_name
+        self.cik = cik
+        self.path = path
+        self.kind = kind
+        self.offset = offset  # byte offset of the facts value (json) or header row (csv), or None
+        self.length = length  # byte length of the facts value (json) or header row (csv), or None
+        self.size = size
+        self.mtime = mtime
+        self.rows = rows  # array of (offset, length) pairs of the entity's rows (csv) or None
+
+    @property
+    def payload_size(self) -> int:
+        """ Bytes read to serve this entry, the whole file when its layout is not indexed. """
+
+        if self.kind == "csv" and self.rows is not None:
+            return sum(self.rows[1::2])
+        if self.kind == "json" and self.length is not None:
+            return self.length
+        return self.size
+
+    def __repr__(self):
+        return f"IndexEntry({self.entity_name!r}, cik={self.cik}, path={self.path!r}, kind={self.kind!r})"
+
+class FileRecord:
+    """ Indexed state of a single datasource file. """
+
+    __slots__ = ("mtime", "size", "sha256", "entries")
+
+    def __init__(self, mtime, size, entries, sha256=None):
+        self.mtime = mtime
+        self.size = size
+        self.entries = entries
+        self.sha256 = sha256
+
+def scan_json_header(path: str, size: int):
+    """ Returns (cik, entity_name, facts_offset, facts_length) read from the file header. """
+
+    with open_source(path) as infile:
+        head = infile.read(HEADER_BYTES)
+        match = HEADER_PATTERN.match(head)
+        if match and head[match.end():match.end() + 1] == b"{":
+            if source_encoding(path) is None:
+                tail_start = max(size - TAIL_BYTES, 0)
+                infile.seek(tail_start)
+                tail = infile.read()
+            else:
+                # the decompressed size is unknown, read through to the end keeping the tail
+                position, tail = len(head), head[-TAIL_BYTES:]
+                for chunk in iter(lambda: infile.read(READ_CHUNK_SIZE), b""):
+                    position += len(chunk)
+                    tail = (tail + chunk)[-TAIL_BYTES:]
+                tail_start = position - len(tail)
+            tail = tail.rstrip()
+            # the facts value runs up to the closing brace of the root object
+            if tail.endswith(b"}") and tail[:-1].rstrip().endswith(b"}"):
+                facts_end = tail_start + len(tail) - 1
+                facts_offset = match.end()
+                return int(match.group(1)), json.loads(match.group(2)), facts_offset, facts_end - facts_offset
+
+    # unexpected layout, fall back to a full parse
+    with open_source(path) as infile:
+        file_data = json.load(infile)
+    cik = file_data.get("cik")
+    return (int(cik) if cik is not None else None), file_data.get("entityName"), None, None
+
+def scan_csv_rows(path: str):
+    """ Returns (header_length, {entity_name: (cik, rows)}) for a CSV file.
+
+    rows is an array of (offset, length) pairs locating each of the entity's records in the
+    file, so they can be read back with a seek instead of a scan. Records may span lines when
+    quoted fields contain newlines.
+    """
+    position = 0
+
+    def lines(infile):
+        nonlocal position
+        for line in infile:
+            position += len(line)
+            yield line.decode()
+
+    entities = {}
+    with open(path, 'rb') as infile:
+        reader = csv.reader(lines(infile))
+        header = next(reader, None)
+        if header is None:
+            return 0, entities
+        header_length = start = position
+        name_column = header.index("entityName") if "entityName" in header else None
+        cik_column = header.index("cik") if "cik" in header else None
+
+        for record in reader:
+            name = record[name_column] if name_column is not None and name_column < len(record) else None
+            if name not in entities:
+                cik = record[cik_column] if cik_column is not None and cik_column < len(record) else None
+                entities[name] = (int(cik) if cik and cik.isdigit() else None, array('q'))
+            entities[name][1].extend((start, position - start))
+            start = position
+    return header_length, entities
+
+# a fork only waits for the in-memory swap of a refreshed index. The child may inherit the locks
+# of a refresh or catalog save running in another thread of its parent, so it gets fresh locks and
+# leaves the parent's pending catalog changes to the parent.
+_indexes = weakref.WeakSet()
+_forking = []
+
+def _before_fork():
+    _forking[:] = list(_indexes)
+    for index in _forking:
+        index._swap_lock.acquire()
+
+def _after_fork_in_parent():
+    for index in _forking:
+        index._swap_lock.release()
+    _forking.clear()
+
+def _after_fork_in_child():
+    for index in _indexes:
+        index._lock = threading.Lock()
+        index._swap_lock = threading.Lock()
+        index._save_lock = threading.Lock()
+        index._pending_lock = threading.Lock()
+        index._pending_updated, index._pending_removed = {}, set()
+    _forking.clear()
+
+os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent, after_in_child=_after_fork_in_child)
+
+class EntityIndex:
+    """ In-memory index of datasource files keyed by entityName and CIK. """
+
+    def __init__(self, datasource_dir: str, refresh_interval: float = 5.0, catalog=None):
+        self.datasource_dir = datasource_dir
+        self.refresh_interval = refresh_interval
+        self.catalog = catalog
+        self._files = {}  # path -> FileRecord
+        self._by_name = {}
+        self._by_cik = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self.generation = 0  # bumped whenever the indexed entries change
+        self.save_catalog = True  # False in forked workers, whose master process keeps the catalog
+        # (re)indexed and removed files not yet written to the catalog
+        self._pending_updated = {}
+        self._pending_removed = set()
+        self._pending_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        _indexes.add(self)
+
+    def __len__(self):
+        return len(self._files)
+
+    def lookup(self, entity_name: str = None, cik: int = None) -> list:
+        """ Returns every IndexEntry matching the entity name or CIK. """
+
+        self.maybe_refresh()
+        if cik is not None:
+            return list(self._by_cik.get(int(cik), ()))
+        return list(self._by_name.get(entity_name, ()))
+
+    def entries(self) -> list:
+        """ Returns every indexed entry. """
+
+        self.maybe_refresh()
+        return [entry for record in self._files.values() for entry in record.entries]
+
+    def file_record(self, path: str):
+        """ Returns the FileRecord of an indexed path, or None. """
+
+        return self._files.get(path)
+
+    def maybe_refresh(self):
+        """ Refreshes the index if the refresh interval has elapsed.
+
+        Only one thread rescans; others arriving meanwhile keep reading the current index, and
+        the catalog is written by a background thread so no request waits on file hashing.
+        """
+        if time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        # the first refresh has nothing to serve yet, wait for it
+        if not self._lock.acquire(blocking=not self._last_refresh):
+            return
+        try:
+            # another thread may have refreshed while this one waited
+            if time.monotonic() - self._last_refresh >= self.refresh_interval:
+                self._refresh(defer_save=True)
+        finally:
+            self._lock.release()
+
+    def refresh(self) -> int:
+        """ Incrementally reindexes new or modified files and drops removed ones, persisting them
+        to the catalog before returning.
+
+        Returns:
+            int: Number of files (re)indexed.
+        """
+        with self._lock:
+            return self._refresh(defer_save=False)
+
+    def flush(self):
+        """ Writes the queued catalog changes. """
+
+        with self._save_lock:
+            with self._pending_lock:
+                updated, removed = self._pending_updated, self._pending_removed
+                self._pending_updated, self._pending_removed = {}, set()
+            if updated or removed:
+                self.catalog.save(self.datasource_dir, updated, removed)
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Failed to save catalog: {e}")
+
+    def _queue_save(self, updated: dict, removed):
+        with self._pending_lock:
+            for path in removed:
+                self._pending_updated.pop(path, None)
+                self._pending_removed.add(path)
+            for path, record in updated.items():
+                self._pending_removed.discard(path)
+                self._pending_updated[path] = record
+
+    def _refresh(self, defer_save: bool) -> int:
+        if self.catalog is not None and not self._last_refresh:
+            # warm start from the persistent catalog, only changed files get reindexed below
+            self._files = self.catalog.load(self.datasource_dir)
+
+        files = dict(self._files)
+        seen = set()
+        changed = 0
+        updated = {}
+
+        for dir_entry in os.scandir(self.datasource_dir):
+            if not dir_entry.is_file() or dir_entry.name.startswith('.'):
+                continue
+            path = dir_entry.path
+            stat = dir_entry.stat()
+            seen.add(path)
+
+            known = files.get(path)
+            if known and known.mtime == stat.st_mtime and known.size == stat.st_size:
+                continue
+
+            try:
+                file_entries = self._index_file(path, stat.st_size, stat.st_mtime)
+            except Exception as e:
+                logger.error(f"Error indexing file {dir_entry.name}: {e}")
+                file_entries = []
+            files[path] = updated[path] = FileRecord(stat.st_mtime, stat.st_size, file_entries)
+            changed += 1
+
+        removed = set(files) - seen
+        for path in removed:
+            del files[path]
+            changed += 1
+
+        if changed or not self._last_refresh:
+            self._swap(files)
+            logger.info(f"Indexed {changed} datasource file(s), {len(files)} total")
+        if self.catalog is not None and changed and self.save_catalog:
+            self._queue_save(updated, removed)
+        if self.catalog is not None:
+            if not defer_save:
+                self.flush()
+            elif self._pending_updated or self._pending_removed:
+                # hashing and concept scans of new files stay off the request path
+                threading.Thread(target=self._flush_in_background, name="catalog-save", daemon=True).start()
+        self._last_refresh = time.monotonic()
+        return changed
+
+    def _swap(self, files: dict):
+        by_name = {}
+        by_cik = {}
+        for record in files.values():
+            for entry in record.entries:
+                by_name.setdefault(entry.entity_name, []).append(entry)
+                if entry.cik is not None:
+                    by_cik.setdefault(entry.cik, []).append(entry)
+
+        # readers never see a half-built index
+        with self._swap_lock:
+            self._files, self._by_name, self._by_cik = files, by_name, by_cik
+            self.generation += 1
+
+    def _index_file(self, path: str, size: int, mtime: float) -> list:
+        if path.endswith(('.json', '.json.gz', '.json.zst')):
+            cik, entity_name, offset, length = scan_json_header(path, size)
+            return [IndexEntry(entity_name, cik, path, "json", offset, length, size, mtime)]
+        elif path.endswith('.csv'):
+            header_length, entities = scan_csv_rows(path)
+            return [
+                IndexEntry(name, cik, path, "csv", 0, header_length, size, mtime, rows)
+                for name, (cik, rows) in entities.items()
+            ]
+        else:
+            logger.warning(f"Unsupported file format: {os.path.basename(path)}")
+            return []
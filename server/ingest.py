@@ -0,0 +1,232 @@
+import os
+import sys
+import time
+import hashlib
+import zipfile
+import argparse
+import logging
+import tempfile
+from catalog import Catalog, CONCEPT_INDEX_MIN_BYTES, file_hash
+from index import EntityIndex
+from observations import ObservationStore
+from encoding import dumps, loads
+
+logger = logging.getLogger()
+
+def iter_drop(source: str):
+    """ Yields (name, data) for every CIK*.json document of an SEC bulk drop, given as a directory
+    or as the companyfacts.zip archive. """
+
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in sorted(archive.infolist(), key=lambda info: info.filename):
+                name = os.path.basename(info.filename)
+                if not info.is_dir() and name.startswith("CIK") and name.endswith(".json"):
+                    yield name, archive.read(info)
+    else:
+        for name in sorted(os.listdir(source)):
+            if name.startswith("CIK") and name.endswith(".json"):
+                with open(os.path.join(source, name), 'rb') as infile:
+                    yield name, infile.read()
+
+def concept_digests(facts: dict) -> dict:
+    """ Returns {"taxonomy.Concept": (digest, accession numbers)} for every concept of a facts object. """
+
+    concepts = {}
+    for taxonomy, taxonomy_concepts in facts.items():
+        for concept, value in taxonomy_concepts.items():
+            accessions = {
+                observation["accn"]
+                for observations in value.get("units", {}).values()
+                for observation in observations
+                if observation.get("accn")
+            }
+            concepts[f"{taxonomy}.{concept}"] = (hashlib.sha256(dumps(value)).hexdigest(), accessions)
+    return concepts
+
+def diff_facts(old: dict, new: dict):
+    """ Returns (changed concepts, added accession numbers) between two versions of a facts object.
+
+    A concept changed when it was added, removed or any of its observations differ, which also
+    catches values restated under an accession number that was already filed.
+    """
+    before, after = concept_digests(old), concept_digests(new)
+    changed = sorted(
+        name for name in set(before) | set(after)
+        if before.get(name, (None,))[0] != after.get(name, (None,))[0]
+    )
+    added = set()
+    for name in changed:
+        added |= after.get(name, (None, set()))[1] - before.get(name, (None, set()))[1]
+    return changed, sorted(added)
+
+def check_document(document):
+    """ Raises ValueError unless document is a companyfacts object with an integer cik and
+    facts of {taxonomy: {concept: {"units": {unit: [observation]}}}}. """
+
+    if not isinstance(document, dict):
+        raise ValueError("not a JSON object")
+    cik = document.get("cik")
+    if not isinstance(cik, int) or isinstance(cik, bool):
+        raise ValueError(f"cik {cik!r} is not an integer")
+    facts = document.get("facts", {})
+    if not isinstance(facts, dict) or not all(isinstance(concepts, dict) for concepts in facts.values()):
+        raise ValueError("facts are not taxonomies of concepts")
+    for concepts in facts.values():
+        for concept, value in concepts.items():
+            units = value.get("units", {}) if isinstance(value, dict) else None
+            if not isinstance(units, dict) or not all(
+                isinstance(observations, list) and all(isinstance(observation, dict) for observation in observations)
+                for observations in units.values()
+            ):
+                raise ValueError(f"concept {concept} has malformed units")
+
+def read_document(path: str):
+    """ Returns the decoded document at path, or None if it is missing, unreadable or invalid. """
+
+    try:
+        with open(path, 'rb') as infile:
+            document = loads(infile.read())
+        check_document(document)
+        return document
+    except (OSError, ValueError):
+        return None
+
+def write_atomic(path: str, data: bytes):
+    """ Replaces a datasource file so readers see either the old or the new document. """
+
+    # dotted temporary names are skipped by the entity index
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as outfile:
+            outfile.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def recover(catalog, datasource_dir: str) -> list:
+    """ Records the staged changes of an interrupted run that reached the datasource and discards
+    the others, telling them apart by the sha256 of the file on disk.
+
+    Returns:
+        list: The recorded changes.
+    """
+    recorded = []
+    for change in catalog.staged_changes():
+        path = os.path.join(datasource_dir, change["name"])
+        if change["change"] == "removed":
+            applied = not os.path.exists(path)
+        else:
+            applied = os.path.exists(path) and file_hash(path) == change["sha256"]
+        if applied:
+            catalog.record_changes([change])
+            recorded.append(change)
+        else:
+            catalog.discard_change(change["name"])
+    return recorded
+
+def ingest(source: str, datasource_dir: str, catalog_path: str, observations_path: str = None,
+           delete_missing: bool = False, concept_min_bytes: int = CONCEPT_INDEX_MIN_BYTES) -> list:
+    """ Applies an SEC bulk drop to the datasource, writing only documents whose content changed.
+
+    Documents that are not valid companyfacts objects are logged and skipped. Changed documents
+    are diffed per concept against the current ones, and each change is staged in the catalog
+    before its file is written or removed and appended to the change feed once that succeeded, the
+    next run recovers one interrupted in between (see recover). The observation store, if it
+    exists, gets only the changed concepts replaced; the catalog reindexes only the rewritten
+    files. Running servers pick the new files up on their next index refresh, their caches are
+    keyed by mtime.
+
+    Args:
+        delete_missing: The drop is a full snapshot, documents missing from it are removed.
+
+    Returns:
+        list: The recorded changes.
+    """
+    catalog = Catalog(catalog_path, concept_min_bytes)
+    changes = recover(catalog, datasource_dir)
+    index = EntityIndex(datasource_dir, catalog=catalog)
+    index.refresh()  # the catalog hashes must describe the current datasource
+    hashes = catalog.hashes()
+    store = ObservationStore(observations_path) if observations_path and os.path.exists(observations_path) else None
+
+    seen = set()
+    for name, data in iter_drop(source):
+        seen.add(name)
+        digest = hashlib.sha256(data).hexdigest()
+        if hashes.get(name) == digest:
+            continue
+
+        try:
+            document = loads(data)
+            check_document(document)
+        except ValueError as e:
+            logger.error(f"Skipping invalid document {name}: {e}")
+            continue
+
+        path = os.path.join(datasource_dir, name)
+        old = read_document(path) if name in hashes else None
+        concepts, accessions = diff_facts(old.get("facts", {}) if old is not None else {}, document.get("facts", {}))
+        change = {
+            "name": name,
+            "cik": document["cik"],
+            "entity_name": document.get("entityName"),
+            "change": "modified" if name in hashes else "added",
+            "sha256": digest,
+            "concepts": concepts,
+            "accessions": accessions,
+        }
+
+        catalog.stage_change(change)
+        write_atomic(path, data)
+        catalog.record_changes([change])
+        if store is not None:
+            stat = os.stat(path)
+            store.apply_delta(name, document, concepts, stat.st_size, stat.st_mtime)
+        changes.append(change)
+
+    if delete_missing:
+        for name in sorted(set(hashes) - seen):
+            if not (name.startswith("CIK") and name.endswith(".json")):
+                continue
+            path = os.path.join(datasource_dir, name)
+            record = index.file_record(path)
+            entry = record.entries[0] if record is not None and record.entries else None
+            change = {
+                "name": name,
+                "cik": entry.cik if entry is not None else None,
+                "entity_name": entry.entity_name if entry is not None else None,
+                "change": "removed",
+            }
+            catalog.stage_change(change)
+            os.remove(path)
+            catalog.record_changes([change])
+            changes.append(change)
+        if store is not None:
+            # drops the observations of removed sources, nothing else has changed on disk
+            store.build(datasource_dir)
+
+    index.refresh()
+    return changes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply an SEC companyfacts bulk drop to the datasource.")
+    parser.add_argument("source", help="companyfacts.zip or a directory of CIK*.json files")
+    parser.add_argument("--datasource", default="../datasource", help="datasource directory")
+    parser.add_argument("--catalog", default="../catalog.db", help="catalog file")
+    parser.add_argument("--store", default="../observations.db", help="observation store, updated if it exists")
+    parser.add_argument("--delete-missing", action="store_true", help="remove documents missing from the drop")
+    parser.add_argument("--concept-min-bytes", type=int, default=CONCEPT_INDEX_MIN_BYTES,
+                        help="index the concepts of json facts at least this large")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    started = time.perf_counter()
+    changes = ingest(args.source, args.datasource, args.catalog, args.store, args.delete_missing, args.concept_min_bytes)
+    counts = {kind: sum(change["change"] == kind for change in changes) for kind in ("added", "modified", "removed")}
+    logger.info(f"Ingested {counts['added']} added, {counts['modified']} modified and {counts['removed']} removed "
+                f"document(s) in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
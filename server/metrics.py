@@ -0,0 +1,158 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# latency buckets in seconds, from sub-millisecond lookups to multi-second streams
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# payload buckets in bytes, 1KB to 256MB in factors of 4
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))
+
+def format_labels(labelnames, values, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """ Base of the metric types, values are kept per tuple of label values.
+
+    An unlabelled metric may instead be read from a function at scrape time, for values that
+    are already counted elsewhere.
+    """
+
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=(), function=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+    def render(self, extra: str = "") -> list:
+        lines = self.header()
+        for key, value in sorted(self.samples()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, key, extra)} {format_value(value)}")
+        return lines
+
+    def samples(self) -> list:
+        if self.function is not None:
+            return [((), self.function())]
+        with self._lock:
+            return list(self._values.items())
+
+class Counter(Metric):
+    """ Monotonically increasing count. """
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """ Value that goes up and down. """
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    """ Distribution of observed values over fixed upper-bound buckets. """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (the last one is +Inf), sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """ Observes the duration of the block in seconds. """
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self, extra: str = "") -> list:
+        lines = self.header()
+        with self._lock:
+            samples = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in samples:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, ','.join(filter(None, (extra, le))))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key, extra)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key, extra)} {count}")
+        return lines
+
+class Registry:
+    """ Collection of metrics rendered together in the Prometheus text format.
+
+    labels are added to every sample, their values may be functions called at scrape time, e.g.
+    os.getpid for a worker label that is correct after the registry is forked.
+    """
+
+    def __init__(self, labels: dict = None):
+        self.labels = dict(labels or {})
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=(), function=None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, function))
+
+    def gauge(self, name: str, documentation: str, labelnames=(), function=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        extra = ",".join(
+            f'{name}="{escape(value() if callable(value) else value)}"' for name, value in self.labels.items()
+        )
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(extra))
+        return "\n".join(lines) + "\n"
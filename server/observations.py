@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import logging
+
+logger = logging.getLogger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT PRIMARY KEY,
+    cik INTEGER,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS companies (
+    cik INTEGER PRIMARY KEY,
+    entity_name TEXT
+);
+CREATE TABLE IF NOT EXISTS concepts (
+    id INTEGER PRIMARY KEY,
+    taxonomy TEXT NOT NULL,
+    concept TEXT NOT NULL,
+    UNIQUE (taxonomy, concept)
+);
+CREATE TABLE IF NOT EXISTS observations (
+    cik INTEGER NOT NULL,
+    concept_id INTEGER NOT NULL REFERENCES concepts(id),
+    unit TEXT,
+    start TEXT,
+    "end" TEXT,
+    val NUMERIC,
+    fy INTEGER,
+    fp TEXT,
+    form TEXT,
+    filed TEXT,
+    accn TEXT,
+    frame TEXT
+);
+-- ends in the implicit rowid, so a concept's observations are paginated without a sort
+CREATE INDEX IF NOT EXISTS observations_by_concept ON observations(concept_id);
+CREATE INDEX IF NOT EXISTS observations_by_concept_period ON observations(concept_id, fy, fp);
+CREATE INDEX IF NOT EXISTS observations_by_concept_end ON observations(concept_id, "end");
+CREATE INDEX IF NOT EXISTS observations_by_cik ON observations(cik, concept_id);
+"""
+
+OBSERVATION_FIELDS = ("unit", "start", "end", "val", "fy", "fp", "form", "filed", "accn", "frame")
+MAX_PAGE_SIZE = 10000
+
+def iter_observations(facts: dict):
+    """ Yields (taxonomy, concept, unit, observation) for every observation in a facts object. """
+
+    for taxonomy, concepts in facts.items():
+        for concept, value in concepts.items():
+            for unit, observations in value.get("units", {}).items():
+                for observation in observations:
+                    yield taxonomy, concept, unit, observation
+
+class ObservationStore:
+    """ Precomputed, indexed observations of every company for cross-company concept queries. """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def connect(self, readonly: bool = True) -> sqlite3.Connection:
+        if readonly:
+            return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def build(self, datasource_dir: str, force: bool = False) -> int:
+        """ Loads new or modified CIK*.json files into the store, replacing their old observations.
+
+        Returns:
+            int: Number of files loaded.
+        """
+        conn = self.connect(readonly=False)
+        try:
+            sources = {name: (size, mtime) for name, size, mtime in conn.execute("SELECT name, size, mtime FROM sources")}
+            known = {} if force else sources
+            names = {name for name in os.listdir(datasource_dir) if name.endswith(".json")}
+            loaded = 0
+
+            for name in sorted(names):
+                stat = os.stat(os.path.join(datasource_dir, name))
+                if known.get(name) == (stat.st_size, stat.st_mtime):
+                    continue
+                try:
+                    with open(os.path.join(datasource_dir, name), 'r') as infile:
+                        document = json.load(infile)
+                except Exception as e:
+                    logger.error(f"Error reading file {name}: {e}")
+                    continue
+
+                with conn:
+                    self.remove_source(conn, name)
+                    self.load_document(conn, name, document, stat.st_size, stat.st_mtime)
+                loaded += 1
+
+            # sources that disappeared from the datasource
+            for name in set(sources) - names:
+                with conn:
+                    self.remove_source(conn, name)
+            return loaded
+        finally:
+            conn.close()
+
+    @staticmethod
+    def remove_source(conn: sqlite3.Connection, name: str):
+        row = conn.execute("SELECT cik FROM sources WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM observations WHERE cik = ?", (row[0],))
+            conn.execute("DELETE FROM sources WHERE name = ?", (name,))
+
+    @staticmethod
+    def load_document(conn: sqlite3.Connection, name: str, document: dict, size: int, mtime: float):
+        cik = int(document.get("cik"))
+        conn.execute("INSERT OR REPLACE INTO companies (cik, entity_name) VALUES (?, ?)", (cik, document.get("entityName")))
+        conn.execute("INSERT INTO sources (name, cik, size, mtime) VALUES (?, ?, ?, ?)", (name, cik, size, mtime))
+
+        ObservationStore.insert_observations(conn, cik, document.get("facts", {}))
+
+    @staticmethod
+    def insert_observations(conn: sqlite3.Connection, cik: int, facts: dict, concepts=None):
+        """ Inserts the observations of a company's facts, only of the "taxonomy.Concept" names in concepts if given. """
+
+        concept_ids = {}
+        def concept_id(taxonomy, concept):
+            key = (taxonomy, concept)
+            if key not in concept_ids:
+                conn.execute("INSERT OR IGNORE INTO concepts (taxonomy, concept) VALUES (?, ?)", key)
+                concept_ids[key] = conn.execute(
+                    "SELECT id FROM concepts WHERE taxonomy = ? AND concept = ?", key
+                ).fetchone()[0]
+            return concept_ids[key]
+
+        conn.executemany(
+            'INSERT INTO observations (cik, concept_id, unit, start, "end", val, fy, fp, form, filed, accn, frame) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                (cik, concept_id(taxonomy, concept), unit) + tuple(observation.get(field) for field in OBSERVATION_FIELDS[1:])
+                for taxonomy, concept, unit, observation in iter_observations(facts)
+                if concepts is None or f"{taxonomy}.{concept}" in concepts
+            )
+        )
+
+    def apply_delta(self, name: str, document: dict, concepts, size: int, mtime: float):
+        """ Replaces only the observations of the changed "taxonomy.Concept" names of a source file.
+
+        A source that is new to the store, or now belongs to another company, is loaded whole.
+        """
+        cik = int(document.get("cik"))
+        concepts = set(concepts)
+        conn = self.connect(readonly=False)
+        try:
+            with conn:
+                row = conn.execute("SELECT cik FROM sources WHERE name = ?", (name,)).fetchone()
+                if row is None or row[0] != cik:
+                    self.remove_source(conn, name)
+                    self.load_document(conn, name, document, size, mtime)
+                    return
+
+                for concept in concepts:
+                    taxonomy, _, concept_name = concept.partition(".")
+                    conn.execute(
+                        "DELETE FROM observations WHERE cik = ? AND concept_id = "
+                        "(SELECT id FROM concepts WHERE taxonomy = ? AND concept = ?)",
+                        (cik, taxonomy, concept_name)
+                    )
+                self.insert_observations(conn, cik, document.get("facts", {}), concepts)
+                conn.execute("INSERT OR REPLACE INTO companies (cik, entity_name) VALUES (?, ?)", (cik, document.get("entityName")))
+                conn.execute("UPDATE sources SET size = ?, mtime = ? WHERE name = ?", (size, mtime, name))
+        finally:
+            conn.close()
+
+    def query(self, concept: str, fy=None, fp=None, unit=None, form=None, start=None, end=None,
+              cik=None, limit: int = 1000, cursor: int = 0):
+        """ Yields observations of a "taxonomy.Concept" across companies, ordered for keyset pagination.
+
+        Each row is a dict with cik, entity_name, the observation fields and a "cursor" value;
+        passing the last cursor back returns the next page.
+        """
+        taxonomy, _, concept_name = concept.partition(".")
+        # the concept is looked up first so the observations are read in rowid order off an index
+        clauses = ["o.concept_id = (SELECT id FROM concepts WHERE taxonomy = ? AND concept = ?)", "o.rowid > ?"]
+        params = [taxonomy, concept_name, cursor]
+        for column, value in (("o.fy", fy), ("o.fp", fp), ("o.unit", unit), ("o.form", form), ("o.cik", cik)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            clauses.append('o."end" >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('o."end" <= ?')
+            params.append(end)
+        params.append(min(limit, MAX_PAGE_SIZE))
+
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                f'SELECT o.rowid, o.cik, co.entity_name, o.unit, o.start, o."end", o.val, o.fy, o.fp, o.form, '
+                f'o.filed, o.accn, o.frame FROM observations o '
+                f'LEFT JOIN companies co ON co.cik = o.cik '
+                f'WHERE {" AND ".join(clauses)} ORDER BY o.rowid LIMIT ?',
+                params
+            )
+            for row in rows:
+                yield dict(zip(("cursor", "cik", "entity_name") + OBSERVATION_FIELDS, row))
+        finally:
+            conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the observation store from the datasource.")
+    parser.add_argument("--datasource", default="../datasource", help="datasource directory")
+    parser.add_argument("--store", default="../observations.db", help="observation store to write")
+    parser.add_argument("--force", action="store_true", help="reload every file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    started = time.perf_counter()
+    loaded = ObservationStore(args.store).build(args.datasource, force=args.force)
+    logger.info(f"Loaded {loaded} file(s) into {args.store} in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
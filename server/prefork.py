@@ -0,0 +1,67 @@
+import gc
+import os
+import time
+import signal
+import logging
+import threading
+
+logger = logging.getLogger()
+
+# serializes warming and the watcher's refreshes in the master. Forks do not wait for either:
+# the index, name index and cache handle their own locks across a fork (see index.py, search.py
+# and cache.py), so a refresh, catalog save or load never blocks the arbiter
+refresh_lock = threading.Lock()
+
+_watcher = None
+
+def warm(app, ciks) -> int:
+    """ Brings the master's index, name index and facts cache up to date before workers are forked.
+
+    Returns:
+        int: Source payload bytes loaded into the facts cache.
+    """
+    with refresh_lock:
+        app.datasource.index.refresh()
+        app.name_index.maybe_rebuild(app.datasource.index, app.tickers)
+        loaded = app.datasource.warm(ciks)
+    logger.info(f"Warmed facts cache with {loaded} byte(s) for {len(ciks)} CIK(s)")
+    return loaded
+
+def freeze():
+    """ Moves every object of the master into the permanent generation.
+
+    The garbage collector then never writes to them, so their pages stay shared with the workers
+    instead of being copied on the first collection.
+    """
+    gc.freeze()
+
+def adopt(app):
+    """ Prepares the state a worker inherited from the master; only the master saves the catalog. """
+
+    app.datasource.index.save_catalog = False
+
+def watch_datasource(app, interval: float, ciks):
+    """ Refreshes the master's index every interval seconds, reloading the workers on changes.
+
+    A HUP makes the gunicorn master fork new workers from its refreshed state and gracefully stop
+    the old ones once they finish their requests.
+    """
+    while True:
+        time.sleep(interval)
+        try:
+            with refresh_lock:
+                changed = app.datasource.index.refresh()
+            if changed:
+                warm(app, ciks)
+                logger.info(f"Datasource changed ({changed} file(s)), reloading workers")
+                os.kill(os.getpid(), signal.SIGHUP)
+        except Exception as e:
+            logger.error(f"Failed to refresh datasource: {e}")
+
+def start_watcher(app, interval: float, ciks):
+    """ Starts the datasource watcher thread once per master process. """
+
+    global _watcher
+    if _watcher is None and interval > 0:
+        _watcher = threading.Thread(target=watch_datasource, args=(app, interval, ciks), name="datasource-watcher", daemon=True)
+        _watcher.start()
@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import bisect
+import logging
+import weakref
+import threading
+
+logger = logging.getLogger()
+
+# a fork only waits for the swap of a rebuilt name index; the child gets a fresh lock in case it
+# inherits that of a rebuild running in its parent
+_name_indexes = weakref.WeakSet()
+_forking = []
+
+def _before_fork():
+    _forking[:] = list(_name_indexes)
+    for name_index in _forking:
+        name_index._swap_lock.acquire()
+
+def _after_fork_in_parent():
+    for name_index in _forking:
+        name_index._swap_lock.release()
+    _forking.clear()
+
+def _after_fork_in_child():
+    for name_index in _name_indexes:
+        name_index._lock = threading.Lock()
+        name_index._swap_lock = threading.Lock()
+    _forking.clear()
+
+os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent, after_in_child=_after_fork_in_child)
+
+# legal-form suffixes ignored when comparing names, so "AAR" finds "AAR CORP"
+SUFFIXES = {
+    "co", "company", "corp", "corporation", "inc", "incorporated", "ltd", "limited",
+    "llc", "lp", "llp", "plc", "sa", "ag", "nv", "holdings", "group", "the",
+}
+PUNCTUATION = re.compile(r"[^\w\s]")
+SPACES = re.compile(r"\s+")
+
+def normalize(name: str) -> str:
+    """ Case-folds a company name and strips punctuation, "&" becomes "and". """
+
+    name = PUNCTUATION.sub(" ", name.casefold().replace("&", " and "))
+    return SPACES.sub(" ", name).strip()
+
+def core_name(name: str) -> str:
+    """ Returns the normalized name without legal-form suffixes. """
+
+    words = normalize(name).split(" ")
+    while len(words) > 1 and words[-1] in SUFFIXES:
+        words.pop()
+    while len(words) > 1 and words[0] == "the":
+        words.pop(0)
+    return " ".join(words)
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameIndex:
+    """ Entity name search over normalized names, tickers and CIKs.
+
+    Exact and prefix matches use a sorted key list searched with bisect; fuzzy matches use a
+    trigram index scored by Dice similarity.
+    """
+
+    def __init__(self, min_score: float = 0.3):
+        self.min_score = min_score
+        self.generation = None
+        self._entities = []  # [(entity_name, cik, tickers)]
+        self._by_cik = {}
+        self._keys = []  # sorted [(key, entity id)] over core names, full names and tickers
+        self._trigrams = {}
+        self._gram_counts = []
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        _name_indexes.add(self)
+
+    def __len__(self):
+        return len(self._entities)
+
+    def build(self, entities, tickers: dict = None, generation=None):
+        """ Rebuilds the index from (entity_name, cik) pairs and an optional cik -> [ticker] map. """
+
+        tickers = tickers or {}
+        records, by_cik, keys, grams, gram_counts = [], {}, [], {}, []
+        for entity_name, cik in sorted(set(entities), key=lambda item: (str(item[0]), item[1] or 0)):
+            if not entity_name:
+                continue
+            entity_id = len(records)
+            entity_tickers = tickers.get(cik, [])
+            records.append((entity_name, cik, entity_tickers))
+            if cik is not None:
+                by_cik[cik] = entity_id
+
+            core = core_name(entity_name)
+            for key in {core, normalize(entity_name)} | {ticker.casefold() for ticker in entity_tickers}:
+                keys.append((key, entity_id))
+            core_grams = trigrams(core)
+            gram_counts.append(len(core_grams))
+            for gram in core_grams:
+                grams.setdefault(gram, set()).add(entity_id)
+
+        keys.sort()
+        with self._swap_lock:
+            self._entities, self._by_cik, self._keys, self._trigrams, self._gram_counts = records, by_cik, keys, grams, gram_counts
+            self.generation = generation
+
+    def maybe_rebuild(self, entity_index, tickers: dict = None):
+        """ Rebuilds from an EntityIndex when its entries changed since the last build. """
+
+        entity_index.maybe_refresh()
+        if self.generation == entity_index.generation:
+            return
+        with self._lock:
+            if self.generation != entity_index.generation:
+                generation = entity_index.generation
+                entities = [(entry.entity_name, entry.cik) for entry in entity_index.entries()]
+                self.build(entities, tickers, generation)
+                logger.info(f"Built name index with {len(self._entities)} entities")
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """ Returns up to limit results ordered exact, prefix, then fuzzy by score. """
+
+        results = {}
+
+        def add(entity_id, match, score):
+            if entity_id not in results or results[entity_id][1] < score:
+                results[entity_id] = (match, score)
+
+        query = query.strip()
+        if query.isdigit() and int(query) in self._by_cik:
+            add(self._by_cik[int(query)], "cik", 1.0)
+
+        for key in {normalize(query), core_name(query)} - {""}:
+            position = bisect.bisect_left(self._keys, (key, -1))
+            while position < len(self._keys) and self._keys[position][0].startswith(key):
+                indexed, entity_id = self._keys[position]
+                if indexed == key:
+                    add(entity_id, "exact", 1.0)
+                else:
+                    add(entity_id, "prefix", 0.5 + 0.5 * len(key) / len(indexed))
+                position += 1
+                if len(results) >= limit * 4:
+                    break
+
+        if len(results) < limit:
+            for entity_id, score in self._fuzzy(core_name(query)):
+                add(entity_id, "fuzzy", score * 0.5)
+
+        ranked = sorted(results.items(), key=lambda item: (-item[1][1], self._entities[item[0]][0]))
+        return [
+            {
+                "entity_name": self._entities[entity_id][0],
+                "cik": self._entities[entity_id][1],
+                "tickers": self._entities[entity_id][2],
+                "match": match,
+                "score": round(score, 3),
+            }
+            for entity_id, (match, score) in ranked[:limit]
+        ]
+
+    def _fuzzy(self, core: str) -> list:
+        query_grams = trigrams(core)
+        counts = {}
+        for gram in query_grams:
+            for entity_id in self._trigrams.get(gram, ()):
+                counts[entity_id] = counts.get(entity_id, 0) + 1
+
+        scored = []
+        for entity_id, shared in counts.items():
+            score = 2 * shared / (len(query_grams) + self._gram_counts[entity_id])
+            if score >= self.min_score:
+                scored.append((entity_id, score))
+        return scored
+
+def load_tickers(path: str) -> dict:
+    """ Loads SEC company_tickers.json into a cik -> [ticker] map, empty if the file is missing. """
+
+    tickers = {}
+    try:
+        with open(path, 'r') as infile:
+            for record in json.load(infile).values():
+                tickers.setdefault(int(record["cik_str"]), []).append(record["ticker"])
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Failed to load tickers from {path}: {e}")
+    return tickers
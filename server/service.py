@@ -0,0 +1,321 @@
+# /challenge and /data as served by both the flask routes of app.py and the async handlers of
+# asgi.py: they parse, price, check and answer requests here and only differ in how they reach
+# the challenge store, which is async under ASGI, and how they send a Document
+import hashlib
+import logging
+from contextlib import nullcontext
+from werkzeug.http import quote_etag, http_date
+from entities import EntityFactory
+from projection import Projection, PARAMETERS
+from datasource import iter_file_range, iter_source
+from index import source_encoding
+from encoding import RawJSON, dumps, encode, iter_encode, negotiate_encoding
+
+logger = logging.getLogger()
+
+FORMATS = ("envelope", "raw")
+
+class RequestError(Exception):
+    """ A refused request, answered with status and the JSON body. """
+
+    def __init__(self, body: dict, status: int = 400):
+        super().__init__(body)
+        self.body = body
+        self.status = status
+
+def invalid(message: str = "Invalid request format.") -> RequestError:
+    return RequestError({"error": message})
+
+class Document:
+    """ A response independent of the serving framework, its body is bytes or an iterator of byte chunks. """
+
+    __slots__ = ("body", "status", "headers", "mimetype")
+
+    def __init__(self, body=b"", status: int = 200, headers=None, mimetype: str = "application/json"):
+        self.body = body
+        self.status = status
+        self.headers = dict(headers or {})
+        self.mimetype = mimetype
+
+    @staticmethod
+    def json(obj, status: int = 200):
+        return Document(encode(obj), status)
+
+class DataRequest:
+    """ A well formed /data request. """
+
+    __slots__ = ("data", "challenge_id", "challenge", "nonce", "difficulty", "lookup", "projection", "stream", "format")
+
+    def __init__(self, data, challenge_id, challenge, nonce, difficulty, lookup, projection, stream, response_format):
+        self.data = data
+        self.challenge_id = challenge_id
+        self.challenge = challenge
+        self.nonce = nonce
+        self.difficulty = difficulty
+        self.lookup = lookup
+        self.projection = projection
+        self.stream = stream
+        self.format = response_format
+
+def is_int(value) -> bool:
+    """ Returns True for a JSON integer, JSON true and false decode to bools, which are ints too. """
+
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def entity_lookup(entity) -> dict:
+    """ Returns the lookup arguments of a batch entity, a CIK or an entity name. """
+
+    return {"cik": entity} if isinstance(entity, int) else {"entity_name": entity}
+
+def set_validators(document: Document, validators) -> Document:
+    """ Sets the ETag and Last-Modified headers of a document. """
+
+    etag, last_modified = validators
+    document.headers["ETag"] = quote_etag(etag)
+    document.headers["Last-Modified"] = http_date(last_modified)
+    return document
+
+def not_modified(validators) -> Document:
+    return set_validators(Document(status=304, headers={"Vary": "Accept-Encoding"}, mimetype=None), validators)
+
+class FactsService:
+    """ Prices challenges, checks proof of work solutions and builds /data documents.
+
+    Every method may read the datasource, so async callers run them on a thread pool.
+    """
+
+    def __init__(self, datasource, difficulty_controller, max_batch_size: int = 1000,
+                 stream_threshold: int = 32 * 1024 * 1024, timer=None, pow_solutions=None):
+        self.datasource = datasource
+        self.difficulty_controller = difficulty_controller
+        self.max_batch_size = max_batch_size
+        self.stream_threshold = stream_threshold
+        self.timer = timer or (lambda stage: nullcontext())
+        self.pow_solutions = pow_solutions  # counter of solutions by result, optional
+
+    def batch_difficulty(self, batch_size: int) -> int:
+        """ Returns the difficulty for a batch; each extra hex zero buys 16 times as many entities. """
+
+        return self.difficulty_controller.base + (len(format(batch_size - 1, "x")) if batch_size > 1 else 0)
+
+    def batch_payload_size(self, entities) -> int:
+        """ Returns the source payload bytes a batch of entities will read. """
+
+        return sum(self.datasource.payload_size(**entity_lookup(entity)) for entity in entities)
+
+    def check_batch(self, entities):
+        """ Raises RequestError unless entities is a non-empty list of at most max_batch_size entity names or CIKs. """
+
+        if not isinstance(entities, list) or not entities or not all(isinstance(entity, str) or is_int(entity) for entity in entities):
+            raise invalid()
+        if len(entities) > self.max_batch_size:
+            raise invalid(f"At most {self.max_batch_size} entities per batch.")
+
+    def challenge_difficulty(self, method: str, args, data=None) -> int:
+        """ Returns the difficulty to issue a /challenge request with.
+
+        A GET may name a batch_size and the entity_name or cik it will fetch; a POST with
+        {"entities": [...]} prices a batch for the combined size of their facts.
+        """
+        if method == "POST":
+            entities = data.get("entities") if isinstance(data, dict) else None
+            self.check_batch(entities)
+            return self.difficulty_controller.difficulty(
+                self.batch_difficulty(len(entities)), self.batch_payload_size(entities)
+            )
+
+        try:
+            batch_size = int(args.get("batch_size", 1))
+        except ValueError:
+            raise invalid()
+        if not 1 <= batch_size <= self.max_batch_size:
+            raise invalid(f"batch_size must be between 1 and {self.max_batch_size}.")
+
+        # an optional entity_name or cik prices the challenge for the facts it will fetch
+        cik = args.get("cik")
+        entity_name = args.get("entity_name")
+        if cik is not None and not cik.isdigit():
+            raise invalid()
+        payload_size = self.datasource.payload_size(entity_name=entity_name, cik=cik) if cik or entity_name else 0
+        return self.difficulty_controller.difficulty(self.batch_difficulty(batch_size), payload_size)
+
+    def parse_data_request(self, data) -> DataRequest:
+        """ Validates a /data request body. """
+
+        if not isinstance(data, dict):
+            raise invalid()
+        challenge_id = data.get("challenge_id")
+        challenge = data.get("challenge")
+        nonce = data.get("nonce")
+        difficulty = data.get("difficulty")
+        entity_name = data.get("entity_name")
+        cik = data.get("cik")
+        response_format = data.get("format", "envelope")
+
+        # a CIK resolves the entity directly, otherwise the exact entityName is used
+        lookup = {"cik": cik} if is_int(cik) else {"entity_name": entity_name}
+
+        if not all([challenge_id, challenge, is_int(nonce), is_int(difficulty)]):
+            logger.warning("Invalid request format.")
+            raise invalid()
+
+        # optional concept, unit and period filters
+        try:
+            projection = Projection.from_request(data)
+        except ValueError as e:
+            logger.warning(f"Invalid projection: {e}")
+            raise invalid(f"Invalid request format: {e}")
+
+        # "raw" returns the unmodified source document, which filters cannot apply to
+        if response_format not in FORMATS or (response_format == "raw" and projection is not None):
+            logger.warning(f"Invalid response format: {response_format}")
+            raise invalid()
+
+        return DataRequest(data, challenge_id, challenge, nonce, difficulty, lookup, projection,
+                           data.get("stream", False), response_format)
+
+    def check_challenge(self, difficulty: int, issued_difficulty):
+        """ Raises RequestError unless the challenge store knows the challenge, issued_difficulty
+        being None otherwise, and it is solved at no less than the difficulty it was issued with. """
+
+        if issued_difficulty is None or difficulty < issued_difficulty:
+            logger.warning("Challenge expired or invalid.")
+            raise invalid("Challenge expired or invalid")
+
+    def check_difficulty(self, difficulty: int, required: int, message: str):
+        if difficulty < required:
+            logger.warning(message)
+            raise invalid(message)
+
+    def pow_valid(self, challenge, nonce, difficulty) -> bool:
+        """ Returns True if the nonce solves the challenge at the given difficulty. """
+
+        with self.timer("pow_verify"):
+            hash_value = hashlib.sha256(f"{challenge}{nonce}".encode()).hexdigest()
+        valid = hash_value.startswith("0" * difficulty)
+        if self.pow_solutions is not None:
+            self.pow_solutions.inc(result="valid" if valid else "invalid")
+        return valid
+
+    def check_pow(self, challenge, nonce, difficulty):
+        if not self.pow_valid(challenge, nonce, difficulty):
+            logger.warning("Invalid PoW solution.")
+            raise RequestError(EntityFactory.create_response("error", "Invalid PoW solution."))
+
+    def check_data_solution(self, request: DataRequest, issued_difficulty) -> int:
+        """ Checks the challenge, its price for the entity's facts and the proof of work of a /data request.
+
+        Returns:
+            int: The entity's source payload bytes.
+        """
+        self.check_challenge(request.difficulty, issued_difficulty)
+        # large facts cost more to serve than the base difficulty pays for
+        payload_size = self.datasource.payload_size(**request.lookup)
+        self.check_difficulty(
+            request.difficulty, self.difficulty_controller.required(payload_size=payload_size),
+            "Difficulty too low for entity size, request a challenge for this entity."
+        )
+        self.check_pow(request.challenge, request.nonce, request.difficulty)
+        return payload_size
+
+    def batch_required(self, entities) -> int:
+        """ Returns the difficulty a batch must be solved at, scaled with its size and the combined size of its facts. """
+
+        return self.difficulty_controller.required(self.batch_difficulty(len(entities)), self.batch_payload_size(entities))
+
+    def entity_validators(self, data, entity_name=None, cik=None):
+        """ Returns (etag, last_modified) for the requested representation of an entity, or None. """
+
+        validators = self.datasource.validators(entity_name=entity_name, cik=cik)
+        if validators is None:
+            return None
+
+        etag, last_modified = validators
+        filters = {key: data[key] for key in PARAMETERS + ("format",) if data.get(key) is not None}
+        if filters:
+            etag = hashlib.sha256(etag.encode() + dumps(filters)).hexdigest()[:32]
+        return etag, last_modified
+
+    def data_document(self, request: DataRequest, payload_size: int, if_none_match, accept_encodings) -> Document:
+        """ Answers a /data request whose solution was checked and consumed.
+
+        Args:
+            if_none_match: The request's werkzeug ETags.
+            accept_encodings: The request's werkzeug Accept-Encoding.
+        """
+        try:
+            if self.datasource.is_empty():
+                return Document.json(EntityFactory.create_response("Error", "Invalid request format."), 400)
+
+            # conditional request, the client already holds the current representation
+            validators = self.entity_validators(request.data, **request.lookup)
+            if validators is not None and if_none_match.contains_weak(validators[0]):
+                return not_modified(validators)
+
+            if request.format == "raw":
+                document = self.raw_document(request.lookup, accept_encodings)
+            else:
+                # large payloads are streamed from the source files instead of being held in memory
+                stream = request.stream or payload_size > self.stream_threshold
+                document = self.entity_document(request.lookup, request.projection, stream)
+
+            if validators is not None and document.status == 200:
+                set_validators(document, validators)
+            return document
+        except Exception as e:
+            logger.error(f"Failed to read datasource: {e}")
+            return Document.json(EntityFactory.create_response("error", "Failed to fetch data."), 500)
+
+    def entity_document(self, lookup: dict, projection=None, stream: bool = False) -> Document:
+        """ Builds the /data envelope of an entity.
+
+        Projected responses are small, only the selected concepts are decoded and encoded.
+        Otherwise facts stay pre-encoded and are spliced into the envelope, or are copied chunk
+        by chunk from the source files while a streamed body is sent.
+        """
+        if projection is not None:
+            found = self.datasource.find_projected(projection, **lookup)
+        elif stream:
+            found = self.datasource.find_stream(**lookup)
+        else:
+            found = [(company_name, RawJSON(facts)) for company_name, facts in self.datasource.find_raw(**lookup)]
+
+        matches = [EntityFactory.create_company_facts(company_name=company_name, facts=facts) for company_name, facts in found]
+        if not matches:
+            return Document.json(EntityFactory.create_response("not_found", "No matching entities found."), 404)
+
+        envelope = EntityFactory.create_response("success", "Entity matches retrieved", data={"matches": matches})
+        if stream and projection is None:
+            return Document(stream_envelope(envelope, lookup))
+        with self.timer("serialize"):
+            return Document(encode(envelope))
+
+    def raw_document(self, lookup: dict, accept_encodings) -> Document:
+        """ Returns the entity's source document unchanged.
+
+        Pre-compressed sources are sent as stored when the client accepts their coding, so they
+        are neither decompressed nor recompressed; otherwise they are decompressed while streaming.
+        """
+        entries = self.datasource.find_documents(**lookup)
+        if not entries:
+            return Document.json(EntityFactory.create_response("not_found", "No matching entities found."), 404)
+        if len(entries) > 1:
+            return Document.json(EntityFactory.create_response("error", "Several documents match, request one by cik."), 400)
+
+        entry = entries[0]
+        encoding = source_encoding(entry.path)
+        if encoding is not None and negotiate_encoding(accept_encodings, (encoding,)):
+            return Document(
+                iter_file_range(entry.path, 0, entry.size, decompress=False),
+                headers={"Content-Encoding": encoding, "Content-Length": str(entry.size)}
+            )
+        return Document(iter_source(entry.path))
+
+def stream_envelope(envelope: dict, lookup: dict):
+    """ Yields an encoded envelope whose facts are read while it is sent. """
+
+    try:
+        yield from iter_encode(envelope)
+    except Exception as e:
+        # headers are already sent, the truncated body signals the failure to the client
+        logger.error(f"Failed to stream data for {lookup}: {e}")
@@ -0,0 +1,19 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# server modules import their siblings directly, as when they are run from server/
+sys.path.insert(0, os.path.join(ROOT, "server"))
+
+# the server's default paths are relative to server/, keep tests runnable from anywhere and
+# their catalog and observation store out of the repository
+_state_dir = tempfile.mkdtemp(prefix="companyfacts-tests-")
+atexit.register(shutil.rmtree, _state_dir, True)
+os.environ.setdefault("DATASOURCE_DIR", os.path.join(ROOT, "datasource"))
+os.environ.setdefault("CATALOG_PATH", os.path.join(_state_dir, "catalog.db"))
+os.environ.setdefault("OBSERVATIONS_PATH", os.path.join(_state_dir, "observations.db"))
+os.environ.setdefault("TICKERS_PATH", os.path.join(ROOT, "company_tickers.json"))
@@ -0,0 +1,168 @@
+import unittest
+import os
+import json
+import hashlib
+import tempfile
+import fakeredis
+from unittest import mock
+from server import app as server
+from server.catalog import Catalog
+from server.challenges import RedisChallenges
+from server.difficulty import DifficultyController
+from server.observations import ObservationStore
+
+class TestApp(unittest.TestCase):
+    """ Endpoint tests against the repository datasource, with challenges kept in fakeredis. """
+
+    def setUp(self):
+        self.client = server.app.test_client()
+        patches = [
+            mock.patch.object(server.limiter, "enabled", False),
+            mock.patch.object(server, "challenges", RedisChallenges(fakeredis.FakeRedis(), expiration=server.CHALLENGE_EXPIRATION)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def use_difficulty(self, base, max_difficulty, cost_bytes):
+        patch = mock.patch.object(server.service, "difficulty_controller", DifficultyController(base, max_difficulty, cost_bytes=cost_bytes))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def solve(self, challenge_data, **payload):
+        nonce = 0
+        while not hashlib.sha256(f"{challenge_data['challenge']}{nonce}".encode()).hexdigest().startswith("0" * challenge_data["difficulty"]):
+            nonce += 1
+        payload.update({key: challenge_data[key] for key in ("challenge_id", "challenge", "difficulty")}, nonce=nonce)
+        return payload
+
+    def test_capped_entity_difficulty(self):
+        """ Test that a challenge priced above max_difficulty is accepted at the capped difficulty. """
+
+        self.use_difficulty(base=2, max_difficulty=3, cost_bytes=1024)
+        challenge_data = self.client.get('/challenge', query_string={"cik": 1750}).get_json()
+        self.assertEqual(challenge_data["difficulty"], 3)
+
+        response = self.client.post('/data', json=self.solve(challenge_data, cik=1750, concepts="dei"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_priced_by_payload(self):
+        """ Test that a batch must be solved at the difficulty of its combined payload. """
+
+        self.use_difficulty(base=1, max_difficulty=4, cost_bytes=2 * 1024 * 1024)
+        unpriced = self.client.get('/challenge', query_string={"batch_size": 2}).get_json()
+        response = self.client.post('/data/batch', json=self.solve(unpriced, entities=[1750, "AAR CORP"]))
+        self.assertEqual(response.status_code, 400)
+
+        priced = self.client.post('/challenge', json={"entities": [1750, "AAR CORP"]}).get_json()
+        self.assertEqual(priced["difficulty"], unpriced["difficulty"] + 1)
+        response = self.client.post('/data/batch', json=self.solve(priced, entities=[1750, "AAR CORP"], concepts="dei"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([line["status"] for line in map(json.loads, response.data.splitlines())], ["success", "success"])
+
+    def test_malformed_bodies(self):
+        """ Test that bodies other than a JSON object, and booleans given for integers, are refused with 400. """
+
+        self.use_difficulty(base=1, max_difficulty=3, cost_bytes=1024 * 1024 * 1024)
+        for path in ('/data', '/data/batch', '/data/revalidate', '/observations'):
+            for body in ([1750], "AAR CORP", 1750, None):
+                response = self.client.post(path, json=body)
+                self.assertEqual(response.status_code, 400, (path, body))
+            response = self.client.post(path, data="{not json", content_type="application/json")
+            self.assertEqual(response.status_code, 400, path)
+
+        challenge_data = self.client.get('/challenge').get_json()
+        for payload in ({"entities": [True]}, {"entities": [1750], "nonce": True}, {"entities": [1750], "difficulty": True}):
+            body = dict(self.solve(challenge_data, entities=[1750]), **payload)
+            self.assertEqual(self.client.post('/data/batch', json=body).status_code, 400, payload)
+        for payload in ({"fy": True}, {"cik": False}, {"limit": True}, {"cursor": False}, {"nonce": True}):
+            body = dict(self.solve(challenge_data, concept="dei.EntityCommonStockSharesOutstanding"), **payload)
+            self.assertEqual(self.client.post('/observations', json=body).status_code, 400, payload)
+        self.assertEqual(self.client.post('/challenge', json={"entities": [False]}).status_code, 400)
+
+    def test_revalidate(self):
+        """ Test that revalidation answers 304 for a current ETag and 400 for a malformed CIK. """
+
+        modified = self.client.post('/data/revalidate', json={"cik": 1750})
+        self.assertEqual(modified.status_code, 200)
+        etag = modified.get_json()["data"]["etag"]
+
+        current = self.client.post('/data/revalidate', json={"cik": 1750}, headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual(current.status_code, 304)
+
+        for cik in ("abc", True, 1750.0):
+            response = self.client.post('/data/revalidate', json={"entity_name": "AAR CORP", "cik": cik})
+            self.assertEqual(response.status_code, 400)
+
+    def test_changes(self):
+        """ Test that the change feed pages by sequence number and refuses bad parameters. """
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        catalog = Catalog(os.path.join(tmpdir.name, "catalog.db"))
+        catalog.record_changes([
+            {"name": "CIK0000001750.json", "cik": 1750, "entity_name": "AAR CORP", "change": "modified",
+             "sha256": "abc", "concepts": ["dei.EntityCommonStockSharesOutstanding"], "accessions": ["acc-1"]},
+            {"name": "CIK0000000002.json", "cik": 2, "entity_name": "WIDGET INC", "change": "removed"},
+        ])
+        patch = mock.patch.object(server.datasource.index, "catalog", catalog)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        response = self.client.get('/changes', query_string={"limit": 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()["data"]
+        self.assertEqual([(change["seq"], change["cik"], change["concepts"]) for change in data["changes"]],
+                         [(1, 1750, ["dei.EntityCommonStockSharesOutstanding"])])
+
+        data = self.client.get('/changes', query_string={"since": data["next"]}).get_json()["data"]
+        self.assertEqual([change["change"] for change in data["changes"]], ["removed"])
+        self.assertEqual(data["next"], 2)
+        self.assertEqual(self.client.get('/changes', query_string={"since": 2}).get_json()["data"], {"changes": [], "next": 2})
+
+        for query_string in ({"since": "abc"}, {"since": -1}, {"limit": 0}):
+            self.assertEqual(self.client.get('/changes', query_string=query_string).status_code, 400)
+
+    def test_observations(self):
+        """ Test that observations are filtered and paged by cursor, a challenge is spent once and
+        kept while the store is not built. """
+
+        self.use_difficulty(base=1, max_difficulty=3, cost_bytes=1024 * 1024 * 1024)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        store = ObservationStore(os.path.join(tmpdir.name, "observations.db"))
+        patch = mock.patch.object(server, "observation_store", store)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        def query(payload):
+            challenge_data = self.client.get('/challenge').get_json()
+            return self.client.post('/observations', json=self.solve(challenge_data, **payload))
+
+        payload = self.solve(self.client.get('/challenge').get_json(), concept="dei.EntityCommonStockSharesOutstanding", fy=2015)
+        self.assertEqual(self.client.post('/observations', json=payload).status_code, 503)
+        store.build(os.path.join(os.path.dirname(__file__), "..", "datasource"))
+        response = self.client.post('/observations', json=payload)
+        self.assertEqual(response.status_code, 200)
+        rows = response.get_json()["data"]["observations"]
+        self.assertTrue(rows)
+        self.assertEqual({(row["cik"], row["entity_name"], row["fy"]) for row in rows}, {(1750, "AAR CORP", 2015)})
+        self.assertEqual(self.client.post('/observations', json=payload).status_code, 400)
+
+        expected = list(store.query("dei.EntityCommonStockSharesOutstanding"))
+        pages, cursor = [], 0
+        while cursor is not None:
+            data = query({"concept": "dei.EntityCommonStockSharesOutstanding", "limit": 20, "cursor": cursor}).get_json()["data"]
+            pages.append(data["observations"])
+            cursor = data["next_cursor"]
+        self.assertEqual([len(page) for page in pages], [20, 20, len(expected) - 40])
+        self.assertEqual([row for page in pages for row in page], expected)
+
+        data = query({"concept": "dei.EntityCommonStockSharesOutstanding", "cik": 2}).get_json()["data"]
+        self.assertEqual(data, {"concept": "dei.EntityCommonStockSharesOutstanding", "observations": [], "next_cursor": None})
+        for payload in ({"concept": "EntityCommonStockSharesOutstanding"}, {"concept": "dei.Foo", "fy": "2015"},
+                        {"concept": "dei.Foo", "limit": 0}):
+            self.assertEqual(query(payload).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
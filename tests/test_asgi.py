@@ -0,0 +1,104 @@
+import unittest
+import os
+import json
+import hashlib
+import httpx
+import fakeredis
+from unittest import mock
+from server import asgi
+from server.challenges import AsyncRedisChallenges
+from server.difficulty import DifficultyController
+
+SOURCE_PATH = os.path.join(os.path.dirname(__file__), "..", "datasource", "CIK0000001750.json")
+
+class TestAsgi(unittest.IsolatedAsyncioTestCase):
+    """ Tests of the async handlers against the repository datasource, with challenges kept in fakeredis. """
+
+    async def asyncSetUp(self):
+        patches = [
+            mock.patch.object(asgi.wsgi.limiter, "enabled", False),
+            mock.patch.object(asgi, "challenges", AsyncRedisChallenges(fakeredis.FakeAsyncRedis(), expiration=60)),
+            mock.patch.object(asgi.wsgi.service, "difficulty_controller", DifficultyController(1, 3)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi.app), base_url="http://testserver")
+        self.addAsyncCleanup(self.client.aclose)
+
+    async def solve(self, **payload):
+        challenge_data = (await self.client.get("/challenge", params={"cik": 1750})).json()
+        nonce = 0
+        while not hashlib.sha256(f"{challenge_data['challenge']}{nonce}".encode()).hexdigest().startswith("0" * challenge_data["difficulty"]):
+            nonce += 1
+        payload.update({key: challenge_data[key] for key in ("challenge_id", "challenge", "difficulty")}, nonce=nonce)
+        return payload
+
+    async def test_challenge(self):
+        """ Test that GET prices an entity and POST a batch, and bad parameters are refused. """
+
+        response = await self.client.get("/challenge", params={"cik": 1750})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["difficulty"], 1)
+
+        response = await self.client.post("/challenge", json={"entities": [1750, "AAR CORP"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["difficulty"], 2)
+
+        response = await self.client.get("/challenge", params={"cik": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_data_envelope(self):
+        """ Test the JSON envelope, and that an unknown challenge is refused. """
+
+        payload = await self.solve(cik=1750)
+        response = await self.client.post("/data", json=payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["ETag"])
+        matches = response.json()["data"]["matches"]
+        self.assertEqual([match["company_name"] for match in matches], ["AAR CORP"])
+
+        response = await self.client.post("/data", json=dict(payload, challenge="datafeed0"))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Challenge expired or invalid"})
+
+    async def test_data_streamed(self):
+        """ Test that a streamed envelope matches the buffered one. """
+
+        buffered = await self.client.post("/data", json=await self.solve(cik=1750))
+        streamed = await self.client.post("/data", json=await self.solve(cik=1750, stream=True))
+        self.assertEqual(streamed.status_code, 200)
+        self.assertNotIn("Content-Length", streamed.headers)
+        facts = [[match["facts"] for match in response.json()["data"]["matches"]] for response in (streamed, buffered)]
+        self.assertEqual(facts[0], facts[1])
+
+    async def test_data_not_modified(self):
+        """ Test that a request with the current ETag is answered with 304. """
+
+        response = await self.client.post("/data", json=await self.solve(cik=1750, concepts="dei"))
+        etag = response.headers["ETag"]
+
+        response = await self.client.post("/data", json=await self.solve(cik=1750, concepts="dei"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    async def test_data_raw(self):
+        """ Test that the raw format returns the source document unchanged. """
+
+        response = await self.client.post("/data", json=await self.solve(cik=1750, format="raw"))
+        self.assertEqual(response.status_code, 200)
+        with open(SOURCE_PATH, 'rb') as infile:
+            self.assertEqual(response.content, infile.read())
+
+        response = await self.client.post("/data", json=await self.solve(cik=1750, format="raw", concepts="dei"))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_forwarded_route(self):
+        """ Test that routes without an async handler are served by the flask app. """
+
+        response = await self.client.get("/sanity")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {"status": "healthy"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import asyncio
+import json
+import httpx
+from client.async_client import AsyncApiClient
+
+class TestAsyncClient(unittest.TestCase):
+
+    def setUp(self):
+        self.requests = []
+
+    def handler(self, request):
+        """ Mock server issuing trivial challenges and echoing the requested entities. """
+
+        self.requests.append(request)
+        if request.url.path == "/challenge":
+            return httpx.Response(200, json={"challenge_id": "abcd1234", "challenge": "datafeed12345", "difficulty": 1})
+
+        payload = json.loads(request.content)
+        if request.url.path == "/data/batch":
+            lines = [json.dumps({"status": "success", "data": {"entity": entity}}) for entity in payload["entities"]]
+            return httpx.Response(200, content="\n".join(lines))
+        if payload["entity_name"] == "UNKNOWN":
+            return httpx.Response(404, json={"status": "not_found", "data": {}})
+        return httpx.Response(200, json={"status": "success", "data": {"entity": payload["entity_name"]}})
+
+    def fetch_many(self, entities, batch_size):
+        async def run():
+            client = AsyncApiClient(
+                "http://testapi", challenges_per_minute=6000, backend="python", transport=httpx.MockTransport(self.handler)
+            )
+            async with client:
+                return await client.fetch_many(entities, batch_size=batch_size)
+        return asyncio.run(run())
+
+    def test_fetch_many_batches(self):
+        """ Test that entities are grouped into batch requests, one challenge per batch. """
+
+        results = self.fetch_many(["AAR CORP", 1750, "ACME"], batch_size=2)
+
+        self.assertEqual(set(results), {"AAR CORP", 1750, "ACME"})
+        self.assertTrue(all(result["status"] == "success" for result in results.values()))
+        self.assertEqual(sum(1 for request in self.requests if request.url.path == "/challenge"), 2)
+
+    def test_fetch_many_single_entities(self):
+        """ Test that unbatched lookups report unknown entities as not found. """
+
+        results = self.fetch_many(["AAR CORP", "UNKNOWN"], batch_size=1)
+
+        self.assertEqual(results["AAR CORP"]["status"], "success")
+        self.assertEqual(results["UNKNOWN"]["status"], "not_found")
+
+    def test_fetch_many_pairs_challenges_with_groups(self):
+        """ Test that every group is fetched with the challenge priced for it, however fetches interleave. """
+
+        async def handler(request):
+            # challenges name the entities they were priced for, fetches take varying times
+            if request.url.path == "/challenge":
+                group = json.loads(request.content)["entities"] if request.method == "POST" else [request.url.params["entity_name"]]
+                return httpx.Response(200, json={"challenge_id": "abcd1234", "challenge": json.dumps(group), "difficulty": 1})
+
+            payload = json.loads(request.content)
+            group = payload.get("entities") or [payload["entity_name"]]
+            if json.loads(payload["challenge"]) != group:
+                return httpx.Response(400, json={"error": "Difficulty too low for batch, request a challenge for these entities."})
+            await asyncio.sleep(0.002 * (int(group[0].split()[1]) % 5))
+            if request.url.path == "/data/batch":
+                return httpx.Response(200, content="\n".join(json.dumps({"status": "success", "data": {"entity": entity}}) for entity in group))
+            return httpx.Response(200, json={"status": "success", "data": {"entity": group[0]}})
+
+        entities = [f"ENTITY {index}" for index in range(40)]
+
+        async def run():
+            client = AsyncApiClient(
+                "http://testapi", challenges_per_minute=60000, backend="python", transport=httpx.MockTransport(handler)
+            )
+            async with client:
+                return await client.fetch_many(entities, batch_size=3)
+
+        results = asyncio.run(run())
+        self.assertEqual(set(results), set(entities))
+        self.assertTrue(all(result is not None and result["status"] == "success" for result in results.values()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from server.cache import FactsCache
+
+class TestFactsCache(unittest.TestCase):
+
+    def test_evicts_by_total_bytes(self):
+        """ Test that least recently used entries are evicted once the byte budget is exceeded. """
+
+        cache = FactsCache(max_bytes=100)
+        cache.put("a", 1, 40)
+        cache.put("b", 2, 40)
+        cache.get("a")
+        cache.put("c", 3, 40)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(cache.current_bytes, 80)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_oversized_entry_is_not_cached(self):
+        """ Test that a payload larger than the whole budget is never cached. """
+
+        cache = FactsCache(max_bytes=10)
+        cache.put("a", 1, 11)
+        self.assertEqual(len(cache), 0)
+
+    def test_get_or_load_counters(self):
+        """ Test hit/miss accounting and that the loader runs only on a miss. """
+
+        cache = FactsCache(max_bytes=100)
+        calls = []
+        loader = lambda: calls.append(1) or {"facts": {}}
+
+        first = cache.get_or_load(("path", 1.0, "ACME"), loader, 10)
+        second = cache.get_or_load(("path", 1.0, "ACME"), loader, 10)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
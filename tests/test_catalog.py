@@ -0,0 +1,132 @@
+import unittest
+import json
+import os
+import sqlite3
+import tempfile
+from server.catalog import Catalog, EntityIndex, build, file_hash
+from server.datasource import Datasource
+from server.projection import Projection
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.datasource_dir = os.path.join(self.tmpdir.name, "datasource")
+        os.makedirs(self.datasource_dir)
+        self.catalog_path = os.path.join(self.tmpdir.name, "catalog.db")
+        for cik, name in ((1, "ACME CORP"), (2, "WIDGET INC")):
+            self.write(cik, name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, cik, entity_name, facts=None):
+        path = os.path.join(self.datasource_dir, f"CIK{cik:010d}.json")
+        with open(path, 'w') as outfile:
+            json.dump({"cik": cik, "entityName": entity_name, "facts": facts or {"dei": {}}}, outfile)
+        return path
+
+    def warm_index(self):
+        return EntityIndex(self.datasource_dir, catalog=Catalog(self.catalog_path))
+
+    def warm_datasource(self):
+        datasource = Datasource(self.datasource_dir, catalog=Catalog(self.catalog_path))
+        datasource.index.refresh()
+        return datasource
+
+    def test_warm_start(self):
+        """ Test that an index warm started from a built catalog reindexes nothing. """
+
+        self.assertEqual(build(self.datasource_dir, self.catalog_path), 2)
+
+        index = self.warm_index()
+        self.assertEqual(index.refresh(), 0)
+        entry = index.lookup(cik=2)[0]
+        self.assertEqual(entry.entity_name, "WIDGET INC")
+        self.assertEqual(index.file_record(entry.path).sha256, file_hash(entry.path))
+
+    def test_incremental_revalidation(self):
+        """ Test that only modified files are reindexed and deleted ones dropped from the catalog. """
+
+        build(self.datasource_dir, self.catalog_path)
+        modified = self.write(1, "ACME CORP", {"dei": {"Foo": {"units": {}}}})
+        os.utime(modified, (1, 1))
+        os.remove(os.path.join(self.datasource_dir, "CIK0000000002.json"))
+
+        index = self.warm_index()
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual(index.lookup(cik=2), [])
+        self.assertEqual(Catalog(self.catalog_path).hashes(), {"CIK0000000001.json": file_hash(modified)})
+        self.assertEqual(self.warm_index().refresh(), 0)
+
+    def test_schema_migration(self):
+        """ Test that a catalog written before CSV rows and concepts were indexed is migrated and loaded. """
+
+        path = os.path.join(self.datasource_dir, "CIK0000000001.json")
+        stat = os.stat(path)
+        os.remove(os.path.join(self.datasource_dir, "CIK0000000002.json"))
+        conn = sqlite3.connect(self.catalog_path)
+        conn.executescript("""
+            CREATE TABLE files (name TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, sha256 TEXT);
+            CREATE TABLE entities (name TEXT NOT NULL, entity_name TEXT, cik INTEGER, kind TEXT NOT NULL,
+                                   offset INTEGER, length INTEGER);
+        """)
+        conn.execute("INSERT INTO files VALUES (?, ?, ?, ?)", ("CIK0000000001.json", stat.st_size, stat.st_mtime, "old"))
+        conn.execute("INSERT INTO entities VALUES (?, ?, ?, ?, ?, ?)", ("CIK0000000001.json", "ACME CORP", 1, "json", None, None))
+        conn.commit()
+        conn.close()
+
+        index = self.warm_index()
+        self.assertEqual(index.refresh(), 0)
+        self.assertEqual(index.lookup(cik=1)[0].entity_name, "ACME CORP")
+
+        conn = sqlite3.connect(self.catalog_path)
+        self.assertIn("rows", {column[1] for column in conn.execute("PRAGMA table_info(entities)")})
+        self.assertIn("concepts", {column[1] for column in conn.execute("PRAGMA table_info(files)")})
+        conn.close()
+
+    def test_concept_ranges(self):
+        """ Test that projecting through catalogued concept ranges matches projecting the whole facts,
+        and that a changed mtime invalidates the ranges. """
+
+        facts = {
+            "dei": {"EntityCommonStockSharesOutstanding": {"units": {"shares": [{"end": "2023-06-30", "val": 100, "fy": 2023}]}}},
+            "us-gaap": {
+                "Assets": {"units": {"USD": [{"end": "2023-06-30", "val": 7, "fy": 2023}]}},
+                "Revenues": {"units": {"USD": [
+                    {"end": "2022-06-30", "val": 4, "fy": 2022},
+                    {"end": "2023-06-30", "val": 5, "fy": 2023},
+                ]}},
+            },
+        }
+        path = self.write(1, "ACME CORP", facts)
+        catalog = Catalog(self.catalog_path, concept_min_bytes=0)
+        datasource = Datasource(self.datasource_dir, catalog=catalog)
+        datasource.index.refresh()
+        projection = Projection.from_request({"concepts": ["dei", "us-gaap.Revenues"], "fy": 2023})
+
+        entry = datasource.lookup(cik=1)[0]
+        self.assertIsNotNone(datasource.concept_ranges(entry, projection))
+        self.assertEqual(datasource.find_projected(projection, cik=1), [("ACME CORP", projection.apply(json.dumps(facts)))])
+
+        os.utime(path, (1, 1))
+        self.assertIsNone(catalog.concept_ranges(
+            self.datasource_dir, path, os.stat(path).st_mtime, projection.taxonomies, projection.concepts
+        ))
+
+    def test_stable_validators(self):
+        """ Test that the ETag of a file indexed on the request path does not change once the catalog
+        hashes it, nor after a warm start, and does change with the file. """
+
+        datasource = Datasource(self.datasource_dir, catalog=Catalog(self.catalog_path))
+        validators = datasource.validators(cik=1)
+        datasource.index.flush()
+        self.assertIsNotNone(datasource.index.file_record(datasource.lookup(cik=1)[0].path).sha256)
+        self.assertEqual(datasource.validators(cik=1), validators)
+        self.assertEqual(self.warm_datasource().validators(cik=1), validators)
+
+        os.utime(self.write(1, "ACME CORP", {"us-gaap": {}}), (1, 1))
+        self.assertNotEqual(self.warm_datasource().validators(cik=1), validators)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import time
+import asyncio
+import fakeredis
+from unittest import mock
+from server.challenges import StatelessChallenges, MemoryReplayGuard, RedisChallenges, AsyncRedisChallenges, AsyncRedisReplayGuard
+
+class TestStatelessChallenges(unittest.TestCase):
+
+    def setUp(self):
+        self.challenges = StatelessChallenges(b"secret", expiration=60)
+
+    def test_issue_and_verify(self):
+        """ Test that issued challenges verify with their difficulty and are unique. """
+
+        challenge_id, challenge = self.challenges.issue(5)
+        self.assertEqual(self.challenges.verify(challenge_id, challenge), 5)
+        self.assertNotEqual(self.challenges.issue(5), self.challenges.issue(5))
+
+    def test_rejects_tampering(self):
+        """ Test that a changed difficulty, foreign secret or mismatched id is rejected. """
+
+        challenge_id, challenge = self.challenges.issue(5)
+        nonce, issued, _, signature = challenge.split(".")
+        self.assertIsNone(self.challenges.verify(challenge_id, f"{nonce}.{issued}.1.{signature}"))
+        self.assertIsNone(StatelessChallenges(b"other").verify(challenge_id, challenge))
+        self.assertIsNone(self.challenges.verify("0" * 32, challenge))
+        self.assertIsNone(self.challenges.verify(challenge_id, None))
+
+    def test_expiry(self):
+        """ Test that challenges stop verifying after the expiration time. """
+
+        challenge_id, challenge = self.challenges.issue(4)
+        with mock.patch("server.challenges.time.time", return_value=time.time() + 61):
+            self.assertIsNone(self.challenges.verify(challenge_id, challenge))
+
+    def test_consume_once(self):
+        """ Test that a solved challenge can only be spent once. """
+
+        challenge_id, _ = self.challenges.issue(4)
+        self.assertTrue(self.challenges.consume(challenge_id))
+        self.assertFalse(self.challenges.consume(challenge_id))
+
+class TestMemoryReplayGuard(unittest.TestCase):
+
+    def test_rotation(self):
+        """ Test that ids are remembered for at least ttl seconds and then forgotten. """
+
+        guard = MemoryReplayGuard(ttl=10)
+        now = time.monotonic()
+        with mock.patch("server.challenges.time.monotonic", return_value=now):
+            self.assertTrue(guard.add("a"))
+        with mock.patch("server.challenges.time.monotonic", return_value=now + 15):
+            self.assertFalse(guard.add("a"))
+        with mock.patch("server.challenges.time.monotonic", return_value=now + 40):
+            self.assertTrue(guard.add("a"))
+
+class TestAsyncRedisChallenges(unittest.TestCase):
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        self.sync_challenges = RedisChallenges(fakeredis.FakeRedis(server=server))
+        self.async_redis = fakeredis.FakeAsyncRedis(server=server)
+        self.async_challenges = AsyncRedisChallenges(self.async_redis)
+
+    def test_shared_with_sync_challenges(self):
+        """ Test that challenges issued by either client verify with their difficulty on the other. """
+
+        async def scenario():
+            challenge_id, challenge = await self.async_challenges.issue(6)
+            self.assertEqual(self.sync_challenges.verify(challenge_id, challenge), 6)
+
+            challenge_id, challenge = self.sync_challenges.issue(5)
+            self.assertEqual(await self.async_challenges.verify(challenge_id, challenge), 5)
+            self.assertIsNone(await self.async_challenges.verify(challenge_id, "forged"))
+
+        asyncio.run(scenario())
+
+    def test_consume_once(self):
+        """ Test that a challenge consumed by either client can neither be consumed nor verified again. """
+
+        async def scenario():
+            challenge_id, challenge = self.sync_challenges.issue(4)
+            self.assertTrue(await self.async_challenges.consume(challenge_id))
+            self.assertFalse(self.sync_challenges.consume(challenge_id))
+            self.assertIsNone(await self.async_challenges.verify(challenge_id, challenge))
+
+            challenge_id, _ = await self.async_challenges.issue(4)
+            self.assertTrue(self.sync_challenges.consume(challenge_id))
+            self.assertFalse(await self.async_challenges.consume(challenge_id))
+
+        asyncio.run(scenario())
+
+    def test_async_replay_guard(self):
+        """ Test that stateless challenges consume once through the async replay guard. """
+
+        challenges = StatelessChallenges(b"secret", replay_guard=AsyncRedisReplayGuard(self.async_redis, ttl=65))
+        challenge_id, _ = challenges.issue(4)
+
+        async def scenario():
+            self.assertTrue(await challenges.consume(challenge_id))
+            self.assertFalse(await challenges.consume(challenge_id))
+
+        asyncio.run(scenario())
+
+if __name__ == '__main__':
+    unittest.main()
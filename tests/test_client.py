@@ -1,8 +1,10 @@
 import unittest
 import hashlib
+import tempfile
 import requests
 from unittest.mock import patch
-from client.api_client import get_challenge, solve_pow, fetch_data
+from client.api_client import get_challenge, solve_pow, fetch_data, fetch_batch, revalidate
+from client.cache import ResponseCache
 
 class TestClient(unittest.TestCase):
 
@@ -85,5 +87,44 @@ class TestClient(unittest.TestCase):
         
         self.assertIn("Failed to fetch data", str(context.exception))
 
+    @patch('client.api_client.session.post')
+    def test_fetch_batch(self, mock_post):
+        """ Test streaming NDJSON results for a batch of entities. """
+
+        # mock the server's streamed response
+        response = mock_post.return_value.__enter__.return_value
+        response.status_code = 200
+        response.iter_lines.return_value = [
+            b'{"status": "success", "data": {"entity": "AAR CORP", "matches": []}}',
+            b'',
+            b'{"status": "not_found", "data": {"entity": 1750}}',
+        ]
+
+        results = list(fetch_batch("http://testapi", "abcd1234", "datafeed12345", 67890, 5, ["AAR CORP", 1750]))
+
+        self.assertEqual([result["data"]["entity"] for result in results], ["AAR CORP", 1750])
+        self.assertEqual(mock_post.call_args.kwargs["json"]["entities"], ["AAR CORP", 1750])
+
+    @patch('client.api_client.session.post')
+    def test_fetch_data_conditional(self, mock_post):
+        """ Test that cached data is sent with If-None-Match and served on 304. """
+
+        cache = ResponseCache(tempfile.mkdtemp())
+
+        # first fetch stores the response with its ETag
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.headers = {"ETag": '"v1"', "Last-Modified": "Tue, 01 Oct 2024 00:00:00 GMT"}
+        mock_post.return_value.json.return_value = {"status": "success", "data": {"matches": []}}
+        fetch_data("http://testapi", "abcd1234", "datafeed12345", 67890, 4, "AAR CORP", cache=cache)
+
+        # revalidation without a PoW returns the cached data
+        mock_post.return_value.status_code = 304
+        mock_post.return_value.json.side_effect = ValueError("no body")
+        data = revalidate("http://testapi", "AAR CORP", cache)
+
+        self.assertEqual(data, {"status": "success", "data": {"matches": []}})
+        self.assertEqual(mock_post.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+        self.assertTrue(mock_post.call_args.args[0].endswith("/data/revalidate"))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,64 @@
+import unittest
+import json
+from array import array
+from server.compact import CompactFacts, matches_size
+from server.projection import Projection
+
+FACTS = {
+    "dei": {
+        "EntityCommonStockSharesOutstanding": {
+            "label": "Shares",
+            "description": "Shares outstanding.",
+            "units": {"shares": [
+                {"end": "2022-06-30", "val": 10, "accn": "0000001-22-000001", "fy": 2022, "fp": "FY", "form": "10-K", "filed": "2022-08-01"},
+                {"end": "2023-06-30", "val": 11, "accn": "0000001-23-000001", "fy": 2023, "fp": "FY", "form": "10-K", "filed": "2023-08-01", "frame": "CY2023Q2I"},
+            ]},
+        },
+    },
+    "us-gaap": {
+        "Revenues": {"label": "Revenues", "description": None, "units": {"USD": [
+            {"start": "2023-01-01", "end": "2023-03-31", "val": 5.5, "accn": "0000001-23-000002", "fy": 2023, "fp": "Q1", "form": "10-Q", "filed": "2023-05-01"},
+            {"start": "2023-04-01", "end": "2023-06-30", "val": 6.25, "accn": "0000001-23-000002", "fy": 2023, "fp": "Q2", "form": "10-Q", "filed": "2023-08-01"},
+        ]}},
+    },
+}
+
+class TestCompactFacts(unittest.TestCase):
+
+    def setUp(self):
+        self.compact = CompactFacts.from_facts(json.loads(json.dumps(FACTS)))
+
+    def test_round_trip(self):
+        """ Test that materializing compact facts restores the original object, including absent fields. """
+
+        self.assertEqual(self.compact.to_dict(), FACTS)
+        self.assertEqual(len(self.compact), 4)
+
+    def test_columns(self):
+        """ Test that numeric columns are arrays and repeated strings are stored once. """
+
+        _, units = self.compact.concepts[("us-gaap", "Revenues")]
+        columns = units["USD"]
+        self.assertIsInstance(columns.column("val"), array)
+        self.assertEqual(columns.column("val").typecode, "d")
+        self.assertIsInstance(columns.column("fy"), array)
+        accns = columns.column("accn")
+        self.assertIs(accns[0], accns[1])
+        self.assertIsNone(columns.column("frame"))
+
+    def test_project_matches_projection_apply(self):
+        """ Test that projecting compact facts gives the same result as projecting the encoded facts. """
+
+        for data in ({"concepts": ["us-gaap"]}, {"fy": 2023}, {"fp": ["Q2", "FY"], "start": "2023-01-01"},
+                     {"units": "shares"}, {"end": "2000-01-01"}):
+            projection = Projection.from_request(data)
+            self.assertEqual(self.compact.project(projection), projection.apply(json.dumps(FACTS)), data)
+
+    def test_size(self):
+        """ Test that compact facts are sized by memory and encoded facts by length. """
+
+        self.assertGreater(self.compact.nbytes(), 0)
+        self.assertEqual(matches_size([("A", b"{}"), ("B", self.compact)]), 2 + self.compact.nbytes())
+
+if __name__ == '__main__':
+    unittest.main()
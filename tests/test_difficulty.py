@@ -0,0 +1,67 @@
+import unittest
+import time
+from unittest import mock
+from server.difficulty import DifficultyController, levels
+
+class TestDifficultyController(unittest.TestCase):
+
+    def test_levels(self):
+        """ Test that each factor of 16 above 1 adds one level. """
+
+        self.assertEqual([levels(r) for r in (0, 1, 1.01, 16, 17, 256, 257)], [0, 0, 1, 1, 2, 2, 3])
+
+    def test_idle_difficulty(self):
+        """ Test that an idle server issues the minimum difficulty. """
+
+        controller = DifficultyController(base=4)
+        self.assertEqual(controller.difficulty(), 4)
+        self.assertEqual(controller.difficulty(minimum=6), 6)
+
+    def test_in_flight_raises_difficulty(self):
+        """ Test that requests in flight above the target raise the difficulty until they finish. """
+
+        controller = DifficultyController(base=4, target_rate=1e9, target_in_flight=2)
+        for _ in range(3):
+            controller.started()
+        self.assertEqual(controller.difficulty(), 5)
+        for _ in range(3):
+            controller.finished()
+        self.assertEqual(controller.difficulty(), 4)
+
+    def test_rate_decays(self):
+        """ Test that a burst raises the difficulty and that the rate decays afterwards. """
+
+        controller = DifficultyController(base=4, target_rate=1.0, target_in_flight=1000, window=10.0)
+        for _ in range(50):
+            controller.started()
+            controller.finished()
+        self.assertEqual(controller.difficulty(), 5)
+        self.assertAlmostEqual(controller.state()["rate"], 5.0, places=1)
+
+        later = time.monotonic() + 60
+        with mock.patch("server.difficulty.time.monotonic", return_value=later):
+            self.assertEqual(controller.difficulty(), 4)
+
+    def test_cost_and_cap(self):
+        """ Test that large payloads raise the difficulty and that it is capped. """
+
+        controller = DifficultyController(base=4, max_difficulty=6, cost_bytes=1000)
+        self.assertEqual(controller.difficulty(payload_size=1000), 4)
+        self.assertEqual(controller.difficulty(payload_size=1001), 5)
+        self.assertEqual(controller.difficulty(payload_size=10 ** 9), 6)
+        self.assertEqual(controller.difficulty(minimum=7, payload_size=10 ** 9), 7)
+
+    def test_required_matches_issued_cap(self):
+        """ Test that the difficulty required for a payload is capped like the issued one, ignoring load. """
+
+        controller = DifficultyController(base=6, max_difficulty=7, target_in_flight=1, cost_bytes=1000)
+        controller.started()
+        controller.started()
+        self.assertEqual(controller.required(payload_size=10 ** 9), 7)
+        self.assertEqual(controller.required(payload_size=10 ** 9), controller.difficulty(payload_size=10 ** 9))
+        self.assertEqual(controller.required(payload_size=1000), 6)
+        self.assertEqual(controller.required(minimum=8, payload_size=10 ** 9), 8)
+        self.assertEqual(controller.state()["difficulty"], controller.difficulty())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import json
+import gzip
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+from server.encoding import RawJSON, RawStream, encode, iter_encode, pack_matches, unpack_matches
+from server.encoding import negotiate_encoding, compress, iter_compress
+
+class TestEncoding(unittest.TestCase):
+
+    def test_encode_splices_raw_json(self):
+        """ Test that pre-encoded facts are spliced verbatim into the envelope. """
+
+        raw = b'{"dei": {"Foo": 1}}'
+        envelope = {"status": "success", "data": {"matches": [{"company_name": "ACME", "facts": RawJSON(raw)}]}}
+
+        body = encode(envelope)
+        self.assertIn(raw, body)
+        self.assertEqual(json.loads(body)["data"]["matches"][0]["facts"], {"dei": {"Foo": 1}})
+
+    def test_iter_encode_streams_chunks(self):
+        """ Test that streamed chunks produce the same document as the buffered encoder. """
+
+        envelope = {
+            "status": "success",
+            "data": {"matches": [{"company_name": "ACME", "facts": RawStream(iter([b'{"a":', b' [1, 2]}']))}]},
+            "empty": {},
+        }
+
+        chunks = list(iter_encode(envelope))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(
+            json.loads(b"".join(chunks)),
+            {"status": "success", "data": {"matches": [{"company_name": "ACME", "facts": {"a": [1, 2]}}]}, "empty": {}}
+        )
+
+    def test_pack_matches_roundtrip(self):
+        """ Test that packed matches survive the shared cache roundtrip. """
+
+        matches = [("ACME\nCORP", b'{"a": 1}'), ("WIDGET", b"{}")]
+        self.assertEqual(unpack_matches(pack_matches(matches)), matches)
+
+    def test_negotiate_encoding(self):
+        """ Test that the highest quality offered coding wins and unaccepted codings are never chosen. """
+
+        def accept(header):
+            return parse_accept_header(header, Accept)
+
+        self.assertEqual(negotiate_encoding(accept("gzip, deflate")), "gzip")
+        self.assertEqual(negotiate_encoding(accept("gzip;q=1, zstd;q=0.5"), ("zstd", "gzip")), "gzip")
+        self.assertEqual(negotiate_encoding(accept("identity")), None)
+        self.assertEqual(negotiate_encoding(accept("gzip;q=0")), None)
+        self.assertEqual(negotiate_encoding(accept("*"), ("gzip",)), "gzip")
+
+    def test_compress_roundtrip(self):
+        """ Test that whole and streamed gzip compression decode to the original bytes. """
+
+        chunks = [b'{"a":', b"1" * 5000, b"}"]
+        self.assertEqual(gzip.decompress(compress(b"".join(chunks), "gzip")), b"".join(chunks))
+        self.assertEqual(gzip.decompress(b"".join(iter_compress(iter(chunks), "gzip"))), b"".join(chunks))
+        with self.assertRaises(ValueError):
+            compress(b"", "br")
+
+if __name__ == '__main__':
+    unittest.main()
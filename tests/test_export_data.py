@@ -0,0 +1,89 @@
+import unittest
+import json
+import os
+import glob
+import tempfile
+import pyarrow.parquet as pq
+from client.export_data import export_datasource, load_manifest
+
+def observation(fy, val):
+    return {"end": f"{fy}-12-31", "val": val, "accn": f"acc-{fy}", "fy": fy, "fp": "FY", "form": "10-K", "filed": f"{fy + 1}-02-15"}
+
+def document(cik, taxonomies):
+    return {"cik": cik, "entityName": f"COMPANY {cik}", "facts": {
+        taxonomy: {"Assets": {"units": {"USD": [observation(2022, 1), observation(2023, 2)]}}}
+        for taxonomy in taxonomies
+    }}
+
+class TestExportData(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.datasource_dir = os.path.join(self.tmpdir.name, "datasource")
+        self.output_dir = os.path.join(self.tmpdir.name, "export")
+        os.makedirs(self.datasource_dir)
+        self.write(1, ("dei", "us-gaap"))
+        self.write(2, ("us-gaap",))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, cik, taxonomies):
+        path = os.path.join(self.datasource_dir, f"CIK{cik:010d}.json")
+        with open(path, 'w') as outfile:
+            json.dump(document(cik, taxonomies), outfile)
+        return path
+
+    def parts(self):
+        return sorted(os.path.relpath(path, self.output_dir) for path in glob.glob(os.path.join(self.output_dir, "*", "*.parquet")))
+
+    def test_taxonomy_partitions(self):
+        """ Test that every file is written as one part per taxonomy partition. """
+
+        summary = export_datasource(self.datasource_dir, self.output_dir, workers=1)
+
+        self.assertEqual((summary["exported"], summary["rows"]), (2, 6))
+        self.assertEqual(self.parts(), [
+            os.path.join("taxonomy=dei", "CIK0000000001-0.parquet"),
+            os.path.join("taxonomy=us-gaap", "CIK0000000001-0.parquet"),
+            os.path.join("taxonomy=us-gaap", "CIK0000000002-0.parquet"),
+        ])
+        self.assertEqual(pq.read_table(self.output_dir).num_rows, 6)
+
+    def test_fy_partitions(self):
+        """ Test partitioning by fiscal year. """
+
+        export_datasource(self.datasource_dir, self.output_dir, partition="fy", workers=1)
+
+        self.assertEqual({os.path.dirname(part) for part in self.parts()}, {"fy=2022", "fy=2023"})
+        self.assertEqual(pq.read_table(os.path.join(self.output_dir, "fy=2023")).num_rows, 3)
+
+    def test_resume_from_manifest(self):
+        """ Test that files already in the manifest are skipped. """
+
+        export_datasource(self.datasource_dir, self.output_dir, workers=1)
+        self.write(3, ("dei",))
+
+        summary = export_datasource(self.datasource_dir, self.output_dir, workers=1)
+
+        self.assertEqual((summary["exported"], summary["skipped"]), (1, 2))
+        self.assertEqual(set(load_manifest(self.output_dir)), {"CIK0000000001.json", "CIK0000000002.json", "CIK0000000003.json"})
+
+    def test_reexport_replaces_parts(self):
+        """ Test that a modified file's old parts are replaced, including partitions it no longer has. """
+
+        export_datasource(self.datasource_dir, self.output_dir, workers=1)
+        path = self.write(1, ("us-gaap",))
+        os.utime(path, (1, 1))
+
+        summary = export_datasource(self.datasource_dir, self.output_dir, workers=1)
+
+        self.assertEqual((summary["exported"], summary["skipped"]), (1, 1))
+        self.assertEqual(self.parts(), [
+            os.path.join("taxonomy=us-gaap", "CIK0000000001-0.parquet"),
+            os.path.join("taxonomy=us-gaap", "CIK0000000002-0.parquet"),
+        ])
+        self.assertEqual(pq.read_table(self.output_dir).num_rows, 4)
+
+if __name__ == '__main__':
+    unittest.main()
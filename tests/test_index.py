@@ -0,0 +1,120 @@
+import unittest
+import json
+import gzip
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from server.index import EntityIndex, open_source
+
+class TestEntityIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.datasource_dir = self.tmpdir.name
+        self.write_json("CIK0000000001.json", 1, "ACME CORP", {"dei": {"Foo": {"units": {}}}})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_json(self, file_name, cik, entity_name, facts):
+        path = os.path.join(self.datasource_dir, file_name)
+        with open(path, 'w') as outfile:
+            json.dump({"cik": cik, "entityName": entity_name, "facts": facts}, outfile)
+        return path
+
+    def test_lookup_by_name_and_cik(self):
+        """ Test that entities are resolvable by entityName and CIK. """
+
+        index = EntityIndex(self.datasource_dir)
+        index.refresh()
+
+        by_name = index.lookup(entity_name="ACME CORP")
+        by_cik = index.lookup(cik=1)
+        self.assertEqual(len(by_name), 1)
+        self.assertEqual(by_name[0].path, by_cik[0].path)
+        self.assertEqual(index.lookup(entity_name="acme corp"), [])
+
+    def test_facts_byte_range(self):
+        """ Test that the indexed byte range covers exactly the facts object. """
+
+        index = EntityIndex(self.datasource_dir)
+        index.refresh()
+        entry = index.lookup(entity_name="ACME CORP")[0]
+
+        with open(entry.path, 'rb') as infile:
+            infile.seek(entry.offset)
+            facts = json.loads(infile.read(entry.length))
+        self.assertEqual(facts, {"dei": {"Foo": {"units": {}}}})
+
+    def test_incremental_refresh(self):
+        """ Test that added and removed files are picked up by refresh. """
+
+        index = EntityIndex(self.datasource_dir, refresh_interval=0)
+        index.refresh()
+        self.assertEqual(index.refresh(), 0)
+
+        path = self.write_json("CIK0000000002.json", 2, "WIDGET INC", {})
+        self.assertEqual(len(index.lookup(entity_name="WIDGET INC")), 1)
+
+        os.remove(path)
+        self.assertEqual(index.lookup(entity_name="WIDGET INC"), [])
+        self.assertEqual(len(index), 1)
+
+    def test_gzip_source(self):
+        """ Test that pre-compressed sources are indexed with offsets into the decompressed document. """
+
+        path = os.path.join(self.datasource_dir, "CIK0000000002.json.gz")
+        document = json.dumps({"cik": 2, "entityName": "WIDGET INC", "facts": {"dei": {}}}).encode()
+        with gzip.open(path, 'wb') as outfile:
+            outfile.write(document)
+
+        index = EntityIndex(self.datasource_dir)
+        index.refresh()
+        entry = index.lookup(cik=2)[0]
+        self.assertEqual(entry.entity_name, "WIDGET INC")
+        with open_source(path) as infile:
+            infile.seek(entry.offset)
+            self.assertEqual(json.loads(infile.read(entry.length)), {"dei": {}})
+
+    def test_csv_row_offsets(self):
+        """ Test that CSV entities are indexed with the byte ranges of their rows. """
+
+        path = os.path.join(self.datasource_dir, "facts.csv")
+        with open(path, 'w', newline='') as outfile:
+            outfile.write('entityName,cik,note\r\nACME CORP,1,"multi\nline"\r\nWIDGET INC,2,x\r\nACME CORP,1,y')
+
+        index = EntityIndex(self.datasource_dir)
+        index.refresh()
+        entry = [e for e in index.lookup(entity_name="ACME CORP") if e.kind == "csv"][0]
+
+        with open(path, 'rb') as infile:
+            content = infile.read()
+        self.assertEqual(content[entry.offset:entry.offset + entry.length], b"entityName,cik,note\r\n")
+        rows = [content[offset:offset + length] for offset, length in zip(entry.rows[::2], entry.rows[1::2])]
+        self.assertEqual(rows, [b'ACME CORP,1,"multi\nline"\r\n', b"ACME CORP,1,y"])
+        self.assertEqual(index.lookup(cik=2)[0].payload_size, len(b"WIDGET INC,2,x\r\n"))
+
+    def test_concurrent_maybe_refresh(self):
+        """ Test that threads finding the refresh interval expired rescan only once. """
+
+        index = EntityIndex(self.datasource_dir, refresh_interval=60)
+        index.refresh()
+        index._last_refresh = time.monotonic() - 61
+
+        barrier = threading.Barrier(8)
+        def lookup():
+            barrier.wait()
+            index.lookup(cik=1)
+
+        with mock.patch.object(index, "_refresh", wraps=index._refresh) as refresh:
+            threads = [threading.Thread(target=lookup) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(refresh.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
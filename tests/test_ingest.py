@@ -0,0 +1,148 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest import mock
+from server import ingest as ingest_module
+from server.catalog import Catalog
+from server.ingest import diff_facts, ingest
+from server.observations import ObservationStore
+
+def facts(fy, val):
+    return {"dei": {"EntityCommonStockSharesOutstanding": {"units": {"shares": [
+        {"end": f"{fy}-06-30", "val": val, "accn": f"acc-{fy}", "fy": fy, "fp": "FY", "form": "10-K", "filed": f"{fy}-07-15"},
+    ]}}}, "us-gaap": {"Assets": {"units": {"USD": [
+        {"end": "2023-06-30", "val": 7, "accn": "acc-2023", "fy": 2023, "fp": "FY", "form": "10-K", "filed": "2023-07-15"},
+    ]}}}}
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.datasource_dir = os.path.join(self.tmpdir.name, "datasource")
+        self.drop_dir = os.path.join(self.tmpdir.name, "drop")
+        os.makedirs(self.datasource_dir)
+        os.makedirs(self.drop_dir)
+        self.catalog_path = os.path.join(self.tmpdir.name, "catalog.db")
+        self.observations_path = os.path.join(self.tmpdir.name, "observations.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def drop(self, name, document):
+        with open(os.path.join(self.drop_dir, name), 'w') as outfile:
+            outfile.write(document if isinstance(document, str) else json.dumps(document))
+
+    def ingest(self, **kwargs):
+        return ingest(self.drop_dir, self.datasource_dir, self.catalog_path, **kwargs)
+
+    def test_diff_facts(self):
+        """ Test that restated, added and removed concepts are changed and only new accessions are added. """
+
+        old = facts(2023, 100)
+        new = facts(2024, 200)
+        new["dei"]["EntityCommonStockSharesOutstanding"]["units"]["shares"].insert(0, old["dei"]["EntityCommonStockSharesOutstanding"]["units"]["shares"][0])
+        new["us-gaap"]["Revenues"] = {"units": {"USD": [{"end": "2024-06-30", "val": 5, "accn": "acc-rev"}]}}
+        del new["us-gaap"]["Assets"]
+
+        self.assertEqual(diff_facts(old, old), ([], []))
+        self.assertEqual(diff_facts(old, new), (
+            ["dei.EntityCommonStockSharesOutstanding", "us-gaap.Assets", "us-gaap.Revenues"],
+            ["acc-2024", "acc-rev"]
+        ))
+
+    def test_ingest(self):
+        """ Test that added, modified, unchanged and removed documents are applied and recorded in order. """
+
+        self.drop("CIK0000000001.json", {"cik": 1, "entityName": "ACME CORP", "facts": facts(2023, 100)})
+        self.drop("CIK0000000002.json", {"cik": 2, "entityName": "WIDGET INC", "facts": facts(2023, 200)})
+        self.assertEqual([change["change"] for change in self.ingest()], ["added", "added"])
+        ObservationStore(self.observations_path).build(self.datasource_dir)
+
+        self.drop("CIK0000000001.json", {"cik": 1, "entityName": "ACME CORP", "facts": facts(2024, 150)})
+        os.remove(os.path.join(self.drop_dir, "CIK0000000002.json"))
+        changes = self.ingest(observations_path=self.observations_path, delete_missing=True)
+
+        self.assertEqual([(change["name"], change["change"]) for change in changes],
+                         [("CIK0000000001.json", "modified"), ("CIK0000000002.json", "removed")])
+        self.assertEqual(changes[0]["concepts"], ["dei.EntityCommonStockSharesOutstanding"])
+        self.assertEqual(changes[0]["accessions"], ["acc-2024"])
+        self.assertEqual(changes[1]["cik"], 2)
+        self.assertEqual(sorted(os.listdir(self.datasource_dir)), ["CIK0000000001.json"])
+
+        rows = list(ObservationStore(self.observations_path).query("dei.EntityCommonStockSharesOutstanding"))
+        self.assertEqual([(row["cik"], row["val"]) for row in rows], [(1, 150)])
+
+        feed = Catalog(self.catalog_path).changes_since()
+        self.assertEqual([change["seq"] for change in feed], [1, 2, 3, 4])
+        self.assertEqual([change["change"] for change in feed], ["added", "added", "modified", "removed"])
+        self.assertEqual(feed[2]["concepts"], ["dei.EntityCommonStockSharesOutstanding"])
+        self.assertEqual([change["seq"] for change in Catalog(self.catalog_path).changes_since(2, limit=1)], [3])
+
+        self.assertEqual(self.ingest(), [])
+
+    def test_invalid_documents(self):
+        """ Test that invalid documents are skipped without losing the changes of valid ones. """
+
+        self.drop("CIK0000000001.json", "{not json")
+        self.drop("CIK0000000002.json", [1, 2])
+        self.drop("CIK0000000003.json", {"cik": "3", "entityName": "STRING CIK", "facts": {}})
+        self.drop("CIK0000000004.json", {"cik": True, "entityName": "BOOL CIK", "facts": {}})
+        self.drop("CIK0000000005.json", {"cik": 5, "entityName": "BAD FACTS", "facts": {"dei": {"Foo": {"units": []}}}})
+        self.drop("CIK0000000006.json", {"cik": 6, "entityName": "ACME CORP", "facts": facts(2023, 100)})
+
+        changes = self.ingest()
+
+        self.assertEqual([change["name"] for change in changes], ["CIK0000000006.json"])
+        self.assertEqual(os.listdir(self.datasource_dir), ["CIK0000000006.json"])
+        self.assertEqual([change["cik"] for change in Catalog(self.catalog_path).changes_since()], [6])
+
+    def test_changes_recorded_per_file(self):
+        """ Test that a run interrupted by a failed write keeps the changes it already applied. """
+
+        self.drop("CIK0000000001.json", {"cik": 1, "entityName": "ACME CORP", "facts": facts(2023, 100)})
+        self.drop("CIK0000000002.json", {"cik": 2, "entityName": "WIDGET INC", "facts": facts(2023, 200)})
+        write_atomic = ingest_module.write_atomic
+
+        def fail_second(path, data):
+            if path.endswith("CIK0000000002.json"):
+                raise OSError("disk full")
+            write_atomic(path, data)
+
+        with mock.patch.object(ingest_module, "write_atomic", fail_second):
+            with self.assertRaises(OSError):
+                self.ingest()
+
+        self.assertEqual([change["cik"] for change in Catalog(self.catalog_path).changes_since()], [1])
+        self.assertEqual([change["cik"] for change in self.ingest()], [2])
+        self.assertEqual([change["cik"] for change in Catalog(self.catalog_path).changes_since()], [1, 2])
+
+    def test_interrupted_run_recovered(self):
+        """ Test that a change applied but not recorded before an interruption is recorded by the
+        next run, and one that was not applied is discarded. """
+
+        self.drop("CIK0000000001.json", {"cik": 1, "entityName": "ACME CORP", "facts": facts(2023, 100)})
+        self.drop("CIK0000000002.json", {"cik": 2, "entityName": "WIDGET INC", "facts": facts(2023, 200)})
+        self.ingest()
+        self.drop("CIK0000000001.json", {"cik": 1, "entityName": "ACME CORP", "facts": facts(2024, 150)})
+        self.drop("CIK0000000002.json", {"cik": 2, "entityName": "WIDGET INC", "facts": facts(2024, 250)})
+        catalog = Catalog(self.catalog_path)
+        # the first write lands but the run stops before recording it
+        with mock.patch.object(ingest_module.Catalog, "record_changes", side_effect=KeyboardInterrupt()):
+            with self.assertRaises(KeyboardInterrupt):
+                self.ingest()
+        self.assertEqual([change["name"] for change in catalog.staged_changes()], ["CIK0000000001.json"])
+        catalog.stage_change({"name": "CIK0000000002.json", "cik": 2, "change": "modified", "sha256": "unapplied"})
+
+        changes = self.ingest()
+
+        self.assertEqual([(change["cik"], change["change"]) for change in changes], [(1, "modified"), (2, "modified")])
+        self.assertEqual(changes[0]["concepts"], ["dei.EntityCommonStockSharesOutstanding"])
+        feed = catalog.changes_since(2)
+        self.assertEqual([change["cik"] for change in feed], [1, 2])
+        self.assertNotEqual(feed[1]["sha256"], "unapplied")
+        self.assertEqual(catalog.staged_changes(), [])
+        self.assertEqual(self.ingest(), [])
+
+if __name__ == '__main__':
+    unittest.main()
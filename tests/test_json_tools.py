@@ -0,0 +1,46 @@
+import unittest
+from res.json_tools import OBSERVATION_COLUMNS, flatten_facts
+
+DOCUMENT = {
+    "cik": 1750,
+    "entityName": "AAR CORP",
+    "facts": {
+        "dei": {
+            "EntityCommonStockSharesOutstanding": {"units": {"shares": [
+                {"end": "2010-08-31", "val": 39662816, "accn": "0001104659-10-049632", "fy": 2011, "fp": "Q1", "form": "10-Q", "filed": "2010-09-23"},
+            ]}},
+        },
+        "us-gaap": {
+            "Revenues": {"units": {"USD": [
+                {"start": "2010-06-01", "end": "2011-05-31", "val": 1.5, "accn": "a", "fy": 2011, "fp": "FY", "form": "10-K", "filed": "2011-07-13", "frame": "CY2010"},
+                {"end": "2011-05-31", "val": 2, "accn": "b", "fp": "FY", "form": "10-K", "filed": "2011-07-13"},
+            ], "EUR": []}},
+        },
+    },
+}
+
+class TestJsonTools(unittest.TestCase):
+
+    def test_flatten_facts_long_table(self):
+        """ Test that every observation becomes one row with its taxonomy, concept and unit. """
+
+        df = flatten_facts(DOCUMENT)
+
+        self.assertEqual(list(df.columns), OBSERVATION_COLUMNS)
+        self.assertEqual(len(df), 3)
+        self.assertEqual(list(df["taxonomy"]), ["dei", "us-gaap", "us-gaap"])
+        self.assertEqual(list(df["unit"]), ["shares", "USD", "USD"])
+        self.assertEqual(list(df["val"]), [39662816.0, 1.5, 2.0])
+        self.assertEqual(str(df["concept"].dtype), "category")
+
+    def test_flatten_facts_missing_fields(self):
+        """ Test that missing optional fields become nulls instead of failing. """
+
+        df = flatten_facts(DOCUMENT)
+
+        self.assertTrue(df["start"].isna()[0])
+        self.assertTrue(df["fy"].isna()[2])
+        self.assertEqual(df["end"].dt.year.tolist(), [2010, 2011, 2011])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from server.metrics import Registry
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_histogram_buckets_are_cumulative(self):
+        """ Test that histogram buckets count values up to and including their bound. """
+
+        histogram = self.registry.histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, stage="read")
+        text = self.registry.render()
+
+        self.assertIn('latency_seconds_bucket{stage="read",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{stage="read",le="1.0"} 3', text)
+        self.assertIn('latency_seconds_bucket{stage="read",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_sum{stage="read"} 2.65', text)
+        self.assertIn('latency_seconds_count{stage="read"} 4', text)
+        self.assertIn("# TYPE latency_seconds histogram", text)
+
+    def test_counter_and_gauge(self):
+        """ Test counters, set gauges and function-backed metrics. """
+
+        counter = self.registry.counter("solutions_total", "Solutions.", ("result",))
+        counter.inc(result="valid")
+        counter.inc(2, result="valid")
+        gauge = self.registry.gauge("queue", "Queue depth.")
+        gauge.set(3)
+        self.registry.gauge("size", "Size.", function=lambda: 7)
+        text = self.registry.render()
+
+        self.assertIn('solutions_total{result="valid"} 3', text)
+        self.assertIn("\nqueue 3\n", text)
+        self.assertIn("\nsize 7\n", text)
+
+    def test_labels_are_checked_and_escaped(self):
+        """ Test that wrong label names raise and label values are escaped. """
+
+        counter = self.registry.counter("requests_total", "Requests.", ("endpoint",))
+        with self.assertRaises(ValueError):
+            counter.inc(path="/data")
+        counter.inc(endpoint='a"b')
+        self.assertIn('requests_total{endpoint="a\\"b"} 1', self.registry.render())
+
+    def test_registry_labels(self):
+        """ Test that registry labels, read at scrape time, are added to every sample. """
+
+        worker = iter(("1", "2"))
+        registry = Registry(labels={"worker": lambda: next(worker)})
+        registry.counter("requests_total", "Requests.", ("endpoint",)).inc(endpoint="/data")
+        registry.histogram("latency_seconds", "Latency.", buckets=(1.0,)).observe(0.5)
+
+        text = registry.render()
+        self.assertIn('requests_total{endpoint="/data",worker="1"} 1', text)
+        self.assertIn('latency_seconds_bucket{worker="1",le="1.0"} 1', text)
+        self.assertIn('latency_seconds_count{worker="1"} 1', text)
+        self.assertIn('requests_total{endpoint="/data",worker="2"} 1', registry.render())
+
+if __name__ == '__main__':
+    unittest.main()
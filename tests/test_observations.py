@@ -0,0 +1,99 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest import mock
+from server.observations import ObservationStore
+
+def document(cik, entity_name, fy):
+    return {"cik": cik, "entityName": entity_name, "facts": {"dei": {"EntityCommonStockSharesOutstanding": {"units": {"shares": [
+        {"end": f"{fy}-06-30", "val": cik * 100, "accn": f"acc-{cik}-{fy}", "fy": fy, "fp": "FY", "form": "10-K", "filed": f"{fy}-07-15"},
+        {"end": f"{fy}-03-31", "val": cik * 10, "accn": f"acc-{cik}-{fy}-q", "fy": fy, "fp": "Q3", "form": "10-Q", "filed": f"{fy}-04-15"},
+    ]}}}}}
+
+class TestObservationStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.datasource_dir = os.path.join(self.tmpdir.name, "datasource")
+        os.makedirs(self.datasource_dir)
+        for cik, name in ((1, "ACME CORP"), (2, "WIDGET INC")):
+            self.write(cik, name, 2023)
+        self.store = ObservationStore(os.path.join(self.tmpdir.name, "observations.db"))
+        self.store.build(self.datasource_dir)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, cik, entity_name, fy):
+        with open(os.path.join(self.datasource_dir, f"CIK{cik:010d}.json"), 'w') as outfile:
+            json.dump(document(cik, entity_name, fy), outfile)
+
+    def test_cross_company_query(self):
+        """ Test querying one concept and period across every company. """
+
+        rows = list(self.store.query("dei.EntityCommonStockSharesOutstanding", fy=2023, fp="FY"))
+
+        self.assertEqual([(row["entity_name"], row["val"]) for row in rows], [("ACME CORP", 100), ("WIDGET INC", 200)])
+
+    def test_pagination(self):
+        """ Test that the cursor of the last row continues with the next page. """
+
+        first = list(self.store.query("dei.EntityCommonStockSharesOutstanding", limit=3))
+        rest = list(self.store.query("dei.EntityCommonStockSharesOutstanding", limit=3, cursor=first[-1]["cursor"]))
+
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(rest), 1)
+
+    def test_pagination_plan(self):
+        """ Test that a page is read in cursor order off an index, with or without filters, instead of sorted. """
+
+        statements = []
+        connect = self.store.connect
+
+        def traced(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        with mock.patch.object(self.store, "connect", traced):
+            for filters in ({}, {"fy": 2023}, {"fy": 2023, "fp": "FY"}, {"start": "2023-01-01"}, {"cik": 1}):
+                list(self.store.query("dei.EntityCommonStockSharesOutstanding", cursor=1, **filters))
+
+        conn = self.store.connect()
+        try:
+            for statement in statements:
+                plan = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}"))
+                self.assertNotIn("TEMP B-TREE", plan)
+                self.assertIn("USING", plan.partition("SEARCH o ")[2])
+        finally:
+            conn.close()
+
+    def test_incremental_rebuild(self):
+        """ Test that only modified files are reloaded and their old observations replaced. """
+
+        self.assertEqual(self.store.build(self.datasource_dir), 0)
+
+        self.write(2, "WIDGET INC", 2024)
+        os.utime(os.path.join(self.datasource_dir, "CIK0000000002.json"), (1, 1))
+        self.assertEqual(self.store.build(self.datasource_dir), 1)
+
+        rows = list(self.store.query("dei.EntityCommonStockSharesOutstanding", cik=2))
+        self.assertEqual({row["fy"] for row in rows}, {2024})
+
+    def test_apply_delta(self):
+        """ Test that a delta replaces only the changed concepts of a source. """
+
+        updated = document(1, "ACME CORP", 2024)
+        updated["facts"]["us-gaap"] = {"Revenues": {"units": {"USD": [
+            {"end": "2024-06-30", "val": 5, "accn": "acc-1-rev", "fy": 2024, "fp": "FY", "form": "10-K", "filed": "2024-07-15"},
+        ]}}}
+        self.store.apply_delta("CIK0000000001.json", updated, ["us-gaap.Revenues"], 1, 1.0)
+
+        revenues = list(self.store.query("us-gaap.Revenues"))
+        shares = list(self.store.query("dei.EntityCommonStockSharesOutstanding", cik=1))
+        self.assertEqual([(row["cik"], row["val"]) for row in revenues], [(1, 5)])
+        self.assertEqual({row["fy"] for row in shares}, {2023})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import os
+import json
+import runpy
+import signal
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+from server import prefork
+from server.cache import FactsCache
+from server.catalog import Catalog
+from server.datasource import Datasource
+from server.search import NameIndex
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "server", "gunicorn.conf.py")
+
+class StopWatching(Exception):
+    pass
+
+class TestPrefork(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.datasource_dir = os.path.join(self.tmpdir.name, "datasource")
+        os.makedirs(self.datasource_dir)
+        for cik, name in ((1, "ACME CORP"), (2, "WIDGET INC")):
+            self.write(cik, name)
+        self.app = SimpleNamespace(
+            datasource=Datasource(
+                self.datasource_dir,
+                catalog=Catalog(os.path.join(self.tmpdir.name, "catalog.db")),
+                cache=FactsCache(1024 * 1024)
+            ),
+            name_index=NameIndex(),
+            tickers={}
+        )
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, cik, entity_name):
+        with open(os.path.join(self.datasource_dir, f"CIK{cik:010d}.json"), 'w') as outfile:
+            json.dump({"cik": cik, "entityName": entity_name, "facts": {"dei": {}}}, outfile)
+
+    def test_warm(self):
+        """ Test that warming populates the entity index, the name index and the facts cache. """
+
+        loaded = prefork.warm(self.app, [1])
+
+        self.assertGreater(loaded, 0)
+        self.assertEqual(len(self.app.datasource.index), 2)
+        self.assertEqual([result["entity_name"] for result in self.app.name_index.search("WIDGET")], ["WIDGET INC"])
+        self.assertEqual(len(self.app.datasource.cache), 1)
+
+    def test_watcher_reloads_on_change(self):
+        """ Test that the watcher sends HUP to the master only once the datasource changes. """
+
+        prefork.warm(self.app, [])
+        sleeps = []
+        watched = threading.Event()
+
+        def sleep(interval):
+            sleeps.append(interval)
+            if len(sleeps) == 2:
+                watched.wait(5)
+            elif len(sleeps) > 3:
+                raise StopWatching()
+
+        with mock.patch.object(prefork.time, "sleep", sleep), mock.patch.object(prefork.os, "kill") as kill:
+            watcher = threading.Thread(target=self.watch)
+            watcher.start()
+            # the first pass finds nothing new, the second one the added file
+            while len(sleeps) < 2:
+                threading.Event().wait(0.01)
+            kill.assert_not_called()
+            self.write(3, "GADGET LLC")
+            watched.set()
+            watcher.join(5)
+
+        kill.assert_called_once_with(os.getpid(), signal.SIGHUP)
+        self.assertEqual(len(self.app.datasource.index), 3)
+
+    def watch(self):
+        try:
+            prefork.watch_datasource(self.app, 0.01, [])
+        except StopWatching:
+            pass
+
+    def test_adopt(self):
+        """ Test that a forked worker leaves the catalog to the master. """
+
+        prefork.warm(self.app, [])
+        prefork.adopt(self.app)
+        self.write(3, "GADGET LLC")
+
+        self.assertEqual(self.app.datasource.index.refresh(), 1)
+        self.assertNotIn("CIK0000000003.json", self.app.datasource.index.catalog.hashes())
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_fork_during_refresh(self):
+        """ Test that a fork does not wait for a running refresh and the child can still refresh. """
+
+        index = self.app.datasource.index
+        index.refresh()
+        with index._lock:
+            pid = os.fork()
+            if pid == 0:
+                self.write(3, "GADGET LLC")
+                os._exit(0 if index.refresh() == 1 else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+    def test_gunicorn_config(self):
+        """ Test that the launcher preloads the app and exports the worker count it forks. """
+
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "3"}):
+            config = runpy.run_path(CONFIG_PATH)
+            self.assertEqual(os.environ["WEB_CONCURRENCY"], "3")
+        self.assertEqual(config["workers"], 3)
+        self.assertTrue(config["preload_app"])
+        self.assertEqual(config["wsgi_app"], "app:app")
+        for hook in ("when_ready", "pre_fork", "post_fork"):
+            self.assertTrue(callable(config[hook]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import json
+from server.projection import Projection, iter_concepts, concept_offsets
+
+FACTS = {
+    "dei": {
+        "EntityCommonStockSharesOutstanding": {
+            "label": "Shares",
+            "units": {"shares": [
+                {"end": "2022-06-30", "val": 10, "fy": 2022, "fp": "FY"},
+                {"end": "2023-06-30", "val": 11, "fy": 2023, "fp": "FY"},
+            ]},
+        },
+    },
+    "us-gaap": {
+        "Revenues": {"label": "Revenues", "units": {"USD": [{"end": "2023-06-30", "val": 5, "fy": 2023, "fp": "Q1"}]}},
+        "Assets": {"label": "Assets", "units": {"USD": [{"end": "2021-06-30", "val": 7, "fy": 2021, "fp": "FY"}]}},
+    },
+}
+
+class TestProjection(unittest.TestCase):
+
+    def test_iter_concepts_spans(self):
+        """ Test that every concept is yielded with the span of its encoded value. """
+
+        text = json.dumps(FACTS, indent=2)
+        seen = {}
+        for taxonomy, concept, value, start, end in iter_concepts(text):
+            self.assertEqual(json.loads(text[start:end]), value)
+            seen[(taxonomy, concept)] = value
+        self.assertEqual(len(seen), 3)
+
+    def test_concept_offsets(self):
+        """ Test that concept byte ranges decode to each concept, also after non-ASCII text. """
+
+        facts = dict({"ifrs": {"Équité": {"label": "Équité €", "units": {"EUR": []}}}}, **FACTS)
+        data = json.dumps(facts, ensure_ascii=False, indent=1).encode()
+        document = b'{"cik": 1, "facts": ' + data + b"}"
+        base = document.index(b"{", 1)
+
+        ranges = concept_offsets(data, base)
+        self.assertEqual(len(ranges), 4)
+        for taxonomy, concept, offset, length in ranges:
+            self.assertEqual(json.loads(document[offset:offset + length]), facts[taxonomy][concept])
+
+    def test_concept_filter(self):
+        """ Test selecting a whole taxonomy and a single concept. """
+
+        projection = Projection.from_request({"concepts": ["dei", "us-gaap.Revenues"]})
+        facts = projection.apply(json.dumps(FACTS))
+
+        self.assertEqual(set(facts["dei"]), {"EntityCommonStockSharesOutstanding"})
+        self.assertEqual(set(facts["us-gaap"]), {"Revenues"})
+
+    def test_period_filter_drops_empty_concepts(self):
+        """ Test that fiscal year and date filters drop observations and emptied concepts. """
+
+        projection = Projection.from_request({"fy": 2023, "start": "2023-01-01", "fp": ["FY"]})
+        facts = projection.apply(json.dumps(FACTS))
+
+        self.assertEqual(list(facts), ["dei"])
+        observations = facts["dei"]["EntityCommonStockSharesOutstanding"]["units"]["shares"]
+        self.assertEqual([observation["val"] for observation in observations], [11])
+
+    def test_invalid_parameters(self):
+        """ Test that malformed filters are rejected and absent filters yield no projection. """
+
+        self.assertIsNone(Projection.from_request({"entity_name": "ACME"}))
+        with self.assertRaises(ValueError):
+            Projection.from_request({"fy": "2023"})
+        with self.assertRaises(ValueError):
+            Projection.from_request({"start": "June 2023"})
+
+if __name__ == '__main__':
+    unittest.main()
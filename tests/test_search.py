@@ -0,0 +1,43 @@
+import unittest
+from server.search import NameIndex, core_name, normalize
+
+class TestNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NameIndex()
+        self.index.build(
+            [("AAR CORP", 1750), ("APPLE INC.", 320193), ("Applied Materials, Inc.", 6951), ("AT&T INC.", 732717)],
+            tickers={320193: ["AAPL"]},
+        )
+
+    def test_normalize(self):
+        """ Test that names are case-folded and suffixes dropped. """
+
+        self.assertEqual(normalize("AT&T INC."), "at and t inc")
+        self.assertEqual(core_name("Applied Materials, Inc."), "applied materials")
+
+    def test_exact_cik_and_ticker(self):
+        """ Test exact matches on core name, CIK and ticker. """
+
+        self.assertEqual(self.index.search("aar corporation")[0]["cik"], 1750)
+        self.assertEqual(self.index.search("1750")[0]["match"], "cik")
+        result = self.index.search("aapl")[0]
+        self.assertEqual((result["cik"], result["match"], result["tickers"]), (320193, "exact", ["AAPL"]))
+
+    def test_prefix_ranked_after_exact(self):
+        """ Test that prefix matches are returned and ordered by how much of the name they cover. """
+
+        names = [result["entity_name"] for result in self.index.search("appl")]
+        self.assertEqual(names[:2], ["APPLE INC.", "Applied Materials, Inc."])
+        self.assertTrue(all(result["match"] == "prefix" for result in self.index.search("appl")[:2]))
+
+    def test_fuzzy(self):
+        """ Test that misspelled names still match by trigram similarity. """
+
+        results = self.index.search("aplied materails")
+        self.assertEqual(results[0]["cik"], 6951)
+        self.assertEqual(results[0]["match"], "fuzzy")
+        self.assertEqual(self.index.search("zzzz"), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import time
+import hashlib
+import threading
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from client.solvers import ProcessPoolSolver, PythonSolver, get_solver, search_range
+
+class TestSolvers(unittest.TestCase):
+
+    def assert_solves(self, challenge, difficulty, nonce):
+        hash_value = hashlib.sha256(f"{challenge}{nonce}".encode()).hexdigest()
+        self.assertTrue(hash_value.startswith("0" * difficulty), f"Hash {hash_value} does not meet difficulty {difficulty}")
+
+    def test_search_range_matches_hex_prefix(self):
+        """ Test that the raw digest comparison agrees with the hex prefix check for odd and even difficulties. """
+
+        for difficulty in (1, 2, 3, 4):
+            nonce = search_range("datafeed12345", difficulty, 0, 1 << 20)
+            self.assert_solves("datafeed12345", difficulty, nonce)
+
+            # no smaller nonce may satisfy the hex prefix
+            prefix = "0" * difficulty
+            for smaller in range(nonce):
+                self.assertFalse(hashlib.sha256(f"datafeed12345{smaller}".encode()).hexdigest().startswith(prefix))
+
+    def test_backends_agree(self):
+        """ Test that the single-process and process pool backends both find valid nonces. """
+
+        pool = ProcessPoolSolver(workers=2)
+        try:
+            self.assert_solves("datafeed12345", 3, pool.solve("datafeed12345", 3))
+        finally:
+            pool.close()
+        self.assert_solves("datafeed12345", 3, PythonSolver().solve("datafeed12345", 3))
+
+    def test_concurrent_solves(self):
+        """ Test that concurrent solves on a shared process pool only wait on their own chunks and
+        each return a nonce for their own challenge. """
+
+        pool = ProcessPoolSolver(workers=2)
+        challenges = [f"datafeed{index}" for index in range(8)]
+        barrier = threading.Barrier(len(challenges))
+        owners = {}
+        foreign = []
+        submit = ProcessPoolExecutor.submit
+
+        def owned_submit(executor, *args, **kwargs):
+            future = submit(executor, *args, **kwargs)
+            owners[future] = threading.get_ident()
+            time.sleep(0.001)  # let the other solves run between submissions
+            return future
+
+        def owned_wait(futures, **kwargs):
+            foreign.extend(future for future in futures if owners[future] != threading.get_ident())
+            return wait(futures, **kwargs)
+
+        def solve(challenge):
+            barrier.wait()
+            return pool.solve(challenge, 5)
+
+        threads = ThreadPoolExecutor(max_workers=len(challenges))
+        try:
+            with mock.patch.object(ProcessPoolExecutor, "submit", owned_submit), mock.patch("client.solvers.wait", owned_wait):
+                # a solve left waiting on another's chunks never returns
+                nonces = list(threads.map(solve, challenges, timeout=60))
+        finally:
+            pool.close()
+            threads.shutdown(wait=False)
+        self.assertEqual(foreign, [])
+        for challenge, nonce in zip(challenges, nonces):
+            self.assert_solves(challenge, 5, nonce)
+
+    def test_unknown_backend(self):
+        """ Test that an unknown backend name is rejected. """
+
+        with self.assertRaises(ValueError):
+            get_solver("gpu")
+
+if __name__ == '__main__':
+    unittest.main()